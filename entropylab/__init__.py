@@ -1,33 +1,62 @@
-from entropylab.components.lab_topology import ExperimentResources, LabResources
-from entropylab.pipeline.api.data_reader import ExperimentReader
-from entropylab.pipeline.api.data_writer import RawResultData
-from entropylab.pipeline.api.execution import EntropyContext
-from entropylab.pipeline.api.graph import GraphHelper
-from entropylab.pipeline.graph_experiment import (
-    Graph,
-    PyNode,
-    SubGraphNode,
-    pynode,
-)
-from entropylab.pipeline.params.param_store import ParamStore
-from entropylab.pipeline.results_backend.sqlalchemy.db import SqlAlchemyDB
-from entropylab.pipeline.script_experiment import Script, script_experiment
-from entropylab.quam.core import QuAMManager
-
-__all__ = [
-    "ExperimentReader",
-    "RawResultData",
-    "EntropyContext",
-    "GraphHelper",
-    "Graph",
-    "PyNode",
-    "SubGraphNode",
-    "pynode",
-    "ExperimentResources",
-    "LabResources",
-    "SqlAlchemyDB",
-    "Script",
-    "script_experiment",
-    "ParamStore",
-    "QuAMManager",
-]
+""" Entropy - a lab workflow management package.
+
+The public names of the package are imported lazily (PEP 562), when they are first
+used, so that importing entropylab, or one of its submodules, does not import the
+packages of components that are not used (e.g. QuAMManager imports the qm SDK).
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+# public name -> module that defines it
+_LAZY_IMPORTS = {
+    "ExperimentReader": "entropylab.pipeline.api.data_reader",
+    "RawResultData": "entropylab.pipeline.api.data_writer",
+    "EntropyContext": "entropylab.pipeline.api.execution",
+    "GraphHelper": "entropylab.pipeline.api.graph",
+    "Graph": "entropylab.pipeline.graph_experiment",
+    "PyNode": "entropylab.pipeline.graph_experiment",
+    "SubGraphNode": "entropylab.pipeline.graph_experiment",
+    "pynode": "entropylab.pipeline.graph_experiment",
+    "ExperimentResources": "entropylab.components.lab_topology",
+    "LabResources": "entropylab.components.lab_topology",
+    "SqlAlchemyDB": "entropylab.pipeline.results_backend.sqlalchemy.db",
+    "Script": "entropylab.pipeline.script_experiment",
+    "script_experiment": "entropylab.pipeline.script_experiment",
+    "ExperimentQueue": "entropylab.pipeline.experiment_queue",
+    "ParamStore": "entropylab.pipeline.params.param_store",
+    "QuAMManager": "entropylab.quam.core",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+if TYPE_CHECKING:
+    from entropylab.components.lab_topology import ExperimentResources, LabResources
+    from entropylab.pipeline.api.data_reader import ExperimentReader
+    from entropylab.pipeline.api.data_writer import RawResultData
+    from entropylab.pipeline.api.execution import EntropyContext
+    from entropylab.pipeline.api.graph import GraphHelper
+    from entropylab.pipeline.experiment_queue import ExperimentQueue
+    from entropylab.pipeline.graph_experiment import (
+        Graph,
+        PyNode,
+        SubGraphNode,
+        pynode,
+    )
+    from entropylab.pipeline.params.param_store import ParamStore
+    from entropylab.pipeline.results_backend.sqlalchemy.db import SqlAlchemyDB
+    from entropylab.pipeline.script_experiment import Script, script_experiment
+    from entropylab.quam.core import QuAMManager
+
+
+def __getattr__(name: str):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    # later lookups find the name in the module dict, without calling __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,12 +1,14 @@
 import argparse
 import functools
 import sys
+from datetime import datetime
 
-import pkg_resources
-
-from entropylab.dashboard import serve_dashboard
 from entropylab.logger import logger
-from entropylab.pipeline.results_backend.sqlalchemy import init_db, upgrade_db
+from entropylab.pipeline.api.errors import EntropyError
+
+# The packages that the commands use (sqlalchemy, dash, zmq...) are slow to import,
+# so they are imported by each command, and the CLI starts (and prints its help)
+# without importing them.
 
 
 # Decorator for friendly error messages
@@ -35,22 +37,140 @@ def command(func: callable) -> callable:
 
 @command
 def init(args: argparse.Namespace):
+    from entropylab.pipeline.results_backend.sqlalchemy import init_db
+
     init_db(args.directory)
 
 
 @command
 def upgrade(args: argparse.Namespace):
+    from entropylab.pipeline.results_backend.sqlalchemy import upgrade_db
+
     upgrade_db(args.directory)
 
 
 @command
 def serve(args: argparse.Namespace):
+    from entropylab.dashboard import serve_dashboard
+
     serve_dashboard(args.directory, args.host, args.port, args.debug)
 
 
+@command
+def serve_results(args: argparse.Namespace):
+    from entropylab.pipeline.results_backend import remote
+
+    remote.serve_results(
+        args.directory,
+        args.address or remote.server.DEFAULT_ADDRESS,
+        allow_remote=args.allow_remote,
+    )
+
+
+@command
+def worker(args: argparse.Namespace):
+    from entropylab.pipeline import distributed
+
+    distributed.run_worker(args.address)
+
+
+@command
+def delete(args: argparse.Namespace):
+    from entropylab.pipeline.results_backend.sqlalchemy import delete_experiments
+
+    deleted = delete_experiments(args.directory, _experiment_filter(args))
+    print(f"Deleted {len(deleted)} experiments")
+
+
+@command
+def archive(args: argparse.Namespace):
+    from entropylab.pipeline.results_backend.sqlalchemy import archive_experiments
+
+    archived = archive_experiments(
+        args.directory, _experiment_filter(args), args.dest, args.compress
+    )
+    print(f"Archived {len(archived)} experiments to '{args.dest}'")
+
+
+def _experiment_filter(args: argparse.Namespace):
+    from entropylab.pipeline.results_backend.sqlalchemy import ExperimentFilter
+
+    experiment_filter = ExperimentFilter(
+        ids=args.ids,
+        label=args.label,
+        start_before=args.before,
+        start_after=args.after,
+        success=False if args.failed else None,
+        favorite=False if args.keep_favorites else None,
+    )
+    if not args.all and all(
+        value is None
+        for value in (
+            experiment_filter.ids,
+            experiment_filter.label,
+            experiment_filter.start_before,
+            experiment_filter.start_after,
+            experiment_filter.success,
+        )
+    ):
+        raise EntropyError(
+            "No experiments selected. Use filter options or --all to select all "
+            "experiments"
+        )
+    return experiment_filter
+
+
 # The parser
 
 
+def _add_experiment_filter_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--id", dest="ids", type=int, nargs="+", help="ids of experiments to select"
+    )
+    parser.add_argument("--label", help="select experiments with the given label")
+    parser.add_argument(
+        "--before",
+        type=datetime.fromisoformat,
+        help="select experiments that started before the given ISO date",
+    )
+    parser.add_argument(
+        "--after",
+        type=datetime.fromisoformat,
+        help="select experiments that started after the given ISO date",
+    )
+    parser.add_argument(
+        "--failed", action="store_true", help="select only failed experiments"
+    )
+    parser.add_argument(
+        "--keep-favorites",
+        action="store_true",
+        help="never select experiments marked as favorite",
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="select all experiments in the project"
+    )
+
+
+class _VersionAction(argparse.Action):
+    """Like the "version" action, but pkg_resources is imported only when the
+    version is printed"""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, help=None):
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=argparse.SUPPRESS,
+            nargs=0,
+            help=help or "show program's version number and exit",
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        import pkg_resources
+
+        version = pkg_resources.get_distribution("entropylab").version
+        parser.exit(message=f"{parser.prog} {version}\n")
+
+
 def _build_parser():
     parser = argparse.ArgumentParser()
     # in case no arguments were supplied:
@@ -66,8 +186,7 @@ def _build_parser():
     parser.add_argument(
         "-v",
         "--version",
-        action="version",
-        version="%(prog)s " + pkg_resources.get_distribution("entropylab").version,
+        action=_VersionAction,
     )
 
     # init
@@ -82,6 +201,28 @@ def _build_parser():
     upgrade_parser.add_argument("directory", **directory_arg)
     upgrade_parser.set_defaults(func=upgrade)
 
+    # delete
+    delete_parser = subparsers.add_parser(
+        "delete", help="delete experiments, with their results, from a project"
+    )
+    delete_parser.add_argument("directory", **directory_arg)
+    _add_experiment_filter_args(delete_parser)
+    delete_parser.set_defaults(func=delete)
+
+    # archive
+    archive_parser = subparsers.add_parser(
+        "archive", help="move experiments, with their results, to an archive project"
+    )
+    archive_parser.add_argument("dest", help="path to the archive project directory")
+    archive_parser.add_argument("directory", **directory_arg)
+    archive_parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="bundle the archive project into a .tar.gz file",
+    )
+    _add_experiment_filter_args(archive_parser)
+    archive_parser.set_defaults(func=archive)
+
     # serve
     serve_parser = subparsers.add_parser(
         "serve", help="serve & launch the results dashboard app in a browser"
@@ -102,6 +243,37 @@ def _build_parser():
     serve_parser.add_argument("--debug", dest="debug", action="store_true")
     serve_parser.set_defaults(func=serve, debug=False)
 
+    # serve-results
+    serve_results_parser = subparsers.add_parser(
+        "serve-results",
+        help="serve the project results database to remote clients (RemoteDB)",
+    )
+    serve_results_parser.add_argument("directory", **directory_arg)
+    serve_results_parser.add_argument(
+        "--address",
+        help="ZeroMQ address to bind to (default: tcp://127.0.0.1:5755)",
+        default=None,
+    )
+    serve_results_parser.add_argument(
+        "--allow-remote",
+        action="store_true",
+        help="allow binding to an address that other machines can reach. Requires "
+        "the remote.secret_key setting",
+    )
+    serve_results_parser.set_defaults(func=serve_results)
+
+    # worker
+    worker_parser = subparsers.add_parser(
+        "worker",
+        help="run graph nodes for a distributed graph experiment (NodeCoordinator)",
+    )
+    worker_parser.add_argument(
+        "address",
+        help="ZeroMQ address of the coordinator, e.g. tcp://lab-pc:5756. "
+        "Coordinators on other machines require the remote.secret_key setting",
+    )
+    worker_parser.set_defaults(func=worker)
+
     return parser
 
 
@@ -4,7 +4,7 @@ import shutil
 
 import pytest
 
-from entropylab.cli.main import init, command
+from entropylab.cli.main import init, command, delete
 
 
 def test_init_with_no_args():
@@ -28,6 +28,23 @@ def test_init_with_current_dir():
     shutil.rmtree(".entropy")
 
 
+def test_delete_without_filter_exits():
+    # arrange
+    args = argparse.Namespace(
+        directory=".",
+        ids=None,
+        label=None,
+        before=None,
+        after=None,
+        failed=False,
+        keep_favorites=False,
+        all=False,
+    )
+    # act & assert
+    with pytest.raises(SystemExit):
+        delete(args)
+
+
 # def test_serve():
 #     args = argparse.Namespace()
 #     args.directory = "tests_cache"
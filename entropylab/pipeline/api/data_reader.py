@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Any, Optional, Iterable
+from typing import List, Any, Optional, Iterable, Dict
 from warnings import warn
 
 from pandas import DataFrame
@@ -278,19 +278,51 @@ class DataReader(ABC):
         node_stage_ids = self.get_node_stage_ids_by_label(node_label, experiment_id)
         if not node_stage_ids:
             raise KeyError(f"node {node_label} not found")
-        nodes_results = []
-        for stage_id in node_stage_ids:
-            nodes_results.append(
-                NodeResults(
-                    stage_id,
-                    self.get_results(
-                        experiment_id,
-                        label=result_label,
-                        stage=stage_id,
-                    ),
-                )
-            )
-        return nodes_results
+        results_of_stages = self.get_results_of_stages(
+            node_stage_ids, experiment_id, result_label
+        )
+        return [
+            NodeResults(stage_id, results_of_stages.get(stage_id, []))
+            for stage_id in node_stage_ids
+        ]
+
+    def get_metadata_records_by_value(
+        self, label: str, data: Any
+    ) -> Iterable[MetadataRecord]:
+        """
+            get the metadata records with the given label and value, newest first.
+            Implementations should override this method when they can filter by
+            value while querying the stored data.
+
+        :param label: metadata label
+        :param data: metadata value
+        """
+        records = [
+            record
+            for record in self.get_metadata_records(label=label)
+            if record.data == data
+        ]
+        return sorted(records, key=lambda record: record.time, reverse=True)
+
+    def get_results_of_stages(
+        self,
+        stages: Iterable[int],
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+    ) -> Dict[int, List[ResultRecord]]:
+        """
+            get the results of many stages at once, indexed by stage.
+            Implementations should override this method when they can fetch
+            all stages in a single pass over the stored data.
+
+        :param stages: the stages to get results of
+        :param experiment_id: results from specific experiment
+        :param label: results label to filter by
+        """
+        return {
+            stage: list(self.get_results(experiment_id, label=label, stage=stage))
+            for stage in stages
+        }
 
 
 class ExperimentReader:
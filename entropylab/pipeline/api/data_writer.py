@@ -1,13 +1,17 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Optional, Type
+from typing import Any, Optional, Type, List, TYPE_CHECKING
 from warnings import warn
 
-from bokeh.models import Renderer
-from bokeh.plotting import Figure
-from matplotlib.figure import Figure as matplotlibFigure
-from plotly import graph_objects as go
+if TYPE_CHECKING:
+    # plotting packages are slow to import, and are only needed by plot generators
+    from bokeh.models import Renderer
+    from bokeh.plotting import Figure
+    from matplotlib.figure import Figure as matplotlibFigure
+    from plotly import graph_objects as go
 
 
 @dataclass
@@ -170,6 +174,16 @@ class DataWriter(ABC):
         """
         pass
 
+    def save_results(self, experiment_id: int, results: List[RawResultData]):
+        """
+            save several results to the db at once. Databases that can write them
+            together (e.g. in a single transaction) override this method.
+        :param experiment_id: the experiment id
+        :param results: the results to save, in order
+        """
+        for result in results:
+            self.save_result(experiment_id, result)
+
     @abstractmethod
     def save_metadata(self, experiment_id: int, metadata: Metadata):
         """
@@ -177,6 +191,17 @@ class DataWriter(ABC):
         """
         pass
 
+    def save_indexed_metadata(self, experiment_id: int, metadata: Metadata):
+        """
+            saves a metadata that is looked up by its value, with
+            DataReader.get_metadata_records_by_value(). Databases that keep
+            metadata where it can't be queried (e.g. in HDF5 files) override this
+            method.
+        :param experiment_id: the experiment id
+        :param metadata: the metadata to save
+        """
+        self.save_metadata(experiment_id, metadata)
+
     @abstractmethod
     def save_debug(self, experiment_id: int, debug: Debug):
         """
@@ -215,6 +240,16 @@ class DataWriter(ABC):
         """
         pass
 
+    def save_nodes(self, experiment_id: int, nodes: List[NodeData]):
+        """
+            saves the data of several nodes to the db at once. Databases that can
+            write them together override this method.
+        :param experiment_id: the experiment id
+        :param nodes: the node data to save, in order
+        """
+        for node_data in nodes:
+            self.save_node(experiment_id, node_data)
+
     @abstractmethod
     def update_experiment_favorite(self, experiment_id: int, favorite: bool) -> None:
         """
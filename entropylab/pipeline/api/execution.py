@@ -1,6 +1,6 @@
 import abc
 from itertools import count
-from typing import Any
+from typing import Any, List, Tuple, Optional, Iterator, Dict
 
 from plotly import graph_objects as go
 
@@ -10,6 +10,7 @@ from entropylab.pipeline.api.data_writer import (
     Metadata,
     PlotSpec,
 )
+from entropylab.pipeline.api.errors import EntropyError
 from entropylab.components.lab_topology import ExperimentResources
 
 
@@ -52,6 +53,20 @@ class EntropyContext:
             self._exp_id, RawResultData(label, data, self._stage_id, story)
         )
 
+    def add_results(self, results: Dict[str, Any], story: str = None):
+        """
+        saves several results from this experiment in the database at once
+        :param results: result data, indexed by result label
+        :param story: story about the results
+        """
+        self._data_writer.save_results(
+            self._exp_id,
+            [
+                RawResultData(label, data, self._stage_id, story)
+                for label, data in results.items()
+            ],
+        )
+
     def add_metadata(self, label: str, metadata: Any):
         """
         saves a new metadata from this experiment in the database
@@ -96,18 +111,66 @@ class EntropyContext:
         return self._stage_id
 
 
+class _RecordingEntropyContext(EntropyContext):
+    """
+    Context of a node that runs in a worker thread or process.
+    Data saved by the node is recorded, and saved later, by the coordinating thread,
+    using the context of the node stage.
+    """
+
+    def __init__(
+        self,
+        exp_id: int,
+        experiment_resources: Optional[ExperimentResources],
+        stage_id: int,
+    ) -> None:
+        super().__init__(exp_id, None, experiment_resources, stage_id, None)
+        self._records: List[Tuple[str, tuple]] = []
+
+    def add_result(self, label: str, data: Any, story: str = None):
+        self._records.append(("add_result", (label, data, story)))
+
+    def add_results(self, results: Dict[str, Any], story: str = None):
+        self._records.append(("add_results", (dict(results), story)))
+
+    def add_metadata(self, label: str, metadata: Any):
+        self._records.append(("add_metadata", (label, metadata)))
+
+    def add_plot(self, plot: PlotSpec, data: Any):
+        self._records.append(("add_plot", (plot, data)))
+
+    def add_figure(self, figure: go.Figure) -> None:
+        self._records.append(("add_figure", (figure,)))
+
+    def get_resource(self, name):
+        if self._experiment_resources is None:
+            raise EntropyError(
+                f"Resource {name} is not available to nodes that run in a process pool"
+            )
+        return super().get_resource(name)
+
+    def has_resource(self, name) -> bool:
+        if self._experiment_resources is None:
+            return False
+        return super().has_resource(name)
+
+
 class _EntropyContextFactory:
     def __init__(
         self,
         exp_id: int,
         data_writer: DataWriter,
         experiment_resources: ExperimentResources,
+        stage_iter: Optional[Iterator[int]] = None,
     ) -> None:
         super().__init__()
         self._data_writer = data_writer
         self._exp_id = exp_id
         self._experiment_resources = experiment_resources
-        self._stage_iter = count(start=0, step=1)
+        # factories of the same experiment can share stage ids
+        self._stage_iter = stage_iter
+        if self._stage_iter is None:
+            self._stage_iter = count(start=0, step=1)
 
     def create(self) -> EntropyContext:
         return EntropyContext(
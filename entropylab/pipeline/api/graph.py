@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import heapq
+import time
 from abc import abstractmethod, ABC
 from dataclasses import dataclass
-from typing import Set, Dict, Any, List, Optional
+from itertools import count
+from typing import Set, Dict, Any, List, Optional, Iterable, Tuple, FrozenSet
 
-import networkx as nx
 from graphviz import Digraph
 
+from entropylab.logger import logger
 from entropylab.pipeline.api.execution import EntropyContext
+from entropylab.pipeline.api.node_cache import NodeResultCache
 
 
 @dataclass(frozen=True, eq=True)
@@ -18,6 +22,7 @@ class Output:
 
     node: Node
     name: str
+    stream: bool = False
 
 
 @dataclass
@@ -38,6 +43,22 @@ class RetryBehavior:
     max_wait_time: Optional[float] = None
 
 
+@dataclass
+class MemoizeBehavior:
+    """
+    Attributes:
+        ttl: maximal age of restored outputs [seconds], None for no limit.
+        use_results_db: when the outputs are not in the cache, look for them in
+            the results db, in previous runs of the node.
+        cache: the cache of node outputs. Defaults to a cache that is shared by the
+            python session.
+    """
+
+    ttl: Optional[float] = None
+    use_results_db: bool = True
+    cache: Optional[NodeResultCache] = None
+
+
 class Node(ABC):
     """
     An abstract class for Entropy graph node.
@@ -53,6 +74,12 @@ class Node(ABC):
         must_run_after: Set[Node] = None,
         save_results: bool = True,
         retry_on_error: RetryBehavior = None,
+        priority: int = 0,
+        memoize: MemoizeBehavior = None,
+        timeout: Optional[float] = None,
+        resources: Optional[Iterable[str]] = None,
+        param_reads: Optional[Iterable[str]] = None,
+        param_writes: Optional[Iterable[str]] = None,
     ):
         """
             An abstract class for Entropy graph node.
@@ -65,6 +92,25 @@ class Node(ABC):
         :param must_run_after: A set of nodes. If those nodes are in the same graph,
                             current node will run after they finish execution.
         :param save_results: True to save the node outputs to results db.
+        :param retry_on_error: retry behavior when the node raises an error.
+        :param priority: nodes with a higher priority start first, when several
+                        nodes are ready to run.
+        :param memoize: if given, the node does not run again when it is called with
+                        the same inputs and kwargs, and its outputs are restored
+                        from an earlier run.
+        :param timeout: maximal duration of a single attempt to run the node, in
+                        seconds. A node that does not finish in time fails with
+                        an EntropyError. A node with a timeout runs in asyncio,
+                        so only async python functions can be interrupted when
+                        they time out; blocking functions fail after they return.
+        :param resources: names of the experiment resources (instruments) the node
+                        uses. Nodes that use the same resource do not run at the
+                        same time, unless the graph allows it with resource_limits.
+        :param param_reads: keys of the ParamStore params the node reads. An
+                        incremental run of the graph runs the node again only if
+                        they changed or expired since its last run.
+        :param param_writes: keys of the ParamStore params the node writes. Nodes
+                        that read them run again when the node runs again.
         """
         self._label = label
         self._input_vars = input_vars
@@ -78,6 +124,12 @@ class Node(ABC):
             self._must_run_after = {}
         self._save_results = save_results
         self._retry_on_error = retry_on_error
+        self._priority = priority
+        self._memoize = memoize
+        self._timeout = timeout
+        self._resources: FrozenSet[str] = frozenset(resources or ())
+        self._param_reads: FrozenSet[str] = frozenset(param_reads or ())
+        self._param_writes: FrozenSet[str] = frozenset(param_writes or ())
 
     @property
     def label(self) -> str:
@@ -86,6 +138,41 @@ class Node(ABC):
         """
         return self._label
 
+    @property
+    def priority(self) -> int:
+        """
+        :return: node scheduling priority
+        """
+        return self._priority
+
+    @property
+    def resources(self) -> FrozenSet[str]:
+        """
+        :return: names of the experiment resources the node uses
+        """
+        return self._resources
+
+    @property
+    def param_reads(self) -> FrozenSet[str]:
+        """
+        :return: keys of the ParamStore params the node reads
+        """
+        return self._param_reads
+
+    @property
+    def param_writes(self) -> FrozenSet[str]:
+        """
+        :return: keys of the ParamStore params the node writes
+        """
+        return self._param_writes
+
+    @property
+    def timeout(self) -> Optional[float]:
+        """
+        :return: maximal duration of a single attempt to run the node, in seconds
+        """
+        return self._timeout
+
     @property
     def outputs(self) -> Dict[str, Output]:
         """
@@ -95,6 +182,18 @@ class Node(ABC):
             output_name: Output(self, output_name) for output_name in self._output_vars
         }
 
+    @property
+    def streams(self) -> Dict[str, Output]:
+        """
+        :return: a dictionary of streamed outputs representations, indexed by name.
+                An input that is connected to a streamed output receives an
+                OutputStream, and its node starts together with current node.
+        """
+        return {
+            output_name: Output(self, output_name, True)
+            for output_name in self._output_vars
+        }
+
     def add_input(self, name: str, parent_node_output: Output):
         """
             adds a new input to current node
@@ -168,14 +267,7 @@ class Node(ABC):
         """
         :return: a set of node's ancestors, including current node
         """
-        parents: Set[Node] = set(
-            [var.node for var in self._input_vars.values()] + list(self._must_run_after)
-        )
-        ancestors = parents.copy()
-        ancestors.add(self)
-        for anc in parents:
-            ancestors.update(anc.ancestors())
-        return ancestors
+        return _ancestors_of([self])
 
     def _should_save_results(self):
         return self._save_results
@@ -183,6 +275,52 @@ class Node(ABC):
     def _retry_on_error_function(self) -> RetryBehavior:
         return self._retry_on_error
 
+    def _memoize_behavior(self) -> Optional[MemoizeBehavior]:
+        return self._memoize
+
+    def _required_kwargs(self) -> Set[str]:
+        """
+        returns the names of the run kwargs that the node can't run without
+        """
+        return set()
+
+    def _streams_outputs(self) -> bool:
+        """
+        True if the node produces its outputs value by value, using _stream()
+        instead of _execute()
+        """
+        return False
+
+    def _cache_key(
+        self,
+        input_values: Dict[str, Any],
+        context: EntropyContext,
+        is_last,
+        kwargs: Dict[str, Any],
+    ) -> Optional[str]:
+        """
+        returns a key that identifies the outputs of the node when it runs with
+        the given inputs and kwargs, or None if they can't be identified.
+        Should be implemented by subclasses that support memoization.
+        """
+        logger.warning(
+            f"Node {self.label} of type {self.__class__.__qualname__} "
+            f"does not support memoization"
+        )
+        return None
+
+
+def _ancestors_of(nodes: Iterable[Node]) -> Set[Node]:
+    # all ancestors of the given nodes, including themselves, visiting every node once
+    ancestors: Set[Node] = set(nodes)
+    to_visit = list(ancestors)
+    while to_visit:
+        for parent in to_visit.pop().get_parents():
+            if parent not in ancestors:
+                ancestors.add(parent)
+                to_visit.append(parent)
+    return ancestors
+
 
 @dataclass(frozen=True, eq=True)
 class _NodeExecutionInfo:
@@ -197,11 +335,41 @@ class GraphHelper:
 
     def __init__(self, nodes: Set[_NodeExecutionInfo]) -> None:
         """
-            Class representing a graph, with relevant graph functions and algorithms
+            Class representing a graph, with relevant graph functions and algorithms.
+            The graph structure is indexed once, so nodes should not be connected
+            after the graph is created.
         :param nodes: complete set of nodes that assembles the graph
         """
         super().__init__()
         self._nodes: Set[_NodeExecutionInfo] = nodes
+        node_set = frozenset(node.node for node in nodes)
+        children: Dict[Node, List[Node]] = {node: [] for node in node_set}
+        self._parents: Dict[Node, Tuple[Node, ...]] = {}
+        self._inputs: Dict[Node, Tuple[Tuple[str, Node, str, bool], ...]] = {}
+        for node in node_set:
+            self._inputs[node] = tuple(
+                (input_name, output.node, output.name, output.stream)
+                for input_name, output in node.get_inputs_by_name().items()
+            )
+            # parents that are not part of the graph are ignored
+            parents = tuple(
+                dict.fromkeys(
+                    parent for parent in node.get_parents() if parent in node_set
+                )
+            )
+            self._parents[node] = parents
+            for parent in parents:
+                children[parent].append(node)
+        self._children: Dict[Node, Tuple[Node, ...]] = {
+            node: tuple(node_children) for node, node_children in children.items()
+        }
+        self._node_set: FrozenSet[Node] = node_set
+        self._leaves: FrozenSet[Node] = frozenset(
+            node for node in node_set if not children[node]
+        )
+        self._topological_order: Optional[Tuple[Node, ...]] = None
+        self._path_lengths: Optional[Dict[Node, int]] = None
+        self._stream_producers: Dict[Node, Node] = self._index_streams()
 
     @property
     def nodes(self) -> Set[Node]:
@@ -209,20 +377,126 @@ class GraphHelper:
             a set of all graph nodes
         :return:
         """
-        return set([node.node for node in self._nodes])
+        return set(self._node_set)
 
     @property
-    def leaves(self) -> Set[Node]:
+    def leaves(self) -> FrozenSet[Node]:
         """
             a set of graph leaves
         :return:
         """
-        end_nodes = {node.node for node in self._nodes}
-        for node in self._nodes:
-            for parent in node.node.get_parents():
-                if parent in end_nodes:
-                    end_nodes.remove(parent)
-        return end_nodes
+        return self._leaves
+
+    def parents(self, node: Node) -> Tuple[Node, ...]:
+        """
+        returns the parents of the given node that are part of the graph
+        """
+        return self._parents[node]
+
+    def children(self, node: Node) -> Tuple[Node, ...]:
+        """
+        returns the children of the given node
+        """
+        return self._children[node]
+
+    def inputs(self, node: Node) -> Tuple[Tuple[str, Node, str, bool], ...]:
+        """
+        returns the input wiring of the given node, as
+        (input name, parent node, parent output name, is streamed) tuples
+        """
+        return self._inputs[node]
+
+    def stream_producer(self, node: Node) -> Optional[Node]:
+        """
+        returns the node that streams outputs to the given node, if any. A node
+        starts together with the node that streams outputs to it.
+        """
+        return self._stream_producers.get(node)
+
+    def stream_consumers(self) -> Dict[Node, Node]:
+        """
+        returns the nodes that receive streamed outputs, mapped to the node that
+        streams them
+        """
+        return self._stream_producers
+
+    def _index_streams(self) -> Dict[Node, Node]:
+        producers: Dict[Node, Node] = {}
+        for node in self._node_set:
+            streamed = {
+                parent
+                for _, parent, _, stream in self._inputs[node]
+                if stream and parent in self._node_set
+            }
+            if not streamed:
+                continue
+            if len(streamed) > 1:
+                raise ValueError(
+                    f"node {node.label} receives streams from more than one node"
+                )
+            producer = streamed.pop()
+            if producer in node._must_run_after or any(
+                parent is producer and not stream
+                for _, parent, _, stream in self._inputs[node]
+            ):
+                raise ValueError(
+                    f"node {node.label} receives a stream from node "
+                    f"{producer.label}, and can't also wait for it to finish"
+                )
+            producers[node] = producer
+        for node, producer in producers.items():
+            if producer in producers:
+                raise ValueError(
+                    f"node {producer.label} receives a stream, so it can't stream "
+                    f"to node {node.label}"
+                )
+        if producers:
+            self._validate_stream_groups(producers)
+        return producers
+
+    def _validate_stream_groups(self, producers: Dict[Node, Node]):
+        # a node that receives a stream starts together with its producer, so the
+        # group of the producer and its consumers starts when all the parents of
+        # the group are done. Groups should not wait for each other.
+        groups = {node: producers.get(node, node) for node in self._node_set}
+        waiting_for = {group: 0 for group in groups.values()}
+        children: Dict[Node, List[Node]] = {group: [] for group in waiting_for}
+        for node in self._node_set:
+            for parent in self._parents[node]:
+                if groups[parent] is not groups[node]:
+                    waiting_for[groups[node]] += 1
+                    children[groups[parent]].append(groups[node])
+                elif parent is not groups[node]:
+                    raise ValueError(
+                        f"nodes {parent.label} and {node.label} start together, "
+                        f"since they receive streams from the same node, so "
+                        f"{node.label} can't wait for {parent.label}"
+                    )
+        order = [group for group, count_ in waiting_for.items() if count_ == 0]
+        for group in order:
+            for child in children[group]:
+                waiting_for[child] -= 1
+                if waiting_for[child] == 0:
+                    order.append(child)
+        if len(order) != len(waiting_for):
+            ordered = set(order)
+            raise ValueError(
+                f"streaming nodes wait for each other: "
+                f"{[group.label for group in waiting_for if group not in ordered]}"
+            )
+
+    def ancestors(self, node: Node) -> Set[Node]:
+        """
+        returns the ancestors of the given node within the graph, including itself
+        """
+        ancestors = {node}
+        to_visit = [node]
+        while to_visit:
+            for parent in self._parents[to_visit.pop()]:
+                if parent not in ancestors:
+                    ancestors.add(parent)
+                    to_visit.append(parent)
+        return ancestors
 
     def export_dot_graph(self) -> Digraph:
         """
@@ -253,12 +527,16 @@ class GraphHelper:
             parents = node.node.get_parents()
             inputs = node.node.get_inputs()
             for parent in parents:
-                input_names = [
-                    input.name
-                    for input in filter(lambda input: input.node == parent, inputs)
-                ]
+                parent_inputs = [input for input in inputs if input.node == parent]
+                input_names = [input.name for input in parent_inputs]
+                streamed = parent_inputs and all(
+                    input.stream for input in parent_inputs
+                )
                 dot.edge(
-                    unique_label(parent), unique_label(node.node), ",".join(input_names)
+                    unique_label(parent),
+                    unique_label(node.node),
+                    ",".join(input_names),
+                    style="dashed" if streamed else None,
                 )
 
         dot.graph_attr["rankdir"] = "LR"
@@ -266,18 +544,216 @@ class GraphHelper:
 
     def nodes_in_topological_order(self) -> List[Node]:
         """
-        returns a complete list of graph nodes, sorted in a topological order
+        returns a complete list of graph nodes, sorted in a topological order.
+        Raises ValueError if the graph has a cycle.
         """
-        g = nx.DiGraph()
+        if self._topological_order is None:
+            waiting_for = {node: len(self._parents[node]) for node in self._node_set}
+            order = [node for node, count_ in waiting_for.items() if count_ == 0]
+            for node in order:
+                for child in self._children[node]:
+                    waiting_for[child] -= 1
+                    if waiting_for[child] == 0:
+                        order.append(child)
+            if len(order) != len(waiting_for):
+                ordered = set(order)
+                raise ValueError(
+                    f"graph has a cycle between nodes: "
+                    f"{[node.label for node in waiting_for if node not in ordered]}"
+                )
+            self._topological_order = tuple(order)
+        return list(self._topological_order)
 
-        nodes = self.nodes
-        for node in nodes:
-            g.add_node(node)
+    def critical_path_lengths(self) -> Dict[Node, int]:
+        """
+        returns the number of nodes in the longest path from every node to a leaf,
+        including the node itself. Raises ValueError if the graph has a cycle.
+        """
+        if self._path_lengths is None:
+            path_lengths = {}
+            for node in reversed(self.nodes_in_topological_order()):
+                path_lengths[node] = 1 + max(
+                    (path_lengths[child] for child in self._children[node]),
+                    default=0,
+                )
+            self._path_lengths = path_lengths
+        return self._path_lengths
 
-        for node in nodes:
-            for parent in node.get_parents():
-                g.add_edge(parent, node)
 
-        sorted_list = nx.topological_sort(g)
+class _NodeScheduler:
+    """
+    Schedules the nodes of a graph using in-degree counting (Kahn's algorithm).
+    A node is ready as soon as all its parents are done. Ready nodes start by
+    their priority, and then, optionally, by the length of the longest path from
+    them to a leaf, so nodes on the critical path start first.
+    Nodes that receive streamed outputs start together with the node that streams
+    them, which waits for their other parents as well.
+    A ready node that uses a resource which is already used by as many running nodes
+    as the resource limit waits, while other ready nodes start.
+    A node that streams outputs starts with the nodes that receive them, only when
+    they all fit in max_concurrency. A group that is larger than max_concurrency
+    starts alone, when no other node runs, since its nodes wait for each other.
+    """
+
+    def __init__(
+        self,
+        graph: GraphHelper,
+        max_concurrency: Optional[int] = None,
+        critical_path_first: bool = True,
+        resource_limits: Optional[Dict[str, int]] = None,
+    ) -> None:
+        """
+            Schedules the nodes of a graph
+        :param graph: the graph to schedule
+        :param max_concurrency: maximal number of nodes that run at the same time
+        :param critical_path_first: order ready nodes of the same priority by the
+                        length of their longest path to a leaf
+        :param resource_limits: maximal number of nodes that use a resource at the
+                        same time, indexed by resource name. Resources that are not
+                        given are used by a single node at a time.
+        """
+        super().__init__()
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency should be at least 1")
+        self._resource_limits = dict(resource_limits or {})
+        for name, limit in self._resource_limits.items():
+            if limit < 1:
+                raise ValueError(f"limit of resource {name} should be at least 1")
+        self._graph = graph
+        self._max_concurrency = max_concurrency
+        order = graph.nodes_in_topological_order()
+        self._producers = graph.stream_consumers()
+        self._consumers: Dict[Node, List[Node]] = {}
+        for node in order:
+            if node in self._producers:
+                self._consumers.setdefault(self._producers[node], []).append(node)
+        self._waiting_for: Dict[Node, int] = {
+            node: 0 for node in order if node not in self._producers
+        }
+        for node in order:
+            group = self._producers.get(node, node)
+            self._waiting_for[group] += sum(
+                1 for parent in graph.parents(node) if parent is not group
+            )
+        self._path_length: Dict[Node, int] = (
+            graph.critical_path_lengths() if critical_path_first else {}
+        )
+        self._sequence = count()
+        self._ready: List[Tuple[int, int, int, Node]] = []
+        self._ready_time: Dict[Node, float] = {}
+        # number of running nodes that use every resource. A node that streams its
+        # outputs holds the resources of the nodes that receive them until all of
+        # them are done
+        self._resources_in_use: Dict[str, int] = {}
+        self._unfinished: Dict[Node, int] = {}
+        self._running = 0
+        self._remaining = len(order)
+        for node in self._waiting_for:
+            if self._waiting_for[node] == 0:
+                self._push(node)
+
+    @property
+    def finished(self) -> bool:
+        """
+        True when all nodes are done
+        """
+        return self._remaining == 0
+
+    @property
+    def running(self) -> int:
+        """
+        number of nodes that were started and are not done yet
+        """
+        return self._running
+
+    def pop_ready(self) -> List[Node]:
+        """
+        returns the ready nodes that can start now, by their order,
+        and marks them as running. A node that streams outputs is followed by the
+        nodes that receive them.
+        """
+        started = []
+        waiting = []
+        while self._ready and (
+            self._max_concurrency is None or self._running < self._max_concurrency
+        ):
+            node = self._ready[0][-1]
+            group = [node] + self._consumers.get(node, [])
+            if not self._fits_concurrency(len(group)):
+                # waits for running nodes, so nodes keep starting by their order
+                break
+            entry = heapq.heappop(self._ready)
+            resources = self._group_resources(group)
+            if not self._resources_available(resources):
+                waiting.append(entry)
+                continue
+            for resource in resources:
+                self._resources_in_use[resource] = (
+                    self._resources_in_use.get(resource, 0) + 1
+                )
+            self._unfinished[node] = len(group)
+            started.extend(group)
+            self._running += len(group)
+        for entry in waiting:
+            heapq.heappush(self._ready, entry)
+        return started
+
+    def ready_time(self, node: Node) -> Optional[float]:
+        """
+        returns when all the node parents were done, in seconds since the epoch
+        """
+        return self._ready_time.get(node)
 
-        return list(sorted_list)
+    def done(self, node: Node):
+        """
+            marks a running node as done, making its children ready when all their
+            parents are done
+        :param node: the node that is done
+        """
+        self._running -= 1
+        self._remaining -= 1
+        group = self._producers.get(node, node)
+        self._unfinished[group] -= 1
+        if self._unfinished[group] == 0:
+            del self._unfinished[group]
+            members = [group] + self._consumers.get(group, [])
+            for resource in self._group_resources(members):
+                self._resources_in_use[resource] -= 1
+        for child in self._graph.children(node):
+            group = self._producers.get(child, child)
+            if group is node:
+                continue
+            self._waiting_for[group] -= 1
+            if self._waiting_for[group] == 0:
+                self._push(group)
+
+    def _fits_concurrency(self, nodes: int) -> bool:
+        if self._max_concurrency is None or self._running == 0:
+            return True
+        return self._running + nodes <= self._max_concurrency
+
+    @staticmethod
+    def _group_resources(group: List[Node]) -> Set[str]:
+        return set().union(*(node.resources for node in group))
+
+    def _resources_available(self, resources: Set[str]) -> bool:
+        return all(
+            self._resources_in_use.get(resource, 0)
+            < self._resource_limits.get(resource, 1)
+            for resource in resources
+        )
+
+    def _push(self, node: Node):
+        group = [node] + self._consumers.get(node, [])
+        ready_time = time.time()
+        for member in group:
+            self._ready_time[member] = ready_time
+        heapq.heappush(
+            self._ready,
+            (
+                -max(member.priority for member in group),
+                -max(self._path_length.get(member, 0) for member in group),
+                next(self._sequence),
+                node,
+            ),
+        )
@@ -0,0 +1,106 @@
+""" Incremental execution of graph experiments, driven by ParamStore changes.
+
+Nodes declare the keys of the ParamStore params they read (and write). Every node
+that runs incrementally records a params key, a hash of its label, outputs and the
+values of the params it read, as metadata of its stage. A later incremental run
+restores the outputs of a node from the newest stage with the same params key,
+instead of running it, unless one of its params expired, or one of its parents or
+of the nodes that write its params runs again.
+"""
+import hashlib
+from typing import Any, Dict, Optional, Set, List
+
+from entropylab.logger import logger
+from entropylab.pipeline.api.data_reader import DataReader, MetadataRecord
+from entropylab.pipeline.api.graph import GraphHelper, Node
+from entropylab.pipeline.api.node_cache import _update_with_value
+from entropylab.pipeline.params.param_store import ParamStore
+
+PARAMS_KEY_LABEL = "entropy_params_key"
+"""Label of the metadata that records the params key of a node stage"""
+
+
+def params_key(node: Node, param_store: ParamStore) -> Optional[str]:
+    """
+        returns a hash of the node label, outputs and the current values of the
+        params it reads, or None if the values can't be hashed
+    :param node: graph node
+    :param param_store: the params the node reads
+    """
+    digest = hashlib.sha256()
+    digest.update(node.label.encode())
+    digest.update(repr(sorted(node._output_vars)).encode())
+    try:
+        for key in sorted(node.param_reads):
+            digest.update(key.encode())
+            _update_with_value(
+                digest, param_store.get_value(key) if key in param_store else None
+            )
+    except Exception as e:
+        logger.warning(f"Node {node.label} params can not be hashed: {e}")
+        return None
+    return digest.hexdigest()
+
+
+def up_to_date_outputs(
+    graph: GraphHelper, param_store: ParamStore, reader: DataReader
+) -> Dict[Node, Dict[str, Any]]:
+    """
+        returns the outputs of the graph nodes that do not need to run again, from
+        the newest run of every node with the same params key
+    :param graph: the graph to run incrementally
+    :param param_store: current params
+    :param reader: results db of earlier runs
+    """
+    newest: Dict[str, MetadataRecord] = {}
+    for record in reader.get_metadata_records(label=PARAMS_KEY_LABEL):
+        if record.data not in newest or newest[record.data].time < record.time:
+            newest[record.data] = record
+    outputs: Dict[Node, Dict[str, Any]] = {}
+    stale: List[Node] = []
+    for node in graph.nodes:
+        node_outputs = _stored_outputs(node, param_store, reader, newest)
+        if node_outputs is None:
+            stale.append(node)
+        else:
+            outputs[node] = node_outputs
+    # nodes that run again also make the nodes that depend on them, by an input or
+    # by the params they write, run again
+    readers: Dict[str, Set[Node]] = {}
+    for node in graph.nodes:
+        for key in node.param_reads:
+            readers.setdefault(key, set()).add(node)
+    while stale:
+        node = stale.pop()
+        dependents = set(graph.children(node))
+        for key in node.param_writes:
+            dependents.update(readers.get(key, ()))
+        for dependent in dependents:
+            if outputs.pop(dependent, None) is not None:
+                stale.append(dependent)
+    return outputs
+
+
+def _stored_outputs(
+    node: Node,
+    param_store: ParamStore,
+    reader: DataReader,
+    newest: Dict[str, MetadataRecord],
+) -> Optional[Dict[str, Any]]:
+    if node._streams_outputs():
+        return None
+    for key in node.param_reads:
+        if key in param_store and param_store.get_param(key).has_expired:
+            logger.info(f"Param {key} of node {node.label} expired")
+            return None
+    key = params_key(node, param_store)
+    record = newest.get(key) if key is not None else None
+    if record is None:
+        return None
+    results = {
+        result.label: result.data
+        for result in reader.get_results(record.experiment_id, stage=record.stage)
+    }
+    if not all(name in results for name in node._output_vars):
+        return None
+    return {name: results[name] for name in node._output_vars}
@@ -1,11 +1,23 @@
+import os
+import pickle
 import random
+import sys
+import tempfile
+import weakref
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import count
 from time import time_ns
 from typing import List, Optional, Iterable, Any, Dict, Tuple
 
+import h5py
+import numpy as np
 from pandas import DataFrame
 from plotly import graph_objects as go
 
+from entropylab.config import settings
+from entropylab.logger import logger
 from entropylab.pipeline.api.data_reader import (
     DataReader,
     ResultRecord,
@@ -17,6 +29,7 @@ from entropylab.pipeline.api.data_reader import (
     FigureRecord,
 )
 from entropylab.pipeline.api.data_writer import DataWriter, PlotSpec, NodeData
+from entropylab.pipeline.api.errors import EntropyError
 from entropylab.pipeline.api.data_writer import (
     ExperimentInitialData,
     ExperimentEndData,
@@ -25,6 +38,178 @@ from entropylab.pipeline.api.data_writer import (
     Debug,
 )
 
+_RESULTS = "results"
+_METADATA = "metadata"
+
+
+@dataclass
+class _MemoryEntry:
+    """
+    A single result or metadata entry, kept in memory or spilled to disk
+    """
+
+    id: int
+    experiment_id: int
+    label: str
+    stage: int
+    story: Optional[str]
+    time: datetime
+    data: Any = None
+    spilled: bool = False
+
+
+def _payload_size(data: Any) -> int:
+    """Estimates the number of bytes the given payload occupies in memory,
+    without serializing it"""
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if isinstance(data, (bytes, bytearray, str)):
+        return len(data)
+    if isinstance(data, (list, tuple, set, frozenset)):
+        return sys.getsizeof(data) + sum(_payload_size(item) for item in data)
+    if isinstance(data, dict):
+        return sys.getsizeof(data) + sum(
+            _payload_size(key) + _payload_size(value) for key, value in data.items()
+        )
+    return sys.getsizeof(data)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _SpillFile:
+    """
+    A temporary HDF5 file that holds payloads evicted from memory.
+    The file is created on first use and removed when closed.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._file: Optional[h5py.File] = None
+        self._path: Optional[str] = None
+        self._finalizer = None
+
+    def write(self, kind: str, entry_id: int, data: Any) -> None:
+        file = self._get_file()
+        name = f"{kind}/{entry_id}"
+        if isinstance(data, np.ndarray) and data.dtype.kind in "biufc":
+            file.create_dataset(name, data=data)
+        else:
+            # np.void turns our bytes to HDF5 Opaque:
+            dset = file.create_dataset(name, data=np.void(pickle.dumps(data)))
+            dset.attrs.create("pickled", True)
+
+    def read(self, kind: str, entry_id: int) -> Any:
+        name = f"{kind}/{entry_id}"
+        if self._file is None or name not in self._file:
+            raise EntropyError(
+                f"The payload of {kind} entry {entry_id} was spilled to disk, and "
+                f"was removed when the in-memory db was closed"
+            )
+        dset = self._file[name]
+        data = dset[()]
+        if dset.attrs.get("pickled", False):
+            return pickle.loads(data.tobytes())
+        return data
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._file = None
+        self._path = None
+
+    def _get_file(self) -> h5py.File:
+        if self._file is None:
+            fd, self._path = tempfile.mkstemp(prefix="entropy_spill_", suffix=".hdf5")
+            os.close(fd)
+            self._file = h5py.File(self._path, "w")
+            logger.debug(f"In-memory results are spilling to '{self._path}'")
+            self._finalizer = weakref.finalize(
+                self, _SpillFile._cleanup, self._file, self._path
+            )
+        return self._file
+
+    @staticmethod
+    def _cleanup(file: h5py.File, path: str):
+        try:
+            file.close()
+        finally:
+            _remove_file(path)
+
+
+class _IndexedEntries:
+    """
+    Results or metadata entries, indexed by (label, stage), label, stage
+    and experiment for constant time lookups
+    """
+
+    def __init__(self, kind: str, owner: "MemoryOnlyDataReaderWriter") -> None:
+        super().__init__()
+        self._kind = kind
+        self._owner = owner
+        self._ids = count(start=0, step=1)
+        self._entries: Dict[int, _MemoryEntry] = {}
+        self._by_label_and_stage: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+        self._by_label: Dict[str, List[int]] = defaultdict(list)
+        self._by_stage: Dict[int, List[int]] = defaultdict(list)
+        self._by_experiment: Dict[int, List[int]] = defaultdict(list)
+
+    def add(
+        self,
+        experiment_id: int,
+        label: str,
+        stage: int,
+        data: Any,
+        story: Optional[str] = None,
+    ) -> _MemoryEntry:
+        entry = _MemoryEntry(
+            next(self._ids), experiment_id, label, stage, story, datetime.now(), data
+        )
+        self._entries[entry.id] = entry
+        self._by_label_and_stage[(label, stage)].append(entry.id)
+        self._by_label[label].append(entry.id)
+        self._by_stage[stage].append(entry.id)
+        self._by_experiment[experiment_id].append(entry.id)
+        self._owner._track(self._kind, entry)
+        return entry
+
+    def find(
+        self,
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+        stage: Optional[int] = None,
+    ) -> List[_MemoryEntry]:
+        if label and stage is not None:
+            ids = self._by_label_and_stage.get((label, stage), [])
+        elif label:
+            ids = self._by_label.get(label, [])
+        elif stage is not None:
+            ids = self._by_stage.get(stage, [])
+        elif experiment_id is not None:
+            ids = self._by_experiment.get(experiment_id, [])
+        else:
+            ids = self._entries.keys()
+        entries = (self._entries[entry_id] for entry_id in ids)
+        if experiment_id is not None:
+            entries = (e for e in entries if e.experiment_id == experiment_id)
+        return list(entries)
+
+    def last_of_experiment(self, experiment_id: int) -> Optional[_MemoryEntry]:
+        ids = self._by_experiment.get(experiment_id)
+        if ids:
+            return self._entries[ids[-1]]
+        return None
+
+    def data_of(self, entry: _MemoryEntry) -> Any:
+        if entry.spilled:
+            return self._owner._spill_file.read(self._kind, entry.id)
+        return entry.data
+
 
 class MemoryOnlyDataReaderWriter(DataWriter, DataReader):
     """
@@ -33,36 +218,95 @@ class MemoryOnlyDataReaderWriter(DataWriter, DataReader):
     Used if no other implementation of the db is used in entropy.
     """
 
-    def __init__(self):
+    def __init__(self, max_memory_bytes: Optional[int] = None):
+        """
+            Implementation of DataWriter and DataReader that saves all the data
+            to objects in memory.
+        :param max_memory_bytes: optional memory budget for result and metadata
+                        payloads. When exceeded, the oldest payloads are moved to a
+                        temporary HDF5 file that is removed when the writer is closed.
+                        Defaults to the "memory_db.max_memory_bytes" setting, or no
+                        limit.
+        """
         super(DataWriter, self).__init__()
         super(DataReader, self).__init__()
-        self._initial_data: Optional[ExperimentInitialData] = None
-        self._end_data: Optional[ExperimentEndData] = None
-        self._results: List[Tuple[RawResultData, datetime]] = []
-        self._metadata: List[Tuple[Metadata, datetime]] = []
-        self._debug: Optional[Debug] = None
-        self._plot: Dict[PlotSpec, Any] = {}
+        if max_memory_bytes is None:
+            max_memory_bytes = settings.get("memory_db.max_memory_bytes", None)
+        self._max_memory_bytes: Optional[int] = max_memory_bytes
+        self._memory_bytes = 0
+        self._resident: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._spill_file = _SpillFile()
+        self._initial_data: Dict[int, ExperimentInitialData] = {}
+        self._end_data: Dict[int, ExperimentEndData] = {}
+        self._results = _IndexedEntries(_RESULTS, self)
+        self._metadata = _IndexedEntries(_METADATA, self)
+        self._debug: Dict[int, Debug] = {}
+        self._plot: Dict[int, Dict[PlotSpec, Any]] = defaultdict(dict)
         self._figure: Dict[int, List[FigureRecord]] = {}
-        self._nodes: List[NodeData] = []
+        self._nodes: Dict[str, List[Tuple[int, NodeData]]] = defaultdict(list)
+
+    def close(self):
+        """
+        releases the temporary spill file, if one was created. The payloads that
+        were spilled to it can not be read afterwards
+        """
+        self._spill_file.close()
+
+    @property
+    def memory_bytes(self) -> int:
+        """
+        estimated size of the result and metadata payloads currently held in memory
+        """
+        return self._memory_bytes
+
+    def _track(self, kind: str, entry: _MemoryEntry):
+        if self._max_memory_bytes is None:
+            return
+        size = _payload_size(entry.data)
+        self._resident[(kind, entry.id)] = size
+        self._memory_bytes += size
+        self._spill_until_within_budget()
+
+    def _spill_until_within_budget(self):
+        unspillable = []
+        while self._memory_bytes > self._max_memory_bytes and self._resident:
+            (kind, entry_id), size = self._resident.popitem(last=False)
+            entries = self._results if kind == _RESULTS else self._metadata
+            entry = entries._entries[entry_id]
+            try:
+                self._spill_file.write(kind, entry_id, entry.data)
+            except Exception as e:
+                logger.debug(f"Could not spill {kind} entry {entry_id} to disk: {e}")
+                unspillable.append(((kind, entry_id), size))
+                continue
+            entry.data = None
+            entry.spilled = True
+            self._memory_bytes -= size
+        for key, size in reversed(unspillable):
+            self._resident[key] = size
+            self._resident.move_to_end(key, last=False)
 
     def save_experiment_initial_data(self, initial_data: ExperimentInitialData) -> int:
-        self._initial_data = initial_data
-        return time_ns()
+        experiment_id = time_ns()
+        self._initial_data[experiment_id] = initial_data
+        return experiment_id
 
     def save_experiment_end_data(self, experiment_id: int, end_data: ExperimentEndData):
-        self._end_data = end_data
+        self._end_data[experiment_id] = end_data
 
     def save_result(self, experiment_id: int, result: RawResultData):
-        self._results.append((result, datetime.now()))
+        self._results.add(
+            experiment_id, result.label, result.stage, result.data, result.story
+        )
 
     def save_metadata(self, experiment_id: int, metadata: Metadata):
-        self._metadata.append((metadata, datetime.now()))
+        self._metadata.add(experiment_id, metadata.label, metadata.stage, metadata.data)
 
     def save_debug(self, experiment_id: int, debug: Debug):
-        self._debug = debug
+        self._debug[experiment_id] = debug
 
     def save_plot(self, experiment_id: int, plot: PlotSpec, data: Any):
-        self._plot[plot] = data
+        self._plot[experiment_id][plot] = data
 
     def save_figure(self, experiment_id: int, figure: go.Figure) -> None:
         figure_record = FigureRecord(
@@ -77,7 +321,7 @@ class MemoryOnlyDataReaderWriter(DataWriter, DataReader):
             self._figure[experiment_id] = [figure_record]
 
     def save_node(self, experiment_id: int, node_data: NodeData):
-        self._nodes.append(node_data)
+        self._nodes[node_data.label].append((experiment_id, node_data))
 
     def get_experiments_range(self, starting_from_index: int, count: int) -> DataFrame:
         raise NotImplementedError()
@@ -92,19 +336,17 @@ class MemoryOnlyDataReaderWriter(DataWriter, DataReader):
         raise NotImplementedError()
 
     def get_experiment_record(self, experiment_id: int) -> Optional[ExperimentRecord]:
-        if self._initial_data:
-            if self._end_data:
-                end_time = self._end_data.end_time
-            else:
-                end_time = None
+        initial_data = self._initial_data.get(experiment_id)
+        if initial_data:
+            end_data = self._end_data.get(experiment_id)
             return ExperimentRecord(
                 experiment_id,
-                self._initial_data.label,
-                ScriptViewer([self._initial_data.script]),
-                self._initial_data.start_time,
-                end_time,
-                self._initial_data.story,
-                self._end_data.success,
+                initial_data.label,
+                ScriptViewer([initial_data.script]),
+                initial_data.start_time,
+                end_data.end_time if end_data else None,
+                initial_data.story,
+                end_data.success if end_data else False,
             )
         else:
             return None
@@ -115,20 +357,10 @@ class MemoryOnlyDataReaderWriter(DataWriter, DataReader):
         label: Optional[str] = None,
         stage: Optional[int] = None,
     ) -> Iterable[ResultRecord]:
-        return list(
-            ResultRecord(
-                experiment_id,
-                str(self._results.index(x)),
-                x[0].label,
-                x[0].story,
-                x[0].stage,
-                x[0].data,
-                x[1],
-            )
-            for x in self._results
-            if (not label or x[0].label == label)
-            and (stage is None or x[0].stage == stage)
-        )
+        return [
+            self._to_result_record(entry)
+            for entry in self._results.find(experiment_id, label, stage)
+        ]
 
     def get_metadata_records(
         self,
@@ -136,74 +368,81 @@ class MemoryOnlyDataReaderWriter(DataWriter, DataReader):
         label: Optional[str] = None,
         stage: Optional[int] = None,
     ) -> Iterable[MetadataRecord]:
-        return list(
+        return [
             MetadataRecord(
-                experiment_id,
-                str(self._metadata.index(x)),
-                x[0].label,
-                x[0].stage,
-                x[0].data,
-                x[1],
+                entry.experiment_id,
+                str(entry.id),
+                entry.label,
+                entry.stage,
+                self._metadata.data_of(entry),
+                entry.time,
             )
-            for x in self._metadata
-            if (not label or x[0].label == label)
-            and (stage is None or x[0].stage == stage)
-        )
+            for entry in self._metadata.find(experiment_id, label, stage)
+        ]
 
     def get_debug_record(self, experiment_id: int) -> Optional[DebugRecord]:
-        if self._debug:
+        debug = self._debug.get(experiment_id)
+        if debug:
             return DebugRecord(
                 experiment_id,
                 0,
-                self._debug.python_env,
-                self._debug.python_history,
-                self._debug.station_specs,
-                self._debug.extra,
+                debug.python_env,
+                debug.python_history,
+                debug.station_specs,
+                debug.extra,
             )
         else:
             return None
 
     def get_plots(self, experiment_id: int) -> List[PlotRecord]:
+        plots = self._plot.get(experiment_id, {})
         return [
             PlotRecord(
                 experiment_id,
                 id(plot),
-                self._plot[plot],
+                plots[plot],
                 plot.generator(),
                 plot.label,
                 plot.story,
             )
-            for plot in self._plot
+            for plot in plots
         ]
 
     def get_figures(self, experiment_id: int) -> List[FigureRecord]:
-        return self._figure[experiment_id]
+        return self._figure.get(experiment_id, [])
 
     def get_node_stage_ids_by_label(
         self, label: str, experiment_id: Optional[int] = None
     ) -> List[int]:
-        return list(x.stage_id for x in self._nodes if (not label or x.label == label))
+        if label:
+            nodes = self._nodes.get(label, [])
+        else:
+            nodes = [node for nodes in self._nodes.values() for node in nodes]
+        return [
+            node_data.stage_id
+            for node_experiment_id, node_data in nodes
+            if experiment_id is None or node_experiment_id == experiment_id
+        ]
 
     def get_last_result_of_experiment(
         self, experiment_id: int
     ) -> Optional[ResultRecord]:
-        if len(self._results) > 0:
-            raw_result = self._results[-1]
-            if raw_result:
-                index = self._results.index(raw_result)
-                return ResultRecord(
-                    experiment_id,
-                    str(index),
-                    raw_result[0].label,
-                    raw_result[0].story,
-                    raw_result[0].stage,
-                    raw_result[0].data,
-                    raw_result[1],
-                )
-            else:
-                return None
+        entry = self._results.last_of_experiment(experiment_id)
+        if entry:
+            return self._to_result_record(entry)
         else:
             return None
 
     def update_experiment_favorite(self, experiment_id: int, favorite: bool) -> None:
         raise NotImplementedError()
+
+    def _to_result_record(self, entry: _MemoryEntry) -> ResultRecord:
+        return ResultRecord(
+            entry.experiment_id,
+            str(entry.id),
+            entry.label,
+            entry.story,
+            entry.stage,
+            self._results.data_of(entry),
+            entry.time,
+        )
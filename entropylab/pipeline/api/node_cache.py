@@ -0,0 +1,257 @@
+""" Memoization of graph node outputs.
+
+A node that is memoized is identified by a cache key, a hash of its label, the
+bytecode and closure values of its program and the values it is called with (inputs
+and run kwargs).
+When a node with the same key already ran, its outputs are restored instead of
+running it again, from a NodeResultCache in memory or from the results db of
+previous runs, where the cache key of every memoized stage is saved as indexed
+metadata (see DataWriter.save_indexed_metadata()).
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from types import CodeType
+from typing import Any, Dict, Optional, Iterable, List
+
+import numpy as np
+
+from entropylab.config import settings
+from entropylab.logger import logger
+from entropylab.pipeline.api.data_reader import DataReader
+from entropylab.pipeline.api.memory_reader_writer import _payload_size
+
+CACHE_KEY_LABEL = "entropy_cache_key"
+"""Label of the metadata that records the cache key of a node stage"""
+
+
+@dataclass
+class _CacheEntry:
+    outputs: Dict[str, Any]
+    created: float
+    size: int
+
+
+class NodeResultCache:
+    """
+    An in-memory cache of node outputs, indexed by cache key.
+    Least recently used entries are evicted when the cache holds more than
+    max_entries entries, or more than max_bytes bytes of outputs.
+    Outputs are cached by reference, so nodes should not modify their inputs.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        """
+            An in-memory cache of node outputs.
+        :param max_entries: maximal number of cached node outputs. Defaults to the
+                        "memoization.max_entries" setting, or 1024.
+        :param max_bytes: maximal estimated size of cached outputs. Defaults to the
+                        "memoization.max_bytes" setting, or no limit.
+        """
+        super().__init__()
+        if max_entries is None:
+            max_entries = settings.get("memoization.max_entries", 1024)
+        if max_bytes is None:
+            max_bytes = settings.get("memoization.max_bytes", None)
+        self.max_entries: int = max_entries
+        self.max_bytes: Optional[int] = max_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __deepcopy__(self, memo):
+        # graphs copy their nodes, and the copies should share the same cache
+        return self
+
+    @property
+    def size_bytes(self) -> int:
+        """
+        estimated size of all cached outputs
+        """
+        return self._size
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+            returns the cached outputs of the given key, or None
+        :param key: node cache key
+        :param ttl: maximal age of the outputs in seconds, older outputs are evicted
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if ttl is not None and time.time() - entry.created > ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.outputs
+
+    def put(self, key: str, outputs: Dict[str, Any]) -> None:
+        """
+            caches the outputs of a node
+        :param key: node cache key
+        :param outputs: node outputs, indexed by output name
+        """
+        size = sum(_payload_size(value) for value in outputs.values())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(outputs, time.time(), size)
+            self._size += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._size > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+            removes the outputs of the given key from the cache
+        :param key: node cache key. If None, the cache is cleared.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._size = 0
+            elif key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        self._size -= self._entries.pop(key).size
+
+
+_default_cache: Optional[NodeResultCache] = None
+
+
+def default_node_cache() -> NodeResultCache:
+    """
+    the cache that is shared by all memoized nodes of the python session
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = NodeResultCache()
+    return _default_cache
+
+
+def program_fingerprint(program) -> Optional[bytes]:
+    """
+        a digest of the bytecode, constants, default arguments and closure values
+        of a python function or coroutine. Changes to functions it calls, and to
+        the globals it reads, are not detected.
+    :param program: python function
+    :return: the digest, or None if the closure values can't be hashed
+    """
+    digest = hashlib.sha256()
+    function = getattr(program, "__func__", program)
+    code = getattr(function, "__code__", None)
+    if code is None:
+        # a callable object
+        code = type(program).__call__.__code__
+    _update_with_code(digest, code)
+    digest.update(repr(getattr(function, "__defaults__", None)).encode())
+    digest.update(repr(getattr(function, "__kwdefaults__", None)).encode())
+    try:
+        for cell in getattr(function, "__closure__", None) or ():
+            _update_with_value(digest, cell.cell_contents)
+    except Exception as e:
+        logger.warning(
+            f"Program {getattr(function, '__qualname__', program)} is not memoized, "
+            f"can not hash its closure: {e}"
+        )
+        return None
+    return digest.digest()
+
+
+def has_closure(program) -> bool:
+    """
+    True if the program captures values, that can change between calls
+    """
+    function = getattr(program, "__func__", program)
+    return bool(getattr(function, "__closure__", None))
+
+
+def _update_with_code(digest, code: CodeType):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _update_with_code(digest, const)
+        else:
+            digest.update(repr(const).encode())
+
+
+def cache_key(
+    label: str,
+    fingerprint: Optional[bytes],
+    output_vars: Iterable[str],
+    args: List[Any],
+    kwargs: Dict[str, Any],
+) -> Optional[str]:
+    """
+        returns the cache key of a node call, or None if the call arguments (or
+        the program closure) can't be hashed
+    :param label: node label
+    :param fingerprint: the node program fingerprint, None if it can't be hashed
+    :param output_vars: node output names
+    :param args: positional arguments of the program
+    :param kwargs: keyword arguments of the program
+    """
+    if fingerprint is None:
+        return None
+    digest = hashlib.sha256()
+    digest.update(label.encode())
+    digest.update(fingerprint)
+    digest.update(repr(sorted(output_vars)).encode())
+    try:
+        for value in args:
+            _update_with_value(digest, value)
+        for name in sorted(kwargs):
+            digest.update(name.encode())
+            _update_with_value(digest, kwargs[name])
+    except Exception as e:
+        logger.warning(f"Node {label} is not memoized, can not hash its inputs: {e}")
+        return None
+    return digest.hexdigest()
+
+
+def _update_with_value(digest, value: Any):
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(f"ndarray{value.dtype.str}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).data)
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+
+
+def find_cached_outputs(
+    reader: Any, key: str, output_vars: Iterable[str], ttl: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+        looks for the outputs of a node stage with the given cache key in the
+        results db, newest first
+    :param reader: results db, ignored if it does not implement DataReader
+    :param key: node cache key
+    :param output_vars: node output names
+    :param ttl: maximal age of the outputs in seconds
+    """
+    if not isinstance(reader, DataReader):
+        return None
+    now = datetime.now()
+    for record in reader.get_metadata_records_by_value(CACHE_KEY_LABEL, key):
+        if ttl is not None and (now - record.time).total_seconds() > ttl:
+            break
+        results = {
+            result.label: result.data
+            for result in reader.get_results(record.experiment_id, stage=record.stage)
+        }
+        if all(name in results for name in output_vars):
+            return {name: results[name] for name in output_vars}
+    return None
@@ -0,0 +1,107 @@
+""" Streaming of node outputs between graph nodes.
+
+A node input that is connected to node.streams["x"] instead of node.outputs["x"]
+receives an OutputStream. The consuming node starts together with the node that
+produces the output, and receives every value of the output as soon as it is
+produced, through a bounded queue, so producing and processing overlap.
+"""
+import asyncio
+import queue
+import threading
+from typing import Any, Optional, Iterator, AsyncIterator
+
+from entropylab.config import settings
+from entropylab.pipeline.api.errors import EntropyError
+
+_END = object()
+_POLL_INTERVAL = 0.1
+
+
+class OutputStream:
+    """
+    The values of a node output, received while the node that produces them
+    is still running. Iterate over the stream, with for or async for, to get every
+    value as soon as it is produced. A stream can be iterated once.
+    """
+
+    def __init__(self, name: str, max_queued_values: Optional[int] = None) -> None:
+        """
+            The values of a node output, received while they are produced.
+        :param name: name of the streamed output, for error messages
+        :param max_queued_values: maximal number of values that were produced and
+                        not consumed yet. The producing node waits when the stream
+                        is full. Defaults to the "streaming.max_queued_values"
+                        setting, or 64.
+        """
+        super().__init__()
+        if max_queued_values is None:
+            max_queued_values = settings.get("streaming.max_queued_values", 64)
+        self.name = name
+        self._queue: queue.Queue = queue.Queue(max_queued_values)
+        self._abandoned = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._done = False
+
+    def put(self, value: Any) -> None:
+        """
+        adds a value to the stream, waiting while the stream is full. Values are
+        dropped once the consuming node returned.
+        """
+        while not self._abandoned.is_set():
+            try:
+                self._queue.put(value, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    async def put_async(self, value: Any) -> None:
+        """
+        adds a value to the stream, without blocking the event loop while the
+        stream is full
+        """
+        try:
+            self._queue.put_nowait(value)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self.put, value)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """
+            ends the stream
+        :param error: the error the producing node failed with, raised by the
+                    stream when the consumer reaches it
+        """
+        self._error = error
+        self.put(_END)
+
+    async def close_async(self, error: Optional[BaseException] = None) -> None:
+        self._error = error
+        await self.put_async(_END)
+
+    def _abandon(self) -> None:
+        # called when the consuming node returned, so the producer does not wait
+        # for it anymore
+        self._abandoned.set()
+
+    def __iter__(self) -> Iterator[Any]:
+        while not self._done:
+            value = self._queue.get()
+            if value is _END:
+                self._end()
+                return
+            yield value
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        while not self._done:
+            value = await loop.run_in_executor(None, self._queue.get)
+            if value is _END:
+                self._end()
+                return
+            yield value
+
+    def _end(self):
+        self._done = True
+        if self._error is not None:
+            raise EntropyError(
+                f"stream of {self.name} ended with an error in the producing node"
+            ) from self._error
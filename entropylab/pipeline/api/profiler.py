@@ -0,0 +1,236 @@
+""" Profiling of graph experiments.
+
+Every node that runs in a graph records when it became ready to run (all its
+parents were done), when it started and ended, how long it spent saving its results
+and how many attempts it took. The profile of a node is saved as metadata of the
+node stage, next to the node record, and the profiles of all the nodes of an
+experiment are read back as a GraphProfile, which can be exported as a Chrome
+trace (chrome://tracing, https://ui.perfetto.dev).
+"""
+import json
+from dataclasses import dataclass, asdict
+from typing import Optional, List, Dict, Any, Tuple
+
+from pandas import DataFrame
+
+NODE_PROFILE_LABEL = "node_profile"
+"""Label of the metadata that records the profile of a node stage"""
+
+
+@dataclass
+class NodeProfile:
+    """
+    Timing of a single execution of a graph node.
+    Times are seconds since the epoch, durations are in seconds.
+
+    Attributes:
+        label: node label
+        stage_id: stage of the node within the experiment
+        status: "done", "cached" (outputs restored by memoization), "failed"
+            or "cancelled"
+        start_time: when the node started running
+        end_time: when the node finished, including saving its results
+        ready_time: when all the node parents were done, None when unknown
+        execution_time: time spent running the node program
+        serialization_time: time spent saving the node results
+        attempts: number of times the node program was called
+    """
+
+    label: str
+    stage_id: int
+    status: str
+    start_time: float
+    end_time: float
+    ready_time: Optional[float] = None
+    execution_time: float = 0
+    serialization_time: float = 0
+    attempts: int = 1
+
+    @property
+    def queue_wait(self) -> float:
+        """
+        time from when the node was ready until it started
+        """
+        if self.ready_time is None:
+            return 0
+        return max(0.0, self.start_time - self.ready_time)
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "NodeProfile":
+        return NodeProfile(**data)
+
+
+class GraphProfile:
+    """
+    The profiles of all the nodes that ran in a graph experiment
+    """
+
+    def __init__(self, nodes: List[NodeProfile]) -> None:
+        super().__init__()
+        self.nodes: List[NodeProfile] = sorted(
+            nodes, key=lambda node: (node.start_time, node.stage_id)
+        )
+
+    @property
+    def wall_time(self) -> float:
+        """
+        time from when the first node was ready until the last node ended
+        """
+        if not self.nodes:
+            return 0
+        return max(node.end_time for node in self.nodes) - self._origin()
+
+    @property
+    def busy_time(self) -> float:
+        """
+        total time the nodes spent running, including saving their results
+        """
+        return sum(node.end_time - node.start_time for node in self.nodes)
+
+    @property
+    def parallelism(self) -> float:
+        """
+        average number of nodes that ran at the same time
+        """
+        wall_time = self.wall_time
+        if wall_time == 0:
+            return 0
+        return self.busy_time / wall_time
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        returns a DataFrame with a row per node execution, by start time
+        """
+        return DataFrame(
+            [
+                dict(node.to_dict(), queue_wait=node.queue_wait, retries=node.retries)
+                for node in self.nodes
+            ]
+        )
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        returns the profile in the Chrome trace event format, as used by
+        chrome://tracing and Perfetto. Node executions are shown in lanes of nodes
+        that ran at the same time, with the time they spent saving results nested
+        within them. The time nodes spent waiting to start is shown in separate
+        lanes.
+        """
+        origin = self._origin()
+        events = []
+        running = [(node.start_time, node.end_time, node) for node in self.nodes]
+        for lane, (start, end, node) in _assign_lanes(running):
+            events.append(
+                _complete_event(
+                    node.label,
+                    "node",
+                    start - origin,
+                    end - start,
+                    1,
+                    lane,
+                    dict(
+                        stage_id=node.stage_id,
+                        status=node.status,
+                        attempts=node.attempts,
+                        queue_wait=node.queue_wait,
+                    ),
+                )
+            )
+            if node.serialization_time > 0:
+                events.append(
+                    _complete_event(
+                        "save results",
+                        "serialization",
+                        end - node.serialization_time - origin,
+                        node.serialization_time,
+                        1,
+                        lane,
+                        dict(stage_id=node.stage_id),
+                    )
+                )
+        waiting = [
+            (node.ready_time, node.start_time, node)
+            for node in self.nodes
+            if node.queue_wait > 0
+        ]
+        for lane, (start, end, node) in _assign_lanes(waiting):
+            events.append(
+                _complete_event(
+                    node.label,
+                    "queue",
+                    start - origin,
+                    end - start,
+                    2,
+                    lane,
+                    dict(stage_id=node.stage_id),
+                )
+            )
+        events.append(_process_name(1, "nodes"))
+        events.append(_process_name(2, "waiting to start"))
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path: str):
+        """
+            saves the profile as a Chrome trace JSON file, that can be opened in
+            chrome://tracing or https://ui.perfetto.dev
+        :param path: path of the file
+        """
+        with open(path, "w") as file:
+            json.dump(self.to_chrome_trace(), file)
+
+    def _origin(self) -> float:
+        return min(
+            node.start_time if node.ready_time is None else node.ready_time
+            for node in self.nodes
+        )
+
+
+def _assign_lanes(
+    intervals: List[Tuple[float, float, NodeProfile]]
+) -> List[Tuple[int, Tuple[float, float, NodeProfile]]]:
+    # places every interval in the first lane that is free when it starts
+    lanes_end: List[float] = []
+    assigned = []
+    for interval in sorted(intervals, key=lambda i: (i[0], i[1])):
+        start, end, _ = interval
+        for lane, lane_end in enumerate(lanes_end):
+            if lane_end <= start:
+                lanes_end[lane] = end
+                break
+        else:
+            lane = len(lanes_end)
+            lanes_end.append(end)
+        assigned.append((lane, interval))
+    return assigned
+
+
+def _complete_event(
+    name: str,
+    category: str,
+    start: float,
+    duration: float,
+    pid: int,
+    tid: int,
+    args: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": start * 1e6,
+        "dur": duration * 1e6,
+        "pid": pid,
+        "tid": tid,
+        "args": args,
+    }
+
+
+def _process_name(pid: int, name: str) -> Dict[str, Any]:
+    return {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
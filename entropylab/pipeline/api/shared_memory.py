@@ -0,0 +1,233 @@
+""" Shared memory transport of node outputs between graph processes.
+
+When graph nodes run in a process pool (GraphExecutionType.Processes), large numpy
+array outputs are not pickled. The worker process that produced an array places it
+in a multiprocessing.shared_memory block, and returns a SharedArray handle instead.
+The coordinating process maps the block (to save the results), and passes the
+handle on to the nodes that consume the array, which map the same block, so the
+array is not copied between nodes.
+
+Blocks are reference counted by the coordinating process: a block holds a reference
+for every node that consumes the output, and is unlinked once all of them finished.
+Arrays that were mapped from a block stay valid after it is unlinked, and the memory
+is freed by the operating system when the last of them is deleted.
+
+multiprocessing.shared_memory requires python 3.8. On older versions the transport
+is not available (see is_available()), and node outputs are pickled.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from entropylab.config import settings
+from entropylab.logger import logger
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+
+def is_available() -> bool:
+    """
+    True if numpy arrays can be passed between processes in shared memory
+    """
+    return shared_memory is not None
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """
+    A picklable handle of a numpy array in a shared memory block
+    """
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @staticmethod
+    def create(array: np.ndarray) -> "SharedArray":
+        """
+        copies the array to a new shared memory block, and returns its handle.
+        The block stays until it is unlinked by the coordinating process.
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        handle = SharedArray(block.name, array.shape, array.dtype.str)
+        np.copyto(_map(block, handle), array, casting="no")
+        return handle
+
+    def attach(self) -> np.ndarray:
+        """
+        returns an array that is mapped to the shared memory block, without copying
+        """
+        return _map(shared_memory.SharedMemory(name=self.name), self)
+
+
+class _MappedBlock:
+    """
+    Keeps a shared memory block open while arrays use its buffer. It is the base of
+    the arrays that are mapped to the block, so the block is closed when the last
+    of them is deleted.
+    """
+
+    def __init__(self, block: "shared_memory.SharedMemory", handle: SharedArray):
+        super().__init__()
+        self._block = block
+        self._array = np.ndarray(handle.shape, np.dtype(handle.dtype), buffer=block.buf)
+
+    @property
+    def __array_interface__(self) -> Dict[str, Any]:
+        return self._array.__array_interface__
+
+    def __del__(self):
+        # the buffer of the block can not be released while an array exports it
+        self._array = None
+        self._block.close()
+
+
+def _map(block: "shared_memory.SharedMemory", handle: SharedArray) -> np.ndarray:
+    return np.asarray(_MappedBlock(block, handle))
+
+
+def shareable(value: Any, min_bytes: int) -> bool:
+    """
+    True if the value is a numpy array that should be placed in shared memory
+    """
+    return (
+        isinstance(value, np.ndarray)
+        and value.nbytes >= min_bytes
+        and not value.dtype.hasobject
+    )
+
+
+def share_outputs(results: Any, min_bytes: int) -> Any:
+    """
+    places the large arrays of node results in shared memory, and returns the
+    results with their handles instead. Runs in the worker process.
+    """
+    if not isinstance(results, dict):
+        return results
+    return {
+        name: SharedArray.create(value) if shareable(value, min_bytes) else value
+        for name, value in results.items()
+    }
+
+
+def attach_inputs(
+    args: List[Any], kwargs: Dict[str, Any]
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    maps the shared arrays among the node arguments. Runs in the worker process.
+    """
+    return (
+        [_attach(value) for value in args],
+        {name: _attach(value) for name, value in kwargs.items()},
+    )
+
+
+def _attach(value: Any) -> Any:
+    return value.attach() if isinstance(value, SharedArray) else value
+
+
+class _Block:
+    def __init__(self, handle: SharedArray, array: np.ndarray, references: int):
+        self.handle = handle
+        self.array = array
+        self.references = references
+
+
+class SharedMemoryTransport:
+    """
+    Tracks the shared memory blocks of the node outputs of a graph run, in the
+    coordinating process
+    """
+
+    def __init__(
+        self, consumers: Dict[Any, int], min_bytes: Optional[int] = None
+    ) -> None:
+        """
+            Tracks the shared memory blocks of the node outputs of a graph run.
+        :param consumers: number of nodes that consume the outputs of every node.
+                        The output blocks of a node are unlinked once they all
+                        released them
+        :param min_bytes: arrays smaller than this are pickled. Defaults to the
+                        "shared_memory.min_bytes" setting, or 1MB.
+        """
+        super().__init__()
+        if min_bytes is None:
+            min_bytes = settings.get("shared_memory.min_bytes", 1024 * 1024)
+        self.min_bytes = min_bytes
+        self._consumers = consumers
+        self._blocks: Dict[str, _Block] = {}
+        self._by_array: Dict[int, str] = {}
+        self._outputs: Dict[Any, List[str]] = {}
+
+    def adopt(self, producer: Any, results: Any) -> Any:
+        """
+            maps the shared arrays in the results of a node that ran in a worker
+            process, and returns the results with the arrays
+        :param producer: the node that produced the results
+        :param results: node results, with SharedArray handles
+        """
+        if not isinstance(results, dict):
+            return results
+        consumers = self._consumers.get(producer, 0)
+        adopted = {}
+        for name, value in results.items():
+            if isinstance(value, SharedArray):
+                array = value.attach()
+                self._blocks[value.name] = _Block(value, array, consumers)
+                self._by_array[id(array)] = value.name
+                self._outputs.setdefault(producer, []).append(value.name)
+                value = array
+            adopted[name] = value
+        if consumers == 0:
+            self._release_all(producer)
+        return adopted
+
+    def handles(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        returns the given node inputs, with the handles of the arrays that are in
+        shared memory instead of the arrays
+        """
+        return {name: self._handle(value) for name, value in values.items()}
+
+    def _handle(self, value: Any) -> Any:
+        name = self._by_array.get(id(value))
+        if name is None or self._blocks[name].array is not value:
+            return value
+        return self._blocks[name].handle
+
+    def release(self, producer: Any):
+        """
+        releases a reference to the output blocks of the given node, by a node that
+        consumed them, and unlinks the blocks that are not referenced anymore
+        """
+        names = self._outputs.get(producer, [])
+        for name in list(names):
+            block = self._blocks[name]
+            block.references -= 1
+            if block.references <= 0:
+                names.remove(name)
+                self._unlink(name)
+
+    def _release_all(self, producer: Any):
+        for name in self._outputs.pop(producer, []):
+            self._unlink(name)
+
+    def close(self):
+        """
+        unlinks all the blocks, when the graph run ends
+        """
+        for name in list(self._blocks):
+            self._unlink(name)
+        self._outputs.clear()
+
+    def _unlink(self, name: str):
+        block = self._blocks.pop(name)
+        self._by_array.pop(id(block.array), None)
+        try:
+            shared_memory.SharedMemory(name=name).unlink()
+        except FileNotFoundError:
+            logger.warning(f"Shared memory block {name} was already unlinked")
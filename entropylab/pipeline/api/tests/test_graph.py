@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from entropylab.pipeline.api.graph import (
+    _NodeScheduler,
+    GraphHelper,
+    _NodeExecutionInfo,
+)
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+
+
+def noop():
+    return {"x": 1}
+
+
+def _graph(*nodes) -> GraphHelper:
+    return GraphHelper({_NodeExecutionInfo(node, False) for node in nodes})
+
+
+def _run_all(scheduler: _NodeScheduler):
+    order = []
+    while not scheduler.finished:
+        for node in scheduler.pop_ready():
+            order.append(node.label)
+            scheduler.done(node)
+    return order
+
+
+def test_scheduler_starts_node_only_after_all_parents():
+    # arrange
+    a = PyNode("a", noop, output_vars={"x"})
+    b = PyNode("b", noop, {"x": a.outputs["x"]}, {"x"})
+    c = PyNode("c", noop, {"x": a.outputs["x"], "y": b.outputs["x"]}, {"x"})
+    # act
+    actual = _run_all(_NodeScheduler(_graph(c, b, a)))
+    # assert
+    assert actual == ["a", "b", "c"]
+
+
+def test_scheduler_starts_higher_priority_first():
+    # arrange
+    low = PyNode("low", noop, priority=0)
+    high = PyNode("high", noop, priority=5)
+    # act
+    actual = _run_all(_NodeScheduler(_graph(low, high)))
+    # assert
+    assert actual == ["high", "low"]
+
+
+def test_scheduler_starts_critical_path_first():
+    # arrange
+    short = PyNode("short", noop)
+    long_head = PyNode("long_head", noop, output_vars={"x"})
+    long_tail = PyNode("long_tail", noop, {"x": long_head.outputs["x"]})
+    # act
+    actual = _run_all(_NodeScheduler(_graph(short, long_head, long_tail)))
+    # assert
+    assert actual[0] == "long_head"
+
+
+def test_scheduler_limits_concurrency():
+    # arrange
+    nodes = {PyNode(f"n{i}", noop) for i in range(5)}
+    target = _NodeScheduler(_graph(*nodes), max_concurrency=2)
+    # act
+    started = target.pop_ready()
+    # assert
+    assert len(started) == 2
+    assert target.pop_ready() == []
+    target.done(started[0])
+    assert len(target.pop_ready()) == 1
+
+
+def test_scheduler_raises_on_cycle():
+    # arrange
+    a = PyNode("a", noop, output_vars={"x"})
+    b = PyNode("b", noop, {"x": a.outputs["x"]}, {"x"})
+    a.add_input("x", b.outputs["x"])
+    # act & assert
+    with pytest.raises(ValueError):
+        _NodeScheduler(_graph(a, b))
+
+
+def test_graph_helper_indexes_diamond_graph():
+    # arrange
+    a = PyNode("a", noop, output_vars={"x"})
+    b = PyNode("b", noop, {"x": a.outputs["x"]}, {"x"})
+    c = PyNode("c", noop, {"x": a.outputs["x"]}, {"x"}, must_run_after={a})
+    d = PyNode("d", noop, {"x": b.outputs["x"], "y": c.outputs["x"]})
+    # act
+    target = _graph(a, b, c, d)
+    # assert
+    assert target.leaves == {d}
+    assert target.parents(c) == (a,)
+    assert set(target.children(a)) == {b, c}
+    assert target.ancestors(d) == {a, b, c, d}
+    order = target.nodes_in_topological_order()
+    assert order.index(a) < order.index(b) < order.index(d)
+
+
+def test_ancestors_of_long_diamond_chain_are_linear():
+    # arrange
+    node = PyNode("n0", noop, output_vars={"x"})
+    for i in range(1, 200):
+        left = PyNode(f"l{i}", noop, {"x": node.outputs["x"]}, {"x"})
+        right = PyNode(f"r{i}", noop, {"x": node.outputs["x"]}, {"x"})
+        node = PyNode(
+            f"n{i}", noop, {"x": left.outputs["x"], "y": right.outputs["x"]}, {"x"}
+        )
+    # act
+    actual = node.ancestors()
+    # assert
+    assert len(actual) == 1 + 3 * 199
+
+
+def test_async_graph_respects_max_concurrency():
+    # arrange
+    running = []
+    max_running = []
+
+    async def rest():
+        running.append(1)
+        max_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    nodes = {PyNode(f"rest_{i}", rest) for i in range(6)}
+    graph = Graph(
+        None,
+        nodes,
+        "limited",
+        execution_type=GraphExecutionType.Async,
+        max_concurrency=2,
+    )
+    # act
+    graph.run()
+    # assert
+    assert max(max_running) == 2
+
+
+def test_scheduler_starts_stream_group_within_max_concurrency():
+    # arrange
+    producer = PyNode("producer", noop, output_vars={"x"})
+    consumers = [
+        PyNode(f"consumer_{i}", noop, {"x": producer.streams["x"]}) for i in range(2)
+    ]
+    other = PyNode("other", noop, priority=5)
+    target = _NodeScheduler(_graph(producer, other, *consumers), max_concurrency=2)
+    # act
+    first = target.pop_ready()
+    blocked = target.pop_ready()
+    target.done(first[0])
+    group = target.pop_ready()
+    # assert
+    assert [node.label for node in first] == ["other"]
+    assert blocked == []
+    assert [node.label for node in group][0] == "producer"
+    assert len(group) == 3
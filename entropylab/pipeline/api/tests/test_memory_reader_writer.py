@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.api.data_writer import RawResultData, Metadata, NodeData
+from entropylab.pipeline.api.memory_reader_writer import MemoryOnlyDataReaderWriter
+
+
+def test_get_results_filters_by_label_and_stage():
+    # arrange
+    target = MemoryOnlyDataReaderWriter()
+    for stage in range(3):
+        target.save_result(1, RawResultData("a", stage, stage))
+        target.save_result(1, RawResultData("b", stage * 10, stage))
+    # act
+    actual = target.get_results(1, "b", 2)
+    # assert
+    assert [(r.label, r.stage, r.data) for r in actual] == [("b", 2, 20)]
+
+
+def test_get_results_ids_are_unique_and_ordered():
+    # arrange
+    target = MemoryOnlyDataReaderWriter()
+    for i in range(5):
+        target.save_result(1, RawResultData("a", i))
+    # act
+    actual = [r.id for r in target.get_results(1)]
+    # assert
+    assert actual == ["0", "1", "2", "3", "4"]
+
+
+def test_get_results_filters_by_experiment_id():
+    # arrange
+    target = MemoryOnlyDataReaderWriter()
+    target.save_result(1, RawResultData("a", "one", 0))
+    target.save_result(2, RawResultData("a", "two", 0))
+    # act
+    actual = target.get_results(2, "a", 0)
+    # assert
+    assert [r.data for r in actual] == ["two"]
+
+
+def test_get_node_stage_ids_by_label_filters_by_experiment_id():
+    # arrange
+    target = MemoryOnlyDataReaderWriter()
+    target.save_node(1, NodeData(0, None, "node", False))
+    target.save_node(2, NodeData(5, None, "node", False))
+    # act & assert
+    assert target.get_node_stage_ids_by_label("node", 2) == [5]
+    assert target.get_node_stage_ids_by_label("node") == [0, 5]
+
+
+def test_payloads_over_memory_budget_are_spilled_and_read_back():
+    # arrange
+    target = MemoryOnlyDataReaderWriter(max_memory_bytes=1000)
+    arrays = [np.full(100, i, dtype=np.float64) for i in range(5)]
+    # act
+    for i, array in enumerate(arrays):
+        target.save_result(1, RawResultData("trace", array, i))
+    target.save_metadata(1, Metadata("meta", 0, {"foo": "bar"}))
+    # assert
+    assert target.memory_bytes <= 1000
+    for i, array in enumerate(arrays):
+        actual = list(target.get_results(1, "trace", i))[0].data
+        np.testing.assert_array_equal(actual, array)
+    assert list(target.get_metadata_records(1))[0].data == {"foo": "bar"}
+
+
+def test_close_removes_spill_file():
+    # arrange
+    target = MemoryOnlyDataReaderWriter(max_memory_bytes=0)
+    target.save_result(1, RawResultData("a", [1, 2, 3]))
+    path = target._spill_file._path
+    assert os.path.isfile(path)
+    # act
+    target.close()
+    # assert
+    assert not os.path.exists(path)
+
+
+def test_reading_spilled_payload_after_close_raises_entropy_error():
+    # arrange
+    target = MemoryOnlyDataReaderWriter(max_memory_bytes=0)
+    target.save_result(1, RawResultData("a", [1, 2, 3]))
+    target.close()
+    # act & assert
+    with pytest.raises(EntropyError):
+        list(target.get_results(1, "a"))[0].data
+
+
+def test_payload_size_of_containers_includes_their_arrays():
+    # arrange
+    target = MemoryOnlyDataReaderWriter(max_memory_bytes=10**6)
+    # act
+    target.save_result(1, RawResultData("a", {"trace": np.zeros(1000)}))
+    # assert
+    assert target.memory_bytes >= 8000
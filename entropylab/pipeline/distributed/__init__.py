@@ -0,0 +1,4 @@
+from .coordinator import NodeCoordinator
+from .worker import NodeWorker, run_worker, start_local_workers
+
+__all__ = ["NodeCoordinator", "NodeWorker", "run_worker", "start_local_workers"]
@@ -0,0 +1,36 @@
+""" Wire protocol of distributed graph execution.
+
+A coordinator ROUTER socket talks to worker DEALER sockets with ZeroMQ multipart
+messages, whose first frame is the message kind. Workers send:
+
+    [READY]                          registers an idle worker
+    [HEARTBEAT]                      the worker is alive
+    [RESULT, task id, *payload]      the value a task returned
+    [ERROR, task id, *payload]       the error a task raised
+
+and the coordinator sends:
+
+    [TASK, task id, *payload]        a function call to run
+    [HEARTBEAT]                      the coordinator is alive
+    [STOP]                           the worker should exit
+
+Payloads are pickled with out-of-band buffers, so functions must be importable by
+the workers. Since unpickling a payload can run any code, the coordinator and its
+workers authenticate each other with a shared secret key when they are not on the
+same machine (see remote._security).
+"""
+from entropylab.pipeline.results_backend.remote._protocol import (  # noqa: F401
+    dumps,
+    dumps_error,
+    loads,
+)
+
+READY = b"ready"
+HEARTBEAT = b"heartbeat"
+TASK = b"task"
+RESULT = b"result"
+ERROR = b"error"
+STOP = b"stop"
+
+# how often sockets are polled for messages, between other periodic work
+POLL_INTERVAL_MS = 10
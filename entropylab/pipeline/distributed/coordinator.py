@@ -0,0 +1,336 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from itertools import count
+from typing import Optional, Dict, List, Deque
+
+import zmq
+
+from entropylab.logger import logger
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.distributed import _protocol
+from entropylab.pipeline.results_backend.remote import _security
+
+DEFAULT_ADDRESS = "tcp://127.0.0.1:5756"
+
+# time to deliver the stop messages to the workers, when the coordinator stops
+_STOP_LINGER_MS = 1000
+
+
+class _Task:
+    def __init__(self, task_id: bytes, payload: List, future: Future) -> None:
+        self.id = task_id
+        self.payload = payload
+        self.future = future
+        self.attempts = 0
+
+
+class _Worker:
+    def __init__(self, identity: bytes, now: float) -> None:
+        self.identity = identity
+        self.last_seen = now
+        self.task: Optional[_Task] = None
+
+
+class NodeCoordinator(Executor):
+    """
+    Dispatches graph nodes to NodeWorkers over ZeroMQ, and receives their results.
+    Every worker runs one node at a time. Workers that stop sending heartbeats are
+    considered lost, and the node they ran is sent to another worker.
+    A coordinator is an Executor, so it runs the nodes of graphs with
+    GraphExecutionType.Distributed, and can be shared by several graph runs.
+    Nodes are sent as pickles, so a coordinator that other machines can reach
+    requires a secret key, and accepts only workers that have it.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        heartbeat_interval: float = 1.0,
+        heartbeat_timeout: float = 5.0,
+        max_attempts: int = 3,
+        secret_key: Optional[str] = None,
+        allow_remote: bool = False,
+    ) -> None:
+        """
+            Dispatches graph nodes to NodeWorkers over ZeroMQ.
+        :param address: ZeroMQ address to bind to, e.g. "tcp://127.0.0.1:5756".
+                        Use "tcp://127.0.0.1:*" to bind to a random free port.
+        :param heartbeat_interval: number of seconds between heartbeats to workers
+        :param heartbeat_timeout: number of seconds without messages from a worker,
+                        after which it is considered lost
+        :param max_attempts: number of workers a node is sent to, when the workers
+                        that run it are lost
+        :param secret_key: key shared with the workers (see generate_secret_key()),
+                        that encrypts the connections and authenticates them.
+                        Defaults to the "remote.secret_key" setting.
+        :param allow_remote: allow binding to an address that other machines can
+                        reach, which requires a secret key
+        """
+        super().__init__()
+        self._secret_key = _security.secret_key_or_default(secret_key)
+        _security.check_bind_address(
+            "Node coordinator", address, self._secret_key, allow_remote
+        )
+        self._requested_address = address
+        self._address: Optional[str] = None
+        self._heartbeat_interval = heartbeat_interval
+        self._heartbeat_timeout = heartbeat_timeout
+        self._max_attempts = max_attempts
+        self._task_ids = count()
+        self._lock = threading.Lock()
+        self._queue: Deque[_Task] = deque()
+        self._workers: Dict[bytes, _Worker] = {}
+        self._stop = threading.Event()
+        self._bound = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._stop_workers = False
+        # stop once the submitted nodes finished (see shutdown())
+        self._draining = False
+
+    @property
+    def address(self) -> Optional[str]:
+        """
+        the address the coordinator is bound to, once it started
+        """
+        return self._address
+
+    @property
+    def workers(self) -> int:
+        """
+        number of workers that are connected
+        """
+        return len(self._workers)
+
+    def wait_for_workers(self, workers: int, timeout: Optional[float] = None) -> bool:
+        """
+            waits until the given number of workers is connected
+        :param workers: number of workers to wait for
+        :param timeout: maximal time to wait in seconds, None to wait until they
+                        are connected
+        :return: True if the workers are connected
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.workers < workers:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(_protocol.POLL_INTERVAL_MS / 1000)
+        return True
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        sends a call of the given function to a worker. The function and its
+        arguments are pickled, so the function must be importable by the workers.
+        """
+        if self._thread is None:
+            raise EntropyError("coordinator is not running, call start() first")
+        if self._draining:
+            raise EntropyError("coordinator is shut down")
+        future = Future()
+        task_id = str(next(self._task_ids)).encode()
+        task = _Task(task_id, _protocol.dumps((fn, args, kwargs)), future)
+        with self._lock:
+            self._queue.append(task)
+        return future
+
+    def serve_forever(self) -> None:
+        """
+        dispatches nodes in the current thread until stop() is called
+        """
+        context = zmq.Context()
+        socket = context.socket(zmq.ROUTER)
+        socket.setsockopt(zmq.LINGER, 0)
+        authenticator = None
+        try:
+            authenticator = _security.secure_server(context, socket, self._secret_key)
+            socket.bind(self._requested_address)
+            self._address = socket.getsockopt_string(zmq.LAST_ENDPOINT)
+            logger.info(f"Node coordinator is serving at {self._address}")
+        except BaseException as e:
+            self._error = e
+            socket.close()
+            if authenticator is not None:
+                authenticator.stop()
+            context.term()
+            raise
+        finally:
+            self._bound.set()
+        last_heartbeat = time.monotonic()
+        try:
+            while not self._stop.is_set() and not (self._draining and self._idle()):
+                if socket.poll(_protocol.POLL_INTERVAL_MS):
+                    self._receive(socket)
+                now = time.monotonic()
+                self._expire_workers(now)
+                if now - last_heartbeat >= self._heartbeat_interval:
+                    for identity in self._workers:
+                        socket.send_multipart([identity, _protocol.HEARTBEAT])
+                    last_heartbeat = now
+                self._dispatch(socket)
+        finally:
+            self._fail_tasks(EntropyError("node coordinator stopped"))
+            if self._stop_workers:
+                for identity in self._workers:
+                    socket.send_multipart([identity, _protocol.STOP])
+                socket.setsockopt(zmq.LINGER, _STOP_LINGER_MS)
+            self._workers.clear()
+            socket.close()
+            if authenticator is not None:
+                authenticator.stop()
+            context.term()
+            logger.info("Node coordinator stopped")
+
+    def start(self) -> "NodeCoordinator":
+        """
+        dispatches nodes in a background thread
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="entropy-node-coordinator", daemon=True
+        )
+        self._thread.start()
+        self._bound.wait()
+        if self._error is not None:
+            self._thread = None
+            raise EntropyError(
+                f"Node coordinator failed to bind to {self._requested_address}"
+            ) from self._error
+        return self
+
+    def stop(self, stop_workers: bool = False) -> None:
+        """
+            stops dispatching nodes. Nodes that did not finish fail
+        :param stop_workers: ask the connected workers to exit
+        """
+        self._stop_workers = stop_workers
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """
+            stops accepting nodes, and stops the coordinator once the submitted
+            nodes finished
+        :param wait: wait until the submitted nodes finished and the coordinator
+                        stopped, otherwise it stops in the background
+        :param cancel_futures: cancel the nodes that were not sent to a worker yet
+        """
+        self._draining = True
+        if cancel_futures:
+            with self._lock:
+                queued = [task for task in self._queue if task.attempts == 0]
+                for task in queued:
+                    self._queue.remove(task)
+            for task in queued:
+                task.future.cancel()
+        if wait and self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _receive(self, socket: zmq.Socket):
+        while True:
+            try:
+                frames = socket.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                return
+            identity, kind = frames[0].bytes, frames[1].bytes
+            now = time.monotonic()
+            worker = self._workers.get(identity)
+            if kind == _protocol.READY:
+                if worker is not None and worker.task is not None:
+                    self._lost(worker.task, "registered again")
+                self._workers[identity] = _Worker(identity, now)
+                logger.debug(f"Worker {identity.hex()} is ready")
+            elif kind in (_protocol.RESULT, _protocol.ERROR):
+                if worker is None:
+                    # a worker that was considered lost finished its node
+                    worker = self._workers[identity] = _Worker(identity, now)
+                worker.last_seen = now
+                task, worker.task = worker.task, None
+                if task is None or task.id != frames[2].bytes:
+                    logger.debug(f"Discarding late result from {identity.hex()}")
+                    continue
+                self._resolve(task, kind, frames[3:])
+            elif worker is not None:
+                worker.last_seen = now
+
+    @staticmethod
+    def _resolve(task: _Task, kind: bytes, payload: List):
+        try:
+            value = _protocol.loads(payload)
+        except BaseException as e:
+            task.future.set_exception(
+                EntropyError(f"Could not load the result of task {task.id}: {e}")
+            )
+            return
+        if kind == _protocol.ERROR:
+            task.future.set_exception(value)
+        else:
+            task.future.set_result(value)
+
+    def _expire_workers(self, now: float):
+        for identity, worker in list(self._workers.items()):
+            if now - worker.last_seen > self._heartbeat_timeout:
+                del self._workers[identity]
+                logger.warning(
+                    f"Worker {identity.hex()} did not send a heartbeat for "
+                    f"{self._heartbeat_timeout} seconds and is considered lost"
+                )
+                if worker.task is not None:
+                    self._lost(worker.task, "was lost")
+
+    def _lost(self, task: _Task, reason: str):
+        if task.attempts >= self._max_attempts:
+            task.future.set_exception(
+                EntropyError(
+                    f"task {task.id.decode()} failed, since the "
+                    f"{task.attempts} workers that ran it were lost"
+                )
+            )
+            return
+        logger.warning(
+            f"Worker of task {task.id.decode()} {reason}, sending it to another "
+            f"worker"
+        )
+        with self._lock:
+            self._queue.appendleft(task)
+
+    def _dispatch(self, socket: zmq.Socket):
+        idle = [worker for worker in self._workers.values() if worker.task is None]
+        while idle:
+            with self._lock:
+                if not self._queue:
+                    return
+                task = self._queue.popleft()
+            if task.attempts == 0 and not task.future.set_running_or_notify_cancel():
+                continue
+            worker = idle.pop()
+            worker.task = task
+            task.attempts += 1
+            socket.send_multipart(
+                [worker.identity, _protocol.TASK, task.id] + task.payload, copy=False
+            )
+
+    def _idle(self) -> bool:
+        with self._lock:
+            if self._queue:
+                return False
+        return all(worker.task is None for worker in self._workers.values())
+
+    def _fail_tasks(self, error: EntropyError):
+        with self._lock:
+            tasks = list(self._queue)
+            self._queue.clear()
+        tasks += [w.task for w in self._workers.values() if w.task is not None]
+        for task in tasks:
+            if task.attempts == 0 and not task.future.set_running_or_notify_cancel():
+                continue
+            task.future.set_exception(error)
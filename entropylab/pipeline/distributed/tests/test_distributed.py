@@ -0,0 +1,183 @@
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.api.execution import EntropyContext
+from entropylab.pipeline.distributed import (
+    NodeCoordinator,
+    NodeWorker,
+    start_local_workers,
+)
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+from entropylab.pipeline.results_backend.remote import generate_secret_key
+
+
+def trace(size):
+    return {"trace": np.arange(size, dtype=np.float64), "pid": os.getpid()}
+
+
+def scale(trace, factor, context: EntropyContext):
+    context.add_result("factor", factor)
+    return {"scaled": trace * factor, "pid": os.getpid()}
+
+
+def crash_once(marker):
+    # the first worker that runs this node dies
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return {"survived": True}
+
+
+def crash():
+    os._exit(1)
+
+
+@contextmanager
+def _local_cluster(workers, max_attempts=3):
+    with NodeCoordinator(
+        "tcp://127.0.0.1:*",
+        heartbeat_interval=0.1,
+        heartbeat_timeout=1.0,
+        max_attempts=max_attempts,
+    ) as coordinator:
+        processes = start_local_workers(coordinator.address, workers, 0.1)
+        assert coordinator.wait_for_workers(workers, timeout=30)
+        try:
+            yield coordinator
+        finally:
+            coordinator.stop(stop_workers=True)
+            for process in processes:
+                process.join(5)
+                if process.is_alive():
+                    process.terminate()
+
+
+@pytest.fixture()
+def coordinator():
+    with _local_cluster(2) as coordinator:
+        yield coordinator
+
+
+def _graph(coordinator, *nodes):
+    return Graph(
+        None,
+        set(nodes),
+        "distributed",
+        execution_type=GraphExecutionType.Distributed,
+        coordinator=coordinator,
+    )
+
+
+def test_nodes_run_on_workers_and_results_are_saved_by_coordinator(coordinator):
+    # arrange
+    a = PyNode("trace", trace, output_vars={"trace", "pid"})
+    b1 = PyNode("b1", scale, {"trace": a.outputs["trace"]}, {"scaled", "pid"})
+    b2 = PyNode("b2", scale, {"trace": a.outputs["trace"]}, {"scaled", "pid"})
+    # act
+    handle = _graph(coordinator, a, b1, b2).run(size=1000, factor=2)
+    # assert
+    b1_results = {
+        r.label: r.data
+        for r in list(handle.results.get_results_from_node("b1"))[0].results
+    }
+    np.testing.assert_array_equal(b1_results["scaled"], np.arange(1000) * 2)
+    assert b1_results["factor"] == 2
+    assert b1_results["pid"] != os.getpid()
+    stages = [r.stage for r in handle.results.get_results(label="factor")]
+    assert len(set(stages)) == 2
+
+
+def test_node_of_a_lost_worker_runs_on_another_worker(coordinator, tmp_path):
+    # arrange
+    node = PyNode("crash_once", crash_once, output_vars={"survived"})
+    # act
+    handle = _graph(coordinator, node).run(marker=str(tmp_path / "crashed"))
+    # assert
+    result = list(handle.results.get_results_from_node("crash_once"))[0].results[0]
+    assert result.data is True
+
+
+def test_node_fails_when_all_its_workers_are_lost():
+    # arrange
+    node = PyNode("crash", crash, output_vars={"survived"})
+    with _local_cluster(2, max_attempts=2) as coordinator:
+        # act & assert
+        with pytest.raises(RuntimeError):
+            _graph(coordinator, node).run()
+
+
+def test_worker_threads_on_localhost():
+    # arrange
+    with NodeCoordinator("tcp://127.0.0.1:*") as coordinator:
+        with NodeWorker(coordinator.address):
+            # act
+            future = coordinator.submit(pow, 2, 10)
+            # assert
+            assert future.result(timeout=10) == 1024
+
+
+def test_distributed_graph_requires_a_coordinator():
+    with pytest.raises(EntropyError):
+        Graph(
+            None,
+            PyNode("a", trace),
+            execution_type=GraphExecutionType.Distributed,
+        )
+
+
+def test_coordinator_refuses_remote_address_without_allow_remote():
+    with pytest.raises(EntropyError):
+        NodeCoordinator("tcp://0.0.0.0:*")
+
+
+def test_coordinator_refuses_remote_address_without_secret_key():
+    with pytest.raises(EntropyError):
+        NodeCoordinator("tcp://0.0.0.0:*", allow_remote=True)
+
+
+def test_worker_refuses_remote_coordinator_without_secret_key():
+    with pytest.raises(EntropyError):
+        NodeWorker("tcp://lab-pc:5756")
+
+
+def test_coordinator_with_secret_key_accepts_only_workers_with_the_key():
+    # arrange
+    secret_key = generate_secret_key()
+    with NodeCoordinator("tcp://127.0.0.1:*", secret_key=secret_key) as coordinator:
+        # act
+        with NodeWorker(coordinator.address, secret_key=generate_secret_key()):
+            rejected = not coordinator.wait_for_workers(1, timeout=1)
+        with NodeWorker(coordinator.address, secret_key=secret_key):
+            future = coordinator.submit(pow, 2, 10)
+            # assert
+            assert rejected
+            assert future.result(timeout=10) == 1024
+
+
+def test_shutdown_waits_for_submitted_nodes():
+    # arrange
+    coordinator = NodeCoordinator("tcp://127.0.0.1:*").start()
+    with NodeWorker(coordinator.address):
+        futures = [coordinator.submit(time.sleep, 0.2) for _ in range(2)]
+        # act
+        coordinator.shutdown(wait=True)
+        # assert
+        assert all(future.done() and future.exception() is None for future in futures)
+        with pytest.raises(EntropyError):
+            coordinator.submit(pow, 2, 10)
+
+
+def test_shutdown_without_wait_cancels_queued_nodes():
+    # arrange
+    coordinator = NodeCoordinator("tcp://127.0.0.1:*").start()
+    futures = [coordinator.submit(pow, 2, 10) for _ in range(2)]
+    # act
+    coordinator.shutdown(wait=False, cancel_futures=True)
+    # assert
+    assert all(future.cancelled() for future in futures)
+    coordinator.stop()
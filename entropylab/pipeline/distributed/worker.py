@@ -0,0 +1,192 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple, List
+
+import zmq
+
+from entropylab.logger import logger
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.distributed import _protocol
+from entropylab.pipeline.results_backend.remote import _security
+
+
+class NodeWorker:
+    """
+    A worker that runs graph nodes for a NodeCoordinator, one node at a time.
+    The node runs in a separate thread, while the worker keeps sending heartbeats.
+    Nodes are sent as pickles, so a worker connects to a coordinator on another
+    machine only with a secret key, that authenticates the coordinator.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        heartbeat_interval: float = 1.0,
+        heartbeat_timeout: float = 10.0,
+        secret_key: Optional[str] = None,
+    ) -> None:
+        """
+            A worker that runs graph nodes for a NodeCoordinator.
+        :param address: ZeroMQ address of the coordinator, e.g. "tcp://lab-pc:5756"
+        :param heartbeat_interval: number of seconds between heartbeats
+        :param heartbeat_timeout: number of seconds without messages from the
+                        coordinator, after which the worker registers again
+        :param secret_key: the secret key of the coordinator. Defaults to the
+                        "remote.secret_key" setting
+        """
+        super().__init__()
+        self._secret_key = _security.secret_key_or_default(secret_key)
+        _security.check_connect_address("node coordinator", address, self._secret_key)
+        self._address = address
+        self._heartbeat_interval = heartbeat_interval
+        self._heartbeat_timeout = heartbeat_timeout
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def serve_forever(self) -> None:
+        """
+        runs nodes in the current thread, until stop() is called or the
+        coordinator stops the worker
+        """
+        context = zmq.Context()
+        socket = context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        _security.secure_client(socket, self._secret_key)
+        socket.connect(self._address)
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entropy-worker")
+        running: Optional[Tuple[bytes, Future]] = None
+        logger.info(f"Worker is connected to coordinator at {self._address}")
+        try:
+            socket.send_multipart([_protocol.READY])
+            last_sent = last_heard = time.monotonic()
+            while not self._stop.is_set():
+                if socket.poll(_protocol.POLL_INTERVAL_MS):
+                    frames = socket.recv_multipart(copy=False)
+                    last_heard = time.monotonic()
+                    kind = frames[0].bytes
+                    if kind == _protocol.STOP:
+                        break
+                    if kind == _protocol.TASK:
+                        running = frames[1].bytes, self._start(pool, frames[2:])
+                if running is not None and running[1].done():
+                    socket.send_multipart(_reply(*running), copy=False)
+                    running = None
+                    last_sent = time.monotonic()
+                now = time.monotonic()
+                if now - last_sent >= self._heartbeat_interval:
+                    socket.send_multipart([_protocol.HEARTBEAT])
+                    last_sent = now
+                if running is None and now - last_heard > self._heartbeat_timeout:
+                    logger.warning(
+                        f"Worker did not hear from coordinator at {self._address} "
+                        f"for {self._heartbeat_timeout} seconds, registering again"
+                    )
+                    socket.send_multipart([_protocol.READY])
+                    last_heard = now
+        finally:
+            pool.shutdown(wait=False)
+            socket.close()
+            context.term()
+            logger.info("Worker stopped")
+
+    def start(self) -> "NodeWorker":
+        """
+        runs nodes in a background thread
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="entropy-node-worker", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @staticmethod
+    def _start(pool: ThreadPoolExecutor, payload: List) -> Future:
+        try:
+            function, args, kwargs = _protocol.loads(payload)
+        except BaseException as e:
+            future = Future()
+            future.set_exception(
+                EntropyError(f"Worker could not load task: {e.__class__.__name__}: {e}")
+            )
+            return future
+        return pool.submit(function, *args, **kwargs)
+
+
+def _reply(task_id: bytes, future: Future) -> List:
+    error = future.exception()
+    if error is not None:
+        return [_protocol.ERROR, task_id] + _protocol.dumps_error(error)
+    try:
+        return [_protocol.RESULT, task_id] + _protocol.dumps(future.result())
+    except Exception as e:
+        return [_protocol.ERROR, task_id] + _protocol.dumps_error(
+            EntropyError(f"Worker could not send task result: {e}")
+        )
+
+
+def run_worker(
+    address: str,
+    heartbeat_interval: float = 1.0,
+    heartbeat_timeout: float = 10.0,
+    secret_key: Optional[str] = None,
+) -> None:
+    """Runs graph nodes for the coordinator at the given address until interrupted
+
+    :param address: ZeroMQ address of the coordinator
+    :param heartbeat_interval: number of seconds between heartbeats
+    :param heartbeat_timeout: number of seconds without messages from the
+                    coordinator, after which the worker registers again
+    :param secret_key: the secret key of the coordinator, defaults to the
+                    "remote.secret_key" setting
+    """
+    worker = NodeWorker(address, heartbeat_interval, heartbeat_timeout, secret_key)
+    try:
+        worker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def start_local_workers(
+    address: str,
+    count: int,
+    heartbeat_interval: float = 1.0,
+    heartbeat_timeout: float = 10.0,
+    secret_key: Optional[str] = None,
+) -> List[multiprocessing.Process]:
+    """
+        starts worker processes on this machine, that exit with the current process
+    :param address: ZeroMQ address of the coordinator
+    :param count: number of workers
+    :param heartbeat_interval: number of seconds between heartbeats
+    :param heartbeat_timeout: number of seconds without messages from the
+                    coordinator, after which the workers register again
+    :param secret_key: the secret key of the coordinator, defaults to the
+                    "remote.secret_key" setting
+    :return: the worker processes
+    """
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(address, heartbeat_interval, heartbeat_timeout, secret_key),
+            name=f"entropy-node-worker-{i}",
+            daemon=True,
+        )
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes
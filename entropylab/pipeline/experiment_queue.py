@@ -0,0 +1,404 @@
+""" A queue of experiments that runs in the current process.
+
+Experiment definitions (graphs and scripts) are submitted with a priority and the
+submissions they depend on, and run on a pool of worker threads. All the runs share
+the queue results db, and the process pays the start up time of python and entropy
+only once. Experiments that use the same lab resources, or the same
+ExperimentResources instance, never run at the same time.
+"""
+import enum
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Iterable, List, Dict, Any, Set, FrozenSet
+
+from entropylab.components.lab_topology import ExperimentResources
+from entropylab.logger import logger
+from entropylab.pipeline.api.data_writer import DataWriter
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.api.experiment import ExperimentDefinition, ExperimentHandle
+
+
+class QueuedExperimentStatus(enum.Enum):
+    Pending = 1
+    Running = 2
+    Done = 3
+    Failed = 4
+    Cancelled = 5
+
+
+_UNSUCCESSFUL = (QueuedExperimentStatus.Failed, QueuedExperimentStatus.Cancelled)
+_FINISHED = (QueuedExperimentStatus.Done,) + _UNSUCCESSFUL
+
+
+@dataclass
+class QueueMetrics:
+    """
+    Snapshot of the state and performance of an experiment queue.
+    Times are in seconds.
+
+    Attributes:
+        depth: number of experiments waiting to run
+        running: number of experiments running
+        done: number of experiments that finished successfully
+        failed: number of experiments that failed, or whose dependencies failed
+        cancelled: number of experiments that were cancelled before they ran
+        mean_wait_time: mean time from submission to start, of started experiments
+        max_wait_time: longest time from submission to start
+        throughput: finished experiments per second, since the first submission
+    """
+
+    depth: int
+    running: int
+    done: int
+    failed: int
+    cancelled: int
+    mean_wait_time: float
+    max_wait_time: float
+    throughput: float
+
+
+class QueuedExperiment:
+    """
+    A submission of an experiment definition to an ExperimentQueue
+    """
+
+    def __init__(
+        self,
+        queue: "ExperimentQueue",
+        sequence: int,
+        definition: ExperimentDefinition,
+        priority: int,
+        depends_on: List["QueuedExperiment"],
+        db: Optional[DataWriter],
+        kwargs: Dict[str, Any],
+    ) -> None:
+        super().__init__()
+        self._queue = queue
+        self._sequence = sequence
+        self._definition = definition
+        self._priority = priority
+        self._depends_on = depends_on
+        self._db = db
+        self._kwargs = kwargs
+        self._status = QueuedExperimentStatus.Pending
+        self._handle: Optional[ExperimentHandle] = None
+        self._error: Optional[BaseException] = None
+        self._finished = threading.Event()
+        self.submit_time: float = time.time()
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+
+    @property
+    def definition(self) -> ExperimentDefinition:
+        return self._definition
+
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    @property
+    def depends_on(self) -> List["QueuedExperiment"]:
+        return list(self._depends_on)
+
+    @property
+    def status(self) -> QueuedExperimentStatus:
+        return self._status
+
+    @property
+    def wait_time(self) -> Optional[float]:
+        """
+        time from submission until the experiment started, None if it did not start
+        """
+        if self.start_time is None:
+            return None
+        return self.start_time - self.submit_time
+
+    def done(self) -> bool:
+        """
+        True if the experiment finished, failed or was cancelled
+        """
+        return self._status in _FINISHED
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+            waits for the experiment to finish
+        :param timeout: maximal time to wait in seconds, None to wait until it ends
+        :return: True if the experiment finished
+        """
+        return self._finished.wait(timeout)
+
+    def result(self, timeout: Optional[float] = None) -> ExperimentHandle:
+        """
+            waits for the experiment to finish and returns its handle
+        :param timeout: maximal time to wait in seconds, None to wait until it ends
+        :raises the error of the experiment, if it failed or was cancelled
+        """
+        if not self.wait(timeout):
+            raise TimeoutError(
+                f"experiment {self._definition.label} did not finish within "
+                f"{timeout} seconds"
+            )
+        if self._error is not None:
+            raise self._error
+        return self._handle
+
+    def cancel(self) -> bool:
+        """
+            cancels the experiment if it did not start yet. Experiments that depend
+            on it fail
+        :return: True if the experiment was cancelled
+        """
+        return self._queue._cancel(self)
+
+    def _resource_keys(self) -> FrozenSet[Any]:
+        # an experiment locks the lab resources it imports, and starts and ends its
+        # ExperimentResources, so experiments that share either can't run together
+        resources: ExperimentResources = self._definition.get_experiment_resources()
+        return frozenset(
+            itertools.chain(
+                resources._resources, resources._local_resources, [id(resources)]
+            )
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"<QueuedExperiment {self._definition.label} "
+            f"priority={self._priority} status={self._status.name}>"
+        )
+
+
+class ExperimentQueue:
+    """
+    Runs experiment definitions in the current process, by priority and after the
+    experiments they depend on, on a pool of worker threads.
+    Use as a context manager, or call shutdown() when done.
+    """
+
+    def __init__(self, db: Optional[DataWriter] = None, max_workers: int = 1) -> None:
+        """
+            Runs experiment definitions in the current process, by priority and
+            after the experiments they depend on.
+        :param db: results db shared by all the queued experiments. when parallel
+                    workers are used, it must support writes from several threads
+        :param max_workers: number of experiments that can run at the same time
+        """
+        super().__init__()
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self._db = db
+        self._max_workers = max_workers
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="entropy-queue"
+        )
+        self._lock = threading.Condition()
+        self._sequence = itertools.count()
+        self._pending: List[QueuedExperiment] = []
+        self._running: Set[QueuedExperiment] = set()
+        self._resources_in_use: Set[Any] = set()
+        self._finished: List[QueuedExperiment] = []
+        self._first_submit_time: Optional[float] = None
+        self._closed = False
+
+    def __enter__(self) -> "ExperimentQueue":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=exc_type is None)
+
+    def submit(
+        self,
+        definition: ExperimentDefinition,
+        priority: int = 0,
+        depends_on: Iterable[QueuedExperiment] = (),
+        db: Optional[DataWriter] = None,
+        **kwargs,
+    ) -> QueuedExperiment:
+        """
+            adds an experiment definition to the queue
+        :param definition: the experiment to run
+        :param priority: experiments with a higher priority run first, experiments
+                        with the same priority run in submission order
+        :param depends_on: experiments that must finish successfully before this one
+                        starts. if one of them fails, this experiment fails as well
+        :param db: results db of this experiment, instead of the queue db
+        :param kwargs: key word arguments passed to the experiment run
+        :return: the submission, to wait for and get the experiment handle
+        """
+        depends_on = list(depends_on)
+        for dependency in depends_on:
+            if dependency._queue is not self:
+                raise ValueError(
+                    f"experiment {dependency.definition.label} "
+                    f"was submitted to a different queue"
+                )
+        with self._lock:
+            if self._closed:
+                raise EntropyError("can not submit experiments to a closed queue")
+            queued = QueuedExperiment(
+                self,
+                next(self._sequence),
+                definition,
+                priority,
+                depends_on,
+                db if db is not None else self._db,
+                kwargs,
+            )
+            if self._first_submit_time is None:
+                self._first_submit_time = queued.submit_time
+            self._pending.append(queued)
+            self._dispatch()
+        return queued
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+            waits until all the submitted experiments finished
+        :param timeout: maximal time to wait in seconds, None to wait until they end
+        :return: True if all the experiments finished
+        """
+        with self._lock:
+            return self._lock.wait_for(
+                lambda: not self._pending and not self._running, timeout
+            )
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """
+            stops accepting experiments
+        :param wait: wait for the submitted experiments to finish. if False, the
+                    experiments that did not start yet are cancelled
+        :param cancel_pending: cancel the experiments that did not start yet
+        """
+        with self._lock:
+            self._closed = True
+            if cancel_pending or not wait:
+                for queued in list(self._pending):
+                    self._cancel_locked(queued)
+        if wait:
+            self.join()
+        self._pool.shutdown(wait=wait)
+
+    def pending(self) -> List[QueuedExperiment]:
+        """
+        the experiments that did not start yet, in the order they will start
+        """
+        with self._lock:
+            return sorted(self._pending, key=self._order)
+
+    def metrics(self) -> QueueMetrics:
+        """
+        returns a snapshot of the queue depth, wait times and throughput
+        """
+        with self._lock:
+            finished = list(self._finished)
+            started = [
+                queued.wait_time
+                for queued in itertools.chain(finished, self._running)
+                if queued.wait_time is not None
+            ]
+            elapsed = (
+                time.time() - self._first_submit_time
+                if self._first_submit_time is not None
+                else 0
+            )
+
+            def count(status):
+                return sum(1 for queued in finished if queued.status == status)
+
+            return QueueMetrics(
+                depth=len(self._pending),
+                running=len(self._running),
+                done=count(QueuedExperimentStatus.Done),
+                failed=count(QueuedExperimentStatus.Failed),
+                cancelled=count(QueuedExperimentStatus.Cancelled),
+                mean_wait_time=sum(started) / len(started) if started else 0.0,
+                max_wait_time=max(started, default=0.0),
+                throughput=len(finished) / elapsed if elapsed > 0 else 0.0,
+            )
+
+    @staticmethod
+    def _order(queued: QueuedExperiment):
+        return -queued.priority, queued._sequence
+
+    def _dispatch(self):
+        # called with the lock held. starts the pending experiments by priority,
+        # while there are free workers, skipping experiments that wait for others
+        for queued in sorted(self._pending, key=self._order):
+            if len(self._running) >= self._max_workers:
+                return
+            failed = [d for d in queued._depends_on if d.status in _UNSUCCESSFUL]
+            if failed:
+                self._pending.remove(queued)
+                self._finish(
+                    queued,
+                    QueuedExperimentStatus.Failed,
+                    error=EntropyError(
+                        f"experiment {queued.definition.label} did not run, "
+                        f"because experiment {failed[0].definition.label} "
+                        f"{failed[0].status.name.lower()}"
+                    ),
+                )
+                # experiments that depend on it may fail too
+                return self._dispatch()
+            if any(not d.done() for d in queued._depends_on):
+                continue
+            keys = queued._resource_keys()
+            if keys & self._resources_in_use:
+                continue
+            self._pending.remove(queued)
+            self._running.add(queued)
+            self._resources_in_use.update(keys)
+            queued._status = QueuedExperimentStatus.Running
+            queued.start_time = time.time()
+            self._pool.submit(self._run, queued)
+
+    def _run(self, queued: QueuedExperiment):
+        logger.info(f"Queue is running experiment {queued.definition.label}")
+        handle, error = None, None
+        try:
+            handle = queued.definition.run(queued._db, **queued._kwargs)
+        except BaseException as e:
+            logger.error(f"Queued experiment {queued.definition.label} failed: {e}")
+            error = e
+        with self._lock:
+            self._running.discard(queued)
+            self._resources_in_use.difference_update(queued._resource_keys())
+            queued._handle = handle
+            self._finish(
+                queued,
+                QueuedExperimentStatus.Done
+                if error is None
+                else QueuedExperimentStatus.Failed,
+                error,
+            )
+            self._dispatch()
+
+    def _finish(
+        self,
+        queued: QueuedExperiment,
+        status: QueuedExperimentStatus,
+        error: Optional[BaseException] = None,
+    ):
+        queued._status = status
+        queued._error = error
+        queued.end_time = time.time()
+        self._finished.append(queued)
+        queued._finished.set()
+        self._lock.notify_all()
+
+    def _cancel(self, queued: QueuedExperiment) -> bool:
+        with self._lock:
+            if queued not in self._pending:
+                return False
+            self._cancel_locked(queued)
+            self._dispatch()
+            return True
+
+    def _cancel_locked(self, queued: QueuedExperiment):
+        self._pending.remove(queued)
+        self._finish(
+            queued,
+            QueuedExperimentStatus.Cancelled,
+            EntropyError(f"experiment {queued.definition.label} was cancelled"),
+        )
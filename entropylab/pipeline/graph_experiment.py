@@ -1,27 +1,76 @@
 import asyncio
 import enum
-import sys
+import re
 import time
 import traceback
-from copy import deepcopy
+from concurrent.futures import (
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    ProcessPoolExecutor,
+    FIRST_COMPLETED,
+    wait,
+)
+from contextlib import nullcontext
+from copy import copy
+from functools import partial
 from datetime import datetime
-from inspect import signature, iscoroutinefunction, getfullargspec
-from itertools import count
-from typing import Optional, Dict, Any, Set, Union, Callable, Coroutine, Iterable
+from dataclasses import dataclass
+from inspect import (
+    signature,
+    iscoroutinefunction,
+    isgeneratorfunction,
+    isasyncgenfunction,
+    isasyncgen,
+    Parameter,
+)
+from itertools import count, product
+from typing import (
+    Optional,
+    Dict,
+    Any,
+    Set,
+    Union,
+    Callable,
+    Coroutine,
+    Iterable,
+    List,
+    Tuple,
+    FrozenSet,
+    Iterator,
+    Mapping,
+    Awaitable,
+    ContextManager,
+    TYPE_CHECKING,
+)
 
+import numpy as np
 from graphviz import Digraph
+from pandas import DataFrame
+from plotly import graph_objects as go
 
 from entropylab.pipeline.api.data_reader import (
     DataReader,
     NodeResults,
     ExperimentReader,
+    ResultRecord,
+)
+from entropylab.pipeline.api.data_writer import (
+    DataWriter,
+    NodeData,
+    ExperimentInitialData,
+    ExperimentEndData,
+    RawResultData,
+    Metadata,
+    Debug,
+    PlotSpec,
 )
-from entropylab.pipeline.api.data_writer import DataWriter, NodeData
 from entropylab.pipeline.api.errors import EntropyError
 from entropylab.pipeline.api.execution import (
     ExperimentExecutor,
     EntropyContext,
     _EntropyContextFactory,
+    _RecordingEntropyContext,
 )
 from entropylab.pipeline.api.experiment import (
     ExperimentDefinition,
@@ -33,11 +82,46 @@ from entropylab.pipeline.api.graph import (
     Node,
     Output,
     _NodeExecutionInfo,
+    _NodeScheduler,
+    _ancestors_of,
     RetryBehavior,
+    MemoizeBehavior,
+)
+from entropylab.pipeline.api.incremental import (
+    PARAMS_KEY_LABEL,
+    params_key,
+    up_to_date_outputs,
+)
+from entropylab.pipeline.api.output_stream import OutputStream
+from entropylab.pipeline.api.shared_memory import (
+    SharedMemoryTransport,
+    attach_inputs,
+    is_available as shared_memory_available,
+    share_outputs,
+)
+from entropylab.pipeline.api.profiler import (
+    NODE_PROFILE_LABEL,
+    NodeProfile,
+    GraphProfile,
+)
+from entropylab.pipeline.api.node_cache import (
+    CACHE_KEY_LABEL,
+    cache_key,
+    default_node_cache,
+    find_cached_outputs,
+    has_closure,
+    program_fingerprint,
+    NodeResultCache,
 )
+from entropylab.pipeline.params.param_store import ParamStore
 from entropylab.components.lab_topology import ExperimentResources
+from entropylab.config import settings
 from entropylab.logger import logger
 
+if TYPE_CHECKING:
+    # zmq is only imported by graphs that run on distributed workers
+    from entropylab.pipeline.distributed.coordinator import NodeCoordinator
+
 
 def _handle_wait_time(wait_time, backoff, added_delay, maximum_wait_time):
     wait_time *= backoff
@@ -59,8 +143,8 @@ def _retry(
     for attempt in range(number_of_attempts):
         try:
             return function()
-        except BaseException as e:
-            if attempt == number_of_attempts:
+        except Exception as e:
+            if attempt == number_of_attempts - 1:
                 raise e
             else:
                 logger.warning(
@@ -73,6 +157,103 @@ def _retry(
                 )
 
 
+async def _retry_async(
+    node_label: str,
+    function: Callable[[], Awaitable[Any]],
+    number_of_attempts,
+    wait_time,
+    maximum_wait_time=None,
+    backoff: float = 1,
+    added_delay: float = 0,
+):
+    # like _retry, but awaits every attempt, and waits between attempts without
+    # blocking the event loop
+    for attempt in range(number_of_attempts):
+        try:
+            return await function()
+        except Exception as e:
+            if attempt == number_of_attempts - 1:
+                raise e
+            else:
+                logger.warning(
+                    f"node {node_label} has error, retrying #{attempt + 1}"
+                    f" in {wait_time} seconds : {e}"
+                )
+                await asyncio.sleep(wait_time)
+                wait_time = _handle_wait_time(
+                    wait_time, backoff, added_delay, maximum_wait_time
+                )
+
+
+async def _with_timeout(
+    awaitable: Awaitable[Any], timeout: Optional[float], node_label: str
+) -> Any:
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        raise EntropyError(
+            f"node {node_label} did not finish within {timeout} seconds"
+        ) from e
+
+
+def _run_program(
+    label: str,
+    program: Union[Callable, Coroutine],
+    args: List[Any],
+    kwargs: Dict[str, Any],
+    context: _RecordingEntropyContext,
+    retry_behavior: Optional[RetryBehavior],
+    timeout: Optional[float],
+) -> Tuple[Any, List[Tuple[str, tuple]], int, float]:
+    # runs a PyNode program in a worker thread or process, and returns its results
+    # together with the data it saved, the number of attempts and when it started
+    started_at = time.time()
+    attempts = 0
+
+    def call():
+        nonlocal attempts
+        attempts += 1
+        context._records.clear()
+        if iscoroutinefunction(program):
+            return asyncio.run(_with_timeout(program(*args, **kwargs), timeout, label))
+        return program(*args, **kwargs)
+
+    if retry_behavior is not None:
+        results = _retry(
+            label,
+            call,
+            number_of_attempts=retry_behavior.number_of_attempts,
+            wait_time=retry_behavior.wait_time,
+            backoff=retry_behavior.backoff,
+            added_delay=retry_behavior.added_delay,
+            maximum_wait_time=retry_behavior.max_wait_time,
+        )
+    else:
+        results = call()
+    return results, context._records, attempts, started_at
+
+
+def _run_program_sharing_memory(
+    min_bytes: int,
+    label: str,
+    program: Union[Callable, Coroutine],
+    args: List[Any],
+    kwargs: Dict[str, Any],
+    context: _RecordingEntropyContext,
+    retry_behavior: Optional[RetryBehavior],
+    timeout: Optional[float],
+) -> Tuple[Any, List[Tuple[str, tuple]], int, float]:
+    # runs a PyNode program in a worker process. Inputs in shared memory are mapped,
+    # and large array outputs are placed in shared memory, instead of pickling them
+    args, kwargs = attach_inputs(args, kwargs)
+    results, records, attempts, started_at = _run_program(
+        label, program, args, kwargs, context, retry_behavior, timeout
+    )
+    return share_outputs(results, min_bytes), records, attempts, started_at
+
+
 def pynode(
     label: str,
     input_vars: Dict[str, Output] = None,
@@ -113,6 +294,11 @@ class PyNode(Node):
         5. If function parameter name is "is_last",
            Entropy will pass True if this is the last node in the graph
 
+    The function can also be a generator, or an async generator, that yields
+    dictionaries of partial outputs. Every yielded value is saved as it arrives, and
+    is passed to the nodes that are connected to node.streams, while the node
+    is still running. When the node is done, every output is the list of
+    its yielded values.
     """
 
     def __init__(
@@ -124,6 +310,12 @@ class PyNode(Node):
         must_run_after: Set[Node] = None,
         save_results: bool = True,
         retry_on_error: RetryBehavior = None,
+        priority: int = 0,
+        memoize: MemoizeBehavior = None,
+        timeout: Optional[float] = None,
+        resources: Optional[Iterable[str]] = None,
+        param_reads: Optional[Iterable[str]] = None,
+        param_writes: Optional[Iterable[str]] = None,
     ):
         """
             Node that gets a python function or coroutine and wraps
@@ -149,11 +341,40 @@ class PyNode(Node):
                         return a dictionary, which it's keys are the same as output vars
         :param must_run_after: A set of nodes. If those nodes are in the same graph,
                             current node will run after they finish execution.
+        :param priority: nodes with a higher priority start first, when several
+                        nodes are ready to run.
+        :param memoize: if given, the node does not run again when its function,
+                        inputs and the kwargs it accepts are unchanged, and its
+                        outputs are restored from an earlier run.
+        :param timeout: maximal duration of a single attempt to run the node, in
+                        seconds. Only coroutines are interrupted when they time out.
+        :param resources: names of the experiment resources (instruments) the node
+                        uses. Nodes that use the same resource do not run at the
+                        same time.
+        :param param_reads: keys of the ParamStore params the function reads, see
+                        Graph.run_incremental()
+        :param param_writes: keys of the ParamStore params the function writes
         """
         super().__init__(
-            label, input_vars, output_vars, must_run_after, save_results, retry_on_error
+            label,
+            input_vars,
+            output_vars,
+            must_run_after,
+            save_results,
+            retry_on_error,
+            priority,
+            memoize,
+            timeout,
+            resources,
+            param_reads,
+            param_writes,
         )
         self._program = program
+        self._fingerprint: Optional[bytes] = None
+        self._call_plan: Optional[_CallPlan] = None
+        if program is not None:
+            # inspects the function once, and validates the node inputs on creation
+            self._get_call_plan()
 
     async def _execute_async(
         self,
@@ -167,7 +388,7 @@ class PyNode(Node):
         )
 
         try:
-            if iscoroutinefunction(self._program):
+            if self._get_call_plan().is_coroutine:
                 results = await self._program(
                     *args_parameters, **keyword_function_parameters
                 )
@@ -190,7 +411,7 @@ class PyNode(Node):
         )
 
         try:
-            if iscoroutinefunction(self._program):
+            if self._get_call_plan().is_coroutine:
                 results = asyncio.run(
                     self._program(*args_parameters, **keyword_function_parameters)
                 )
@@ -201,6 +422,52 @@ class PyNode(Node):
         except BaseException as e:
             raise e
 
+    def _streams_outputs(self) -> bool:
+        return self._program is not None and self._get_call_plan().is_generator
+
+    def _stream(
+        self,
+        input_values: Dict[str, Any],
+        context: EntropyContext,
+        is_last,
+        **kwargs,
+    ):
+        args_parameters, keyword_function_parameters = self._prepare_for_execution(
+            context, is_last, kwargs, input_values
+        )
+        return self._program(*args_parameters, **keyword_function_parameters)
+
+    def _stream_values(self, item) -> Dict[str, Any]:
+        if not isinstance(item, Dict):
+            raise EntropyError(
+                f"node {self.label} should yield dictionaries but yielded {type(item)}"
+            )
+        return {
+            name: value for name, value in item.items() if name in self._output_vars
+        }
+
+    def _cache_key(
+        self,
+        input_values: Dict[str, Any],
+        context: EntropyContext,
+        is_last,
+        kwargs: Dict[str, Any],
+    ) -> Optional[str]:
+        if self._fingerprint is None or has_closure(self._program):
+            # the values a closure captured can change between runs
+            self._fingerprint = program_fingerprint(self._program)
+        args, keyword_args = self._prepare_for_execution(
+            context, is_last, kwargs, input_values
+        )
+        keyword_args = {
+            name: value
+            for name, value in keyword_args.items()
+            if not isinstance(value, EntropyContext)
+        }
+        return cache_key(
+            self.label, self._fingerprint, self._output_vars, args, keyword_args
+        )
+
     def _handle_results(self, results):
         outputs = {}
         if isinstance(results, Dict):
@@ -224,57 +491,199 @@ class PyNode(Node):
     def _prepare_for_execution(
         self, context, is_last, kwargs, input_values: Dict[str, Any]
     ):
-        sig = signature(self._program)
-        keyword_function_parameters = {}
-        for param in sig.parameters:
-            if sig.parameters[param].annotation is EntropyContext:
-                keyword_function_parameters[param] = context
-        if "is_last" in sig.parameters:
+        plan = self._get_call_plan()
+        keyword_function_parameters = {name: context for name in plan.context_params}
+        if plan.takes_is_last:
             keyword_function_parameters["is_last"] = is_last
-        (
-            args,
-            varargs,
-            varkw,
-            defaults,
-            kwonlyargs,
-            kwonlydefaults,
-            annotations,
-        ) = getfullargspec(self._program)
-        for arg in args + kwonlyargs:
-            if (
-                arg not in input_values
-                and arg not in keyword_function_parameters
-                and arg not in kwargs
-                and (
-                    (defaults and arg not in defaults)
-                    or (kwonlydefaults and arg not in kwonlydefaults)
+        for name, required in plan.params:
+            if name in input_values:
+                keyword_function_parameters[name] = input_values[name]
+            elif name in kwargs:
+                keyword_function_parameters[name] = kwargs[name]
+            elif required and name not in keyword_function_parameters:
+                logger.error(
+                    f"Error in node {self.label} - {name} is not in parameters"
                 )
-            ):
-                logger.error(f"Error in node {self.label} - {arg} is not in parameters")
-                raise KeyError(arg)
-
-            if arg in input_values:
-                keyword_function_parameters[arg] = input_values[arg]
-            elif arg in kwargs:
-                keyword_function_parameters[arg] = kwargs[arg]
+                raise KeyError(name)
         args_parameters = []
-        if varargs is not None:
+        if plan.takes_varargs:
             for item in input_values:
                 if item not in keyword_function_parameters:
                     args_parameters.append(input_values[item])
         return args_parameters, keyword_function_parameters
 
+    def _required_kwargs(self) -> Set[str]:
+        if self._program is None:
+            return set()
+        plan = self._get_call_plan()
+        return {
+            name
+            for name, required in plan.params
+            if required
+            and name not in self._input_vars
+            and name not in plan.context_params
+            and name != "is_last"
+        }
+
+    def _get_call_plan(self) -> "_CallPlan":
+        if self._call_plan is None:
+            self._call_plan = _CallPlan.of(self._program)
+            self._validate_inputs()
+            if self._call_plan.is_generator and self._retry_on_error is not None:
+                logger.warning(
+                    f"Node {self.label} is a generator, it will not be retried "
+                    f"since its yielded values are passed on as they arrive"
+                )
+        return self._call_plan
+
+    def _validate_inputs(self):
+        plan = self._call_plan
+        if plan.takes_varargs:
+            return
+        names = {name for name, _ in plan.params}
+        for input_name in self._input_vars:
+            if input_name not in names:
+                logger.warning(
+                    f"Input {input_name} of node {self.label} is not a parameter "
+                    f"of its function, and will not be passed to it"
+                )
+
+
+@dataclass(frozen=True)
+class _CallPlan:
+    """
+    How the parameters of a PyNode function are filled, inspected once per function
+    """
+
+    is_coroutine: bool
+    is_generator: bool
+    context_params: Tuple[str, ...]
+    takes_is_last: bool
+    # (parameter name, True if the parameter has no default value)
+    params: Tuple[Tuple[str, bool], ...]
+    takes_varargs: bool
+
+    @staticmethod
+    def of(program: Union[Callable, Coroutine]) -> "_CallPlan":
+        parameters = signature(program).parameters.values()
+        return _CallPlan(
+            is_coroutine=iscoroutinefunction(program),
+            is_generator=isgeneratorfunction(program) or isasyncgenfunction(program),
+            context_params=tuple(
+                param.name for param in parameters if param.annotation is EntropyContext
+            ),
+            takes_is_last=any(param.name == "is_last" for param in parameters),
+            params=tuple(
+                (param.name, param.default is Parameter.empty)
+                for param in parameters
+                if param.kind not in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD)
+            ),
+            takes_varargs=any(
+                param.kind == Parameter.VAR_POSITIONAL for param in parameters
+            ),
+        )
+
 
 def _create_actual_graph(nodes: Set[Node], key_nodes: Set[Node]):
-    nodes_copy: Dict[Node, Node] = {node: deepcopy(node) for node in nodes}
-    for node in nodes_copy:
-        for input_var in nodes_copy[node]._input_vars:
-            output = node._input_vars[input_var]
-            nodes_copy[node]._input_vars[input_var] = nodes_copy[output.node].outputs[
-                output.name
-            ]
-        nodes_copy[node]._must_run_after = {nodes_copy[m] for m in node._must_run_after}
-    return {_NodeExecutionInfo(nodes_copy[node], node in key_nodes) for node in nodes}
+    # Nodes are copied shallowly and connected to the copies of their parents, so the
+    # graph is not affected by later changes to the given nodes, and user objects
+    # (programs, captured arrays, instrument handles) are shared, not copied.
+    # The state of every run is kept by its _NodeExecutor.
+    nodes_copy: Dict[Node, Node] = {node: copy(node) for node in nodes}
+    for node, node_copy in nodes_copy.items():
+        node_copy._input_vars = {
+            input_var: Output(nodes_copy[output.node], output.name, output.stream)
+            for input_var, output in node._input_vars.items()
+        }
+        node_copy._must_run_after = {nodes_copy[m] for m in node._must_run_after}
+    graph = {_NodeExecutionInfo(nodes_copy[node], node in key_nodes) for node in nodes}
+    if any(_is_inlined(info.node) for info in graph):
+        graph = _inline_sub_graphs(graph)
+    return graph
+
+
+def _is_inlined(node: Node) -> bool:
+    return isinstance(node, SubGraphNode) and node.inline
+
+
+def _inline_sub_graphs(graph: Set[_NodeExecutionInfo]) -> Set[_NodeExecutionInfo]:
+    # Replaces every inlined sub graph node with copies of its nodes, labeled
+    # "<sub graph label>.<node label>", so they are scheduled with the outer nodes.
+    # Nodes of the sub graph without parents run after the parents of the sub graph
+    # node, and inputs that were connected to the sub graph node outputs are
+    # connected to the leaves of the sub graph that produce them.
+    inlined: Dict[Node, Dict[Node, Node]] = {}
+    leaves: Dict[Node, Set[Node]] = {}
+    actual_graph = set()
+    for info in graph:
+        sub_graph = info.node
+        if not _is_inlined(sub_graph):
+            actual_graph.add(info)
+            continue
+        inner_copy: Dict[Node, Node] = {}
+        for inner in sub_graph._graph:
+            node_copy = copy(inner.node)
+            node_copy._label = f"{sub_graph.label}.{inner.node.label}"
+            node_copy._priority = max(inner.node.priority, sub_graph.priority)
+            inner_copy[inner.node] = node_copy
+        for inner in sub_graph._graph:
+            node_copy = inner_copy[inner.node]
+            node_copy._input_vars = {
+                input_var: Output(inner_copy[output.node], output.name, output.stream)
+                for input_var, output in inner.node._input_vars.items()
+            }
+            node_copy._must_run_after = {
+                inner_copy[m] for m in inner.node._must_run_after
+            }
+        inner_leaves = sub_graph._graph_helper.leaves
+        inlined[sub_graph] = inner_copy
+        leaves[sub_graph] = {inner_copy[leaf] for leaf in inner_leaves}
+        for inner in sub_graph._graph:
+            is_key_node = inner.is_key_node or (
+                info.is_key_node and inner.node in inner_leaves
+            )
+            actual_graph.add(_NodeExecutionInfo(inner_copy[inner.node], is_key_node))
+
+    def actual_output(output: Output) -> Output:
+        if output.node not in inlined:
+            return output
+        producers = [
+            leaf for leaf in leaves[output.node] if output.name in leaf._output_vars
+        ]
+        if len(producers) != 1:
+            raise EntropyError(
+                f"output {output.name} of inlined sub graph {output.node.label} "
+                f"should be produced by exactly one of its leaves"
+            )
+        return Output(producers[0], output.name, output.stream)
+
+    def actual_dependencies(nodes: Iterable[Node]) -> Set[Node]:
+        dependencies = set()
+        for node in nodes:
+            dependencies.update(leaves.get(node, {node}))
+        return dependencies
+
+    for info in graph:
+        if info.node in inlined:
+            continue
+        info.node._input_vars = {
+            input_var: actual_output(output)
+            for input_var, output in info.node._input_vars.items()
+        }
+        info.node._must_run_after = actual_dependencies(info.node._must_run_after)
+    for sub_graph, inner_copy in inlined.items():
+        parents = actual_dependencies(
+            {output.node for output in sub_graph._input_vars.values()}
+            | set(sub_graph._must_run_after)
+        )
+        for inner, node_copy in inner_copy.items():
+            node_copy._input_vars = {
+                input_var: actual_output(output)
+                for input_var, output in node_copy._input_vars.items()
+            }
+            if not inner._input_vars and not inner._must_run_after:
+                node_copy._must_run_after = node_copy._must_run_after | parents
+    return actual_graph
 
 
 class SubGraphNode(Node):
@@ -293,6 +702,10 @@ class SubGraphNode(Node):
         key_nodes: Optional[Set[Node]] = None,
         save_results: bool = True,
         retry_on_error: RetryBehavior = None,
+        priority: int = 0,
+        timeout: Optional[float] = None,
+        inline: bool = False,
+        resources: Optional[Iterable[str]] = None,
     ):
         """
 
@@ -305,10 +718,39 @@ class SubGraphNode(Node):
                         return a dictionary, which it's keys are the same as output vars
         :param must_run_after: A set of nodes. If those nodes are in the same graph,
                             current node will run after they finish execution.
+        :param priority: nodes with a higher priority start first, when several
+                        nodes are ready to run.
+        :param timeout: maximal duration of a single attempt to run the sub graph,
+                        in seconds. Nodes of the sub graph that are still running
+                        when it times out are cancelled.
+        :param inline: if True, the nodes of the sub graph are scheduled together
+                        with the nodes of the graph that contains it, instead of
+                        running as a single node, so they can run in parallel with
+                        other nodes. They are labeled "<label>.<node label>",
+                        start after the parents of the sub graph node, and its
+                        outputs are passed from the leaves of the sub graph that
+                        produce them. Inlined sub graphs can't have a timeout or
+                        retry on error.
+        :param resources: names of experiment resources the sub graph uses. A sub
+                        graph that is not inlined also uses the resources of its
+                        nodes.
         """
         super().__init__(
-            label, input_vars, output_vars, must_run_after, save_results, retry_on_error
+            label,
+            input_vars,
+            output_vars,
+            must_run_after,
+            save_results,
+            retry_on_error,
+            priority,
+            timeout=timeout,
+            resources=resources,
         )
+        if inline and (timeout is not None or retry_on_error is not None):
+            raise ValueError(
+                f"inlined sub graph {label} can't have a timeout or retry on error"
+            )
+        self._inline = inline
         self._key_nodes = key_nodes
         if self._key_nodes is None:
             self._key_nodes = set()
@@ -329,6 +771,29 @@ class SubGraphNode(Node):
             raise Exception(
                 "graph parameter type is not supported, please pass a Node or set of nodes"
             )
+        self._graph_helper = GraphHelper(self._graph)
+        if not self._inline:
+            # the sub graph runs as a single node, which holds the resources and
+            # params of all its nodes
+            self._resources = self._resources.union(
+                *(info.node.resources for info in self._graph)
+            )
+            self._param_reads = self._param_reads.union(
+                *(info.node.param_reads for info in self._graph)
+            )
+            self._param_writes = self._param_writes.union(
+                *(info.node.param_writes for info in self._graph)
+            )
+
+    @property
+    def inline(self) -> bool:
+        """
+        :return: True if the sub graph nodes are scheduled with the outer graph nodes
+        """
+        return self._inline
+
+    def _required_kwargs(self) -> Set[str]:
+        return set().union(*(info.node._required_kwargs() for info in self._graph))
 
     async def _execute_async(
         self,
@@ -337,10 +802,7 @@ class SubGraphNode(Node):
         is_last,
         **kwargs,
     ) -> Dict[str, Any]:
-        executors = {node.node: _NodeExecutor(node) for node in self._graph}
-        return await _AsyncGraphExecutor(
-            self._graph, executors, **kwargs
-        ).execute_async(context._context_factory)
+        return await self._run_graph_async(context, kwargs)
 
     def _execute(
         self,
@@ -349,12 +811,49 @@ class SubGraphNode(Node):
         is_last,
         **kwargs,
     ) -> Dict[str, Any]:
-        executors = {node.node: _NodeExecutor(node) for node in self._graph}
-        return _GraphExecutor(self._graph, executors, **kwargs).execute(
+        return self._run_graph(context, kwargs)
+
+    async def _run_graph_async(
+        self,
+        context: EntropyContext,
+        kwargs: Dict[str, Any],
+        profile: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        executors = _node_executors(self._graph, profile)
+        return await _AsyncGraphExecutor(
+            self._graph_helper, executors, kwargs
+        ).execute_async(context._context_factory)
+
+    def _run_graph(
+        self,
+        context: EntropyContext,
+        kwargs: Dict[str, Any],
+        profile: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        executors = _node_executors(self._graph, profile)
+        return _GraphExecutor(self._graph_helper, executors, kwargs).execute(
             context._context_factory
         )
 
 
+def _node_executors(
+    nodes: Iterable[_NodeExecutionInfo], profile: Optional[bool] = None
+) -> Dict[Node, "_NodeExecutor"]:
+    # profile overrides the "profiling.enabled" setting, if given
+    executors = {node.node: _NodeExecutor(node) for node in nodes}
+    if profile is not None:
+        for executor in executors.values():
+            executor.profile = profile
+    return executors
+
+
+async def _as_async_iterator(items: Iterable):
+    # iterates a generator in the event loop, letting other tasks run between items
+    for item in items:
+        yield item
+        await asyncio.sleep(0)
+
+
 class _NodeExecutor:
     def __init__(self, node_execution_info: _NodeExecutionInfo) -> None:
         super().__init__()
@@ -364,6 +863,21 @@ class _NodeExecutor:
         self.result: Dict[str, Any] = {}
         self.to_run = True
         self._is_key_node = node_execution_info.is_key_node
+        self._pending_cache_key: Optional[str] = None
+        # streams of the node outputs, indexed by output name
+        self.streams: Dict[str, List[OutputStream]] = {}
+        self._streamed = False
+        # profile of the node execution, saved when profiling is enabled
+        self.profile: bool = settings.get("profiling.enabled", False)
+        self.ready_time: Optional[float] = None
+        self._profile_start = 0.0
+        self._attempts = 0
+        self._serialization_time = 0.0
+        self._status = "done"
+        # params store of an incremental run, that records the params the node read
+        self.param_store: Optional[ParamStore] = None
+        # shared memory of the outputs of nodes that run in worker processes
+        self.transport: Optional[SharedMemoryTransport] = None
 
     def run(
         self,
@@ -375,30 +889,22 @@ class _NodeExecutor:
         if self.to_run:
             context = context_factory.create()
             self._prepare_for_run(context)
-            retry_behavior = self._node._retry_on_error_function()
-            if retry_behavior is not None:
-                self.result = _retry(
-                    self._node.label,
-                    lambda: self._node._execute(
-                        input_values,
-                        context,
-                        is_last,
-                        **kwargs,
-                    ),
-                    number_of_attempts=retry_behavior.number_of_attempts,
-                    wait_time=retry_behavior.wait_time,
-                    backoff=retry_behavior.backoff,
-                    added_delay=retry_behavior.added_delay,
-                    maximum_wait_time=retry_behavior.max_wait_time,
-                )
-            else:
-                self.result = self._node._execute(
-                    input_values,
-                    context,
-                    is_last,
-                    **kwargs,
-                )
-            return self._handle_result(context)
+            key = self._cache_key(input_values, context, is_last, kwargs)
+            if self._restore_outputs(key, context):
+                return self._handle_result(context)
+            try:
+                if self._node.timeout is not None:
+                    # runs in asyncio, so the node is interrupted when it times out
+                    self.result = asyncio.run(
+                        self._execute_async(input_values, context, is_last, kwargs)
+                    )
+                else:
+                    self.result = self._execute(input_values, context, is_last, kwargs)
+            except BaseException as e:
+                self._save_profile(context, e)
+                raise
+            self._memoize_outputs(key, context)
+            return self._handle_result(context, save_results=not self._streamed)
 
     async def run_async(
         self,
@@ -410,39 +916,312 @@ class _NodeExecutor:
         if self.to_run:
             context = context_factory.create()
             self._prepare_for_run(context)
-            retry_behavior = self._node._retry_on_error_function()
-            if retry_behavior is not None:
-                self.result = await _retry(
-                    self._node.label,
-                    lambda: self._node._execute_async(
-                        input_values,
-                        context,
-                        is_last,
-                        **kwargs,
-                    ),
-                    number_of_attempts=retry_behavior.number_of_attempts,
-                    wait_time=retry_behavior.wait_time,
-                    backoff=retry_behavior.backoff,
-                    added_delay=retry_behavior.added_delay,
-                    maximum_wait_time=retry_behavior.max_wait_time,
+            key = self._cache_key(input_values, context, is_last, kwargs)
+            if self._restore_outputs(key, context):
+                return self._handle_result(context)
+            try:
+                self.result = await self._execute_async(
+                    input_values, context, is_last, kwargs
                 )
+            except BaseException as e:
+                self._save_profile(context, e)
+                raise
+            self._memoize_outputs(key, context)
+            return self._handle_result(context, save_results=not self._streamed)
+
+    def _execute(
+        self,
+        input_values: Dict[str, Any],
+        context: EntropyContext,
+        is_last: int,
+        kwargs: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        if self._node._streams_outputs():
+            self._attempts += 1
+            stream = self._node._stream(input_values, context, is_last, **kwargs)
+            if isasyncgen(stream):
+                return asyncio.run(self._consume_async(stream, context))
+            return self._consume(stream, context)
+
+        def attempt() -> Dict[str, Any]:
+            self._attempts += 1
+            if isinstance(self._node, SubGraphNode):
+                # the sub graph nodes are profiled like the nodes of this graph
+                return self._node._run_graph(context, kwargs, self.profile)
+            return self._node._execute(
+                input_values,
+                context,
+                is_last,
+                **kwargs,
+            )
+
+        retry_behavior = self._node._retry_on_error_function()
+        if retry_behavior is not None:
+            return _retry(
+                self._node.label,
+                attempt,
+                number_of_attempts=retry_behavior.number_of_attempts,
+                wait_time=retry_behavior.wait_time,
+                backoff=retry_behavior.backoff,
+                added_delay=retry_behavior.added_delay,
+                maximum_wait_time=retry_behavior.max_wait_time,
+            )
+        return attempt()
+
+    async def _execute_async(
+        self,
+        input_values: Dict[str, Any],
+        context: EntropyContext,
+        is_last: int,
+        kwargs: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        if self._node._streams_outputs():
+            self._attempts += 1
+            return await _with_timeout(
+                self._consume_async(
+                    self._node._stream(input_values, context, is_last, **kwargs),
+                    context,
+                ),
+                self._node.timeout,
+                self._node.label,
+            )
+
+        def attempt() -> Awaitable[Dict[str, Any]]:
+            self._attempts += 1
+            if isinstance(self._node, SubGraphNode):
+                # the sub graph nodes are profiled like the nodes of this graph
+                execution = self._node._run_graph_async(context, kwargs, self.profile)
             else:
-                self.result = await self._node._execute_async(
+                execution = self._node._execute_async(
                     input_values,
                     context,
                     is_last,
                     **kwargs,
                 )
-            return self._handle_result(context)
+            return _with_timeout(
+                execution,
+                self._node.timeout,
+                self._node.label,
+            )
+
+        retry_behavior = self._node._retry_on_error_function()
+        if retry_behavior is not None:
+            return await _retry_async(
+                self._node.label,
+                attempt,
+                number_of_attempts=retry_behavior.number_of_attempts,
+                wait_time=retry_behavior.wait_time,
+                backoff=retry_behavior.backoff,
+                added_delay=retry_behavior.added_delay,
+                maximum_wait_time=retry_behavior.max_wait_time,
+            )
+        return await attempt()
+
+    def submit(
+        self,
+        pool: Executor,
+        input_values: Dict[str, Any],
+        context_factory: _EntropyContextFactory,
+        is_last: int,
+        share_resources: bool,
+        **kwargs,
+    ) -> Tuple[Future, EntropyContext]:
+        """
+        runs the node program in the given pool. The stage id and node metadata
+        are assigned and saved by the calling thread.
+        """
+        context = context_factory.create()
+        self._prepare_for_run(context)
+        self._pending_cache_key = self._cache_key(
+            input_values, context, is_last, kwargs
+        )
+        if self._restore_outputs(self._pending_cache_key, context):
+            self._pending_cache_key = None
+            future = Future()
+            future.set_result((self.result, [], 0, self._profile_start))
+            return future, context
+        worker_context = _RecordingEntropyContext(
+            context._exp_id,
+            context._experiment_resources if share_resources else None,
+            context._get_stage_id(),
+        )
+        run_program = _run_program
+        if self.transport is not None:
+            input_values = self.transport.handles(input_values)
+            run_program = partial(_run_program_sharing_memory, self.transport.min_bytes)
+        args, keyword_args = self._node._prepare_for_execution(
+            worker_context, is_last, kwargs, input_values
+        )
+        future = pool.submit(
+            run_program,
+            self._node.label,
+            self._node._program,
+            args,
+            keyword_args,
+            worker_context,
+            self._node._retry_on_error_function(),
+            self._node.timeout,
+        )
+        return future, context
+
+    def finish(self, future: Future, context: EntropyContext) -> Dict[str, Any]:
+        """
+        saves the results of a node that was run using submit()
+        """
+        try:
+            results, records, self._attempts, self._profile_start = future.result()
+        except BaseException as e:
+            self._save_profile(context, e)
+            raise
+        if self.transport is not None:
+            results = self.transport.adopt(self._node, results)
+        for method, args in records:
+            getattr(context, method)(*args)
+        self.result = self._node._handle_results(results)
+        self._memoize_outputs(self._pending_cache_key, context)
+        return self._handle_result(context)
+
+    def restore(self, outputs: Dict[str, Any]):
+        """
+        uses the given outputs, from an earlier run, instead of running the node
+        """
+        self.result = dict(outputs)
+        self.to_run = False
+
+    def open_stream(self, output_name: str) -> OutputStream:
+        """
+        returns a new stream of the given output, that receives its values while
+        the node runs
+        """
+        stream = OutputStream(f"{self._node.label}.{output_name}")
+        self.streams.setdefault(output_name, []).append(stream)
+        return stream
+
+    def close_streams(self, error: Optional[BaseException] = None):
+        """
+            ends the streams of the node outputs. Outputs of a node that did not
+            stream them as it ran are streamed now.
+        :param error: the error the node failed with
+        """
+        streams, self.streams = self.streams, {}
+        if error is None and not self._streamed:
+            for output_name, value in self.result.items():
+                values = value if self._node._streams_outputs() else [value]
+                for stream in streams.get(output_name, []):
+                    for item in values:
+                        stream.put(item)
+        for output_streams in streams.values():
+            for stream in output_streams:
+                stream.close(error)
+
+    def _consume(self, stream, context: EntropyContext) -> Dict[str, List[Any]]:
+        outputs = {name: [] for name in self._node._output_vars}
+        for item in stream:
+            for output_name, value in self._node._stream_values(item).items():
+                self._emit(outputs, output_name, value, context)
+                for output_stream in self.streams.get(output_name, []):
+                    output_stream.put(value)
+        self._streamed = True
+        return outputs
+
+    async def _consume_async(
+        self, stream, context: EntropyContext
+    ) -> Dict[str, List[Any]]:
+        outputs = {name: [] for name in self._node._output_vars}
+        if isasyncgen(stream):
+            items = stream
+        else:
+            items = _as_async_iterator(stream)
+        async for item in items:
+            for output_name, value in self._node._stream_values(item).items():
+                self._emit(outputs, output_name, value, context)
+                for output_stream in self.streams.get(output_name, []):
+                    await output_stream.put_async(value)
+        self._streamed = True
+        return outputs
+
+    def _emit(
+        self,
+        outputs: Dict[str, List[Any]],
+        output_name: str,
+        value: Any,
+        context: EntropyContext,
+    ):
+        outputs[output_name].append(value)
+        if self._node._should_save_results():
+            saving_start = time.time()
+            # every value gets its own label, the results of a stage are unique
+            index = len(outputs[output_name]) - 1
+            context.add_result(label=f"{output_name}[{index}]", data=value)
+            self._serialization_time += time.time() - saving_start
+
+    def _cache_key(
+        self,
+        input_values: Dict[str, Any],
+        context: EntropyContext,
+        is_last: int,
+        kwargs: Dict[str, Any],
+    ) -> Optional[str]:
+        if self._node._memoize_behavior() is None:
+            return None
+        return self._node._cache_key(input_values, context, is_last, kwargs)
+
+    def _restore_outputs(self, key: Optional[str], context: EntropyContext) -> bool:
+        if key is None:
+            return False
+        behavior = self._node._memoize_behavior()
+        cache = self._memoization_cache(behavior)
+        outputs = cache.get(key, behavior.ttl)
+        if outputs is None and behavior.use_results_db:
+            outputs = find_cached_outputs(
+                context._data_writer, key, self._node._output_vars, behavior.ttl
+            )
+            if outputs is not None:
+                cache.put(key, outputs)
+        if outputs is None:
+            return False
+        logger.info(f"Restored outputs of node {self._node.label} from cache")
+        self._status = "cached"
+        self.result = dict(outputs)
+        if self._node._should_save_results():
+            self._save_cache_key(key, context)
+        return True
 
-    def _handle_result(self, context):
+    @staticmethod
+    def _memoization_cache(behavior: MemoizeBehavior) -> NodeResultCache:
+        if behavior.cache is not None:
+            return behavior.cache
+        return default_node_cache()
+
+    def _memoize_outputs(self, key: Optional[str], context: EntropyContext):
+        if key is None:
+            return
+        behavior = self._node._memoize_behavior()
+        self._memoization_cache(behavior).put(key, self.result)
         if self._node._should_save_results():
-            # logger fetching results
-            for output_id in self.result:
-                output = self.result[output_id]
-                context.add_result(label=f"{output_id}", data=output)
+            self._save_cache_key(key, context)
+
+    @staticmethod
+    def _save_cache_key(key: str, context: EntropyContext):
+        context._data_writer.save_indexed_metadata(
+            context._exp_id, Metadata(CACHE_KEY_LABEL, context._stage_id, key)
+        )
+
+    def _handle_result(self, context, save_results: bool = True):
+        saving_start = time.time()
+        if save_results and self._node._should_save_results():
+            # all the outputs are saved in a single write
+            context.add_results(
+                {f"{output_id}": output for output_id, output in self.result.items()}
+            )
+        self._serialization_time += time.time() - saving_start
+        if self.param_store is not None:
+            key = params_key(self._node, self.param_store)
+            if key is not None:
+                context.add_metadata(PARAMS_KEY_LABEL, key)
 
         self._end_time = datetime.now()
+        self._save_profile(context)
         logger.debug(
             f"Done running node <{self._node.__class__.__name__}> {self._node.label}"
         )
@@ -453,6 +1232,10 @@ class _NodeExecutor:
             f"Running node <{self._node.__class__.__name__}> {self._node.label}"
         )
         self._start_time = datetime.now()
+        self._profile_start = self._start_time.timestamp()
+        self._attempts = 0
+        self._serialization_time = 0.0
+        self._status = "done"
         logger.debug(
             f"Saving metadata before running node "
             f"<{self._node.__class__.__name__}> {self._node.label} id={context._get_stage_id()}"
@@ -467,161 +1250,476 @@ class _NodeExecutor:
             ),
         )
 
+    def _save_profile(
+        self, context: EntropyContext, error: Optional[BaseException] = None
+    ):
+        if not self.profile:
+            return
+        if error is None:
+            status = self._status
+        elif isinstance(error, asyncio.CancelledError):
+            status = "cancelled"
+        else:
+            status = "failed"
+        end_time = time.time()
+        profile = NodeProfile(
+            self._node.label,
+            context._get_stage_id(),
+            status,
+            self._profile_start,
+            end_time,
+            self.ready_time,
+            execution_time=max(
+                0.0, end_time - self._profile_start - self._serialization_time
+            ),
+            serialization_time=self._serialization_time,
+            attempts=self._attempts,
+        )
+        context.add_metadata(NODE_PROFILE_LABEL, profile.to_dict())
+
+
+class _SchedulingGraphExecutor(ExperimentExecutor):
+    """
+    Base class of graph executors. Nodes are started by a _NodeScheduler, as soon
+    as all their parents are done. Nodes that receive streamed outputs run in a
+    thread pool, together with the node that streams them.
+    """
 
-class _AsyncGraphExecutor(ExperimentExecutor):
     def __init__(
         self,
-        nodes_execution_info: Set[_NodeExecutionInfo],
+        graph: GraphHelper,
         nodes: Dict[Node, _NodeExecutor],
-        **kwargs,
+        node_kwargs: Dict[str, Any],
+        max_concurrency: Optional[int] = None,
+        critical_path_first: bool = True,
+        resource_limits: Optional[Dict[str, int]] = None,
     ) -> None:
         super().__init__()
-        self._graph: GraphHelper = GraphHelper(nodes_execution_info)
-        self._node_kwargs = kwargs
-        self._tasks: Dict[Node, Any] = dict()
-        self._results: Dict = dict()
+        self._graph: GraphHelper = graph
+        self._node_kwargs = node_kwargs
         self._stopped = False
-        self._node_id_iter = count(start=0, step=1)
         self._executors: Dict[Node, _NodeExecutor] = nodes
-
-    def execute(self, context: _EntropyContextFactory) -> Any:
-        async_result = asyncio.run(self.execute_async(context))
-        return async_result
+        self._max_concurrency = max_concurrency
+        self._critical_path_first = critical_path_first
+        self._resource_limits = resource_limits
+        self._consumers_pool: Optional[ThreadPoolExecutor] = None
 
     @property
     def failed(self) -> bool:
         return self._stopped
 
-    async def execute_async(self, context_factory: _EntropyContextFactory):
-        # traverse the graph and run the nodes
-        end_nodes = self._graph.leaves
-
-        chains = []
-        for node in end_nodes:
-            chains.append(self._run_node_and_ancestors(node, context_factory, 0))
-
-        result = await asyncio.gather(*chains)
-        result = [x for x in result if x is not None]
-        combined_result = {}
-
-        if result:
-            combined_result = {k: v for d in result for k, v in d.items()}
-        return combined_result
+    def _create_scheduler(self) -> _NodeScheduler:
+        return _NodeScheduler(
+            self._graph,
+            self._max_concurrency,
+            self._critical_path_first,
+            self._resource_limits,
+        )
 
-    async def _run_node_and_ancestors(
-        self, node: Node, context_factory: _EntropyContextFactory, is_last: int
-    ):
-        tasks = []
-        for input_name in node.get_parents():
-            if input_name not in self._tasks:
-                task = self._run_node_and_ancestors(
-                    input_name, context_factory, is_last + 1
-                )
-                tasks.append(task)
-                self._tasks[input_name] = task
-            else:
-                tasks.append(self._tasks[input_name])
-        results = []
-        if len(tasks) > 0:
-            await asyncio.wait(tasks)
-            if self._stopped:
-                return None
-            results = {}
-            inputs_by_name = node.get_inputs_by_name()
-            for input_name in inputs_by_name:
-                parent_node = inputs_by_name[input_name].node
-                parent_output_name = inputs_by_name[input_name].name
-                if (
-                    parent_node not in self._executors
-                    or parent_output_name not in self._executors[parent_node].result
-                ):
+    def _pop_ready(self, scheduler: _NodeScheduler) -> List[Node]:
+        nodes = scheduler.pop_ready()
+        for node in nodes:
+            self._executors[node].ready_time = scheduler.ready_time(node)
+        return nodes
+
+    def _input_values(self, node: Node) -> Dict[str, Any]:
+        results = {}
+        for input_name, parent_node, output_name, stream in self._graph.inputs(node):
+            parent = self._executors.get(parent_node)
+            if stream and parent is not None:
+                results[input_name] = parent.open_stream(output_name)
+                continue
+            if parent is None or output_name not in parent.result:
+                raise EntropyError(f"node {node.label} input is missing: {output_name}")
+            results[input_name] = parent.result[output_name]
+        return results
+
+    def _start_stream_consumers(
+        self,
+        nodes: List[Node],
+        context_factory: _EntropyContextFactory,
+        leaves: FrozenSet[Node],
+    ) -> Tuple[Dict[Future, Tuple[Node, EntropyContext]], List[Node]]:
+        """
+        submits the nodes that receive streams to the consumers pool, before their
+        producers start, and returns their futures and the other nodes
+        """
+        consumers = {}
+        others = []
+        for node in nodes:
+            if (
+                self._graph.stream_producer(node) is None
+                or not self._executors[node].to_run
+            ):
+                others.append(node)
+                continue
+            try:
+                if not isinstance(node, PyNode) or node._streams_outputs():
                     raise EntropyError(
-                        f"node {node.label} input is missing: {parent_output_name}"
+                        f"node {node.label} receives a stream, so it should be "
+                        f"a PyNode that is not a generator"
                     )
-                results[input_name] = self._executors[parent_node].result[
-                    parent_output_name
-                ]
+                input_values = self._input_values(node)
+                future, context = self._executors[node].submit(
+                    self._get_consumers_pool(),
+                    input_values,
+                    context_factory,
+                    node in leaves,
+                    True,
+                    **self._node_kwargs,
+                )
+            except BaseException as e:
+                self._stop(node, e)
+                for other in nodes:
+                    self._executors[other].close_streams(e)
+                return consumers, []
+            streams = [v for v in input_values.values() if isinstance(v, OutputStream)]
+            future.add_done_callback(
+                lambda _, streams=streams: [stream._abandon() for stream in streams]
+            )
+            consumers[future] = node, context
+        return consumers, others
+
+    def _get_consumers_pool(self) -> ThreadPoolExecutor:
+        if self._consumers_pool is None:
+            # every consumer gets a thread, since producers wait for all of them
+            self._consumers_pool = ThreadPoolExecutor(
+                max_workers=max(1, len(self._graph.stream_consumers())),
+                thread_name_prefix="entropy-stream",
+            )
+        return self._consumers_pool
 
-        node_executor = self._executors[node]
+    def _run_inline(
+        self, node: Node, context_factory: _EntropyContextFactory, is_last: bool
+    ):
+        executor = self._executors[node]
+        if not executor.to_run:
+            executor.close_streams()
+            return
         try:
-            return await node_executor.run_async(
-                results,
+            executor.run(
+                self._input_values(node),
                 context_factory,
-                node in self._graph.leaves,
+                is_last,
                 **self._node_kwargs,
             )
         except BaseException as e:
-            self._stopped = True
-            trace = "\n".join(traceback.format_exception(*sys.exc_info()))
-            logger.error(
-                f"Stopping GraphHelper, Error in node {node.label} "
-                f"of type {e.__class__.__qualname__}. message: {e}\ntrace:\n{trace}"
-            )
-            return
+            executor.close_streams(e)
+            raise
+        executor.close_streams()
 
+    def _shutdown_streams(self):
+        if self._consumers_pool is None:
+            return
+        # ends the streams of producers that did not run
+        error = EntropyError("graph execution stopped")
+        for executor in self._executors.values():
+            if executor.streams:
+                executor.close_streams(error)
+        self._consumers_pool.shutdown(wait=True)
+        self._consumers_pool = None
+
+    def _stop(self, node: Node, e: BaseException):
+        self._stopped = True
+        trace = "\n".join(traceback.format_exception(type(e), e, e.__traceback__))
+        logger.error(
+            f"Stopping GraphHelper, Error in node {node.label} of type "
+            f"{e.__class__.__qualname__}. message: {e}\ntrace:\n{trace}"
+        )
 
-class _GraphExecutor(ExperimentExecutor):
-    def __init__(
-        self,
-        nodes_execution_info: Set[_NodeExecutionInfo],
-        nodes: Dict[Node, _NodeExecutor],
-        **kwargs,
-    ) -> None:
-        super().__init__()
-        self._graph: GraphHelper = GraphHelper(nodes_execution_info)
-        self._node_kwargs = kwargs
-        self._tasks: Dict[Node, Any] = dict()
-        self._results: Dict = dict()
-        self._stopped = False
-        self._executors: Dict[Node, _NodeExecutor] = nodes
+    def _stop_unscheduled(self):
+        self._stopped = True
+        logger.error(
+            "Stopping GraphHelper, some nodes could not run since their parents "
+            "did not finish"
+        )
 
-    def execute(self, context_factory: _EntropyContextFactory) -> Any:
-        sorted_nodes = self._graph.nodes_in_topological_order()
-
-        for node in sorted_nodes:
-            results = {}
-            inputs_by_name = node.get_inputs_by_name()
-            for input_name in inputs_by_name:
-                parent_node = inputs_by_name[input_name].node
-                parent_output_name = inputs_by_name[input_name].name
-                if (
-                    parent_node not in self._executors
-                    or parent_output_name not in self._executors[parent_node].result
-                ):
-                    raise EntropyError(
-                        f"node {node.label} input is missing: {parent_output_name}"
-                    )
-                results[input_name] = self._executors[parent_node].result[
-                    parent_output_name
-                ]
-            node_executor = self._executors[node]
-            try:
-                node_executor.run(
-                    results,
-                    context_factory,
-                    node in self._graph.leaves,
-                    **self._node_kwargs,
-                )
-            except BaseException as e:
-                self._stopped = True
-                trace = "\n".join(traceback.format_exception(*sys.exc_info()))
-                logger.error(
-                    f"Stopping GraphHelper, Error in node {node.label} of type "
-                    f"{e.__class__.__qualname__}. message: {e}\ntrace:\n{trace}"
-                )
-                return
+    def _combined_result(self, leaves: Set[Node]) -> Dict[str, Any]:
         combined_result = {}
-        for node in self._graph.leaves:
+        for node in leaves:
             result = self._executors[node].result
             if result:
                 for key in result:
                     combined_result[key] = result[key]
-
         return combined_result
 
-    @property
-    def failed(self) -> bool:
-        return self._stopped
+
+class _AsyncGraphExecutor(_SchedulingGraphExecutor):
+    def execute(self, context: _EntropyContextFactory) -> Any:
+        async_result = asyncio.run(self.execute_async(context))
+        return async_result
+
+    async def execute_async(self, context_factory: _EntropyContextFactory):
+        try:
+            return await self._execute_nodes(context_factory)
+        finally:
+            self._shutdown_streams()
+
+    async def _execute_nodes(self, context_factory: _EntropyContextFactory):
+        scheduler = self._create_scheduler()
+        leaves = self._graph.leaves
+        running: Dict[asyncio.Future, Node] = {}
+        try:
+            while not scheduler.finished and not self._stopped:
+                consumers, nodes = self._start_stream_consumers(
+                    self._pop_ready(scheduler), context_factory, leaves
+                )
+                for future, (node, context) in consumers.items():
+                    task = asyncio.ensure_future(
+                        self._finish_consumer(node, future, context)
+                    )
+                    running[task] = node
+                for node in nodes:
+                    task = asyncio.ensure_future(
+                        self._run_node(node, context_factory, node in leaves)
+                    )
+                    running[task] = node
+                if not running:
+                    # e.g. a node was cancelled, so its children never become ready
+                    self._stop_unscheduled()
+                    break
+                finished, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    node = running.pop(task)
+                    if task.result():
+                        scheduler.done(node)
+        except asyncio.CancelledError:
+            # the graph is a sub graph of a node that was cancelled
+            self._stopped = True
+            raise
+        finally:
+            if running:
+                if self._stopped:
+                    # fails fast, so running nodes release the instruments
+                    for task in running:
+                        task.cancel()
+                await asyncio.wait(running)
+        if self._stopped:
+            return None
+        return self._combined_result(leaves)
+
+    async def _run_node(
+        self, node: Node, context_factory: _EntropyContextFactory, is_last: bool
+    ) -> bool:
+        executor = self._executors[node]
+        if not executor.to_run:
+            await asyncio.get_running_loop().run_in_executor(
+                None, executor.close_streams
+            )
+            return True
+        try:
+            await executor.run_async(
+                self._input_values(node),
+                context_factory,
+                is_last,
+                **self._node_kwargs,
+            )
+        except asyncio.CancelledError as e:
+            logger.warning(f"node {node.label} was cancelled")
+            await asyncio.get_running_loop().run_in_executor(
+                None, executor.close_streams, e
+            )
+            return False
+        except BaseException as e:
+            await asyncio.get_running_loop().run_in_executor(
+                None, executor.close_streams, e
+            )
+            self._stop(node, e)
+            return False
+        await asyncio.get_running_loop().run_in_executor(None, executor.close_streams)
+        return True
+
+    async def _finish_consumer(
+        self, node: Node, future: Future, context: EntropyContext
+    ) -> bool:
+        try:
+            await asyncio.wrap_future(future)
+            self._executors[node].finish(future, context)
+            return True
+        except asyncio.CancelledError:
+            # the consumer thread runs until its stream is closed
+            return False
+        except BaseException as e:
+            self._stop(node, e)
+            return False
+
+
+class _GraphExecutor(_SchedulingGraphExecutor):
+    def __init__(
+        self,
+        graph: GraphHelper,
+        nodes: Dict[Node, _NodeExecutor],
+        node_kwargs: Dict[str, Any],
+        critical_path_first: bool = True,
+    ) -> None:
+        super().__init__(graph, nodes, node_kwargs, 1, critical_path_first)
+
+    def execute(self, context_factory: _EntropyContextFactory) -> Any:
+        try:
+            return self._execute_nodes(context_factory)
+        finally:
+            self._shutdown_streams()
+
+    def _execute_nodes(self, context_factory: _EntropyContextFactory) -> Any:
+        scheduler = self._create_scheduler()
+        leaves = self._graph.leaves
+        while not scheduler.finished:
+            consumers, nodes = self._start_stream_consumers(
+                self._pop_ready(scheduler), context_factory, leaves
+            )
+            if self._stopped:
+                return
+            for node in nodes:
+                try:
+                    self._run_inline(node, context_factory, node in leaves)
+                except BaseException as e:
+                    self._stop(node, e)
+                    return
+                scheduler.done(node)
+            for future, (node, context) in consumers.items():
+                try:
+                    self._executors[node].finish(future, context)
+                except BaseException as e:
+                    self._stop(node, e)
+                    return
+                scheduler.done(node)
+        return self._combined_result(leaves)
+
+
+class _PoolGraphExecutor(_SchedulingGraphExecutor):
+    """
+    Runs PyNodes concurrently in a thread pool or a process pool. Stage ids are
+    assigned, and results are saved, by the coordinating thread. Other node types,
+    and nodes that stream their outputs, run in the coordinating thread.
+    """
+
+    def __init__(
+        self,
+        graph: GraphHelper,
+        nodes: Dict[Node, _NodeExecutor],
+        node_kwargs: Dict[str, Any],
+        use_processes: bool,
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        critical_path_first: bool = True,
+        resource_limits: Optional[Dict[str, int]] = None,
+        coordinator: Optional["NodeCoordinator"] = None,
+    ) -> None:
+        super().__init__(
+            graph,
+            nodes,
+            node_kwargs,
+            max_concurrency,
+            critical_path_first,
+            resource_limits,
+        )
+        self._use_processes = use_processes
+        self._max_workers = max_workers
+        self._coordinator = coordinator
+        self._transport: Optional[SharedMemoryTransport] = None
+
+    def execute(self, context_factory: _EntropyContextFactory) -> Any:
+        if (
+            self._use_processes
+            and shared_memory_available()
+            and settings.get("shared_memory.enabled", True)
+        ):
+            self._transport = SharedMemoryTransport(self._consumers())
+            for executor in self._executors.values():
+                executor.transport = self._transport
+        try:
+            return self._execute_nodes(context_factory)
+        finally:
+            self._shutdown_streams()
+            if self._transport is not None:
+                self._transport.close()
+
+    def _execute_nodes(self, context_factory: _EntropyContextFactory) -> Any:
+        scheduler = self._create_scheduler()
+        leaves = self._graph.leaves
+        running: Dict[Future, Tuple[Node, EntropyContext]] = {}
+        with self._create_pool() as pool:
+            while not scheduler.finished and not self._stopped:
+                consumers, nodes = self._start_stream_consumers(
+                    self._pop_ready(scheduler), context_factory, leaves
+                )
+                running.update(consumers)
+                for node in nodes:
+                    try:
+                        if self._runs_in_pool(node):
+                            future, context = self._executors[node].submit(
+                                pool,
+                                self._input_values(node),
+                                context_factory,
+                                node in leaves,
+                                self._shares_resources(),
+                                **self._node_kwargs,
+                            )
+                            running[future] = node, context
+                        else:
+                            self._run_inline(node, context_factory, node in leaves)
+                            scheduler.done(node)
+                            self._release_inputs(node)
+                    except BaseException as e:
+                        self._stop(node, e)
+                        break
+                if running and not self._stopped:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        node, context = running.pop(future)
+                        try:
+                            self._executors[node].finish(future, context)
+                            scheduler.done(node)
+                            self._release_inputs(node)
+                        except BaseException as e:
+                            self._stop(node, e)
+            for future in running:
+                future.cancel()
+        if self._stopped:
+            return None
+        return self._combined_result(leaves)
+
+    def _create_pool(self) -> ContextManager[Executor]:
+        if self._coordinator is not None:
+            # the coordinator is shared by graph runs, and is not stopped
+            return nullcontext(self._coordinator)
+        if self._use_processes:
+            return ProcessPoolExecutor(max_workers=self._max_workers)
+        return ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="entropy-node"
+        )
+
+    def _shares_resources(self) -> bool:
+        return not self._use_processes and self._coordinator is None
+
+    def _consumers(self) -> Dict[Node, int]:
+        # number of nodes that consume the outputs of every node
+        consumers: Dict[Node, int] = {}
+        for node in self._graph.nodes:
+            for parent in self._input_parents(node):
+                consumers[parent] = consumers.get(parent, 0) + 1
+        return consumers
+
+    def _input_parents(self, node: Node) -> Set[Node]:
+        return {
+            parent for _, parent, _, stream in self._graph.inputs(node) if not stream
+        }
+
+    def _release_inputs(self, node: Node):
+        # outputs in shared memory are unlinked once all their consumers are done
+        if self._transport is not None:
+            for parent in self._input_parents(node):
+                self._transport.release(parent)
+
+    def _runs_in_pool(self, node: Node) -> bool:
+        return (
+            isinstance(node, PyNode)
+            and self._executors[node].to_run
+            and not node._streams_outputs()
+            and not self._executors[node].streams
+        )
 
 
 class GraphReader(ExperimentReader):
@@ -676,10 +1774,26 @@ class GraphExperimentHandle(ExperimentHandle):
     def dot_graph(self):
         return self._graph.export_dot_graph()
 
+    def profile(self) -> GraphProfile:
+        """
+        returns the timing of every node that ran in the experiment: when it was
+        ready, started and ended, and how long it spent running and saving its
+        results. Use GraphProfile.save_chrome_trace() to view it as a timeline.
+        Nodes are profiled only when the graph was run with profiling enabled
+        (Graph(profile=True), or the "profiling.enabled" setting).
+        """
+        records = self._experiment.data_reader().get_metadata_records(
+            self.id, NODE_PROFILE_LABEL
+        )
+        return GraphProfile([NodeProfile.from_dict(record.data) for record in records])
+
 
 class GraphExecutionType(enum.Enum):
     Sync = 1
     Async = 2
+    Threads = 3
+    Processes = 4
+    Distributed = 5
 
 
 class Graph(ExperimentDefinition):
@@ -700,6 +1814,12 @@ class Graph(ExperimentDefinition):
         key_nodes: Optional[Set[Node]] = None,
         execution_type: GraphExecutionType = GraphExecutionType.Sync,
         user: str = "",
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        critical_path_first: bool = True,
+        resource_limits: Optional[Dict[str, int]] = None,
+        coordinator: Optional["NodeCoordinator"] = None,
+        profile: Optional[bool] = None,
     ) -> None:
         """
             Experiment defined by a graph model and runs within entropy.
@@ -712,7 +1832,30 @@ class Graph(ExperimentDefinition):
         :param key_nodes: a set of graph key nodes. those nodes will be marked as graph result.
         :param execution_type: specifty whether to run the graph in a sync mode, single node
                         on a given time, or asynchronously - which will run node in parallel
-                        according to their dependency and implementation (using async.io)
+                        according to their dependency and implementation (using async.io).
+                        Threads and Processes run PyNodes in parallel, according to
+                        their dependency, in a thread pool or a process pool.
+                        Use Processes for CPU bound python code. Its node functions,
+                        inputs and outputs must be picklable, and nodes can't use
+                        lab resources. Distributed runs PyNodes on the workers of
+                        the given coordinator, with the same limitations.
+        :param max_workers: maximal number of nodes that run in parallel with
+                        Threads or Processes execution types. Defaults to the
+                        concurrent.futures default.
+        :param max_concurrency: maximal number of nodes that run at the same time
+                        with Async, Threads or Processes execution types.
+        :param critical_path_first: when several nodes are ready to run, nodes of
+                        the same priority start by the length of the longest chain of
+                        nodes that depends on them, so the critical path starts first.
+        :param resource_limits: maximal number of nodes that use an experiment
+                        resource at the same time, indexed by resource name.
+                        Nodes that use a resource that is not given here do not
+                        run at the same time.
+        :param coordinator: a running NodeCoordinator, that sends the nodes of the
+                        Distributed execution type to its workers.
+        :param profile: save the timing of every node, as node_profile metadata
+                        (see GraphExperimentHandle.profile()). Defaults to the
+                        "profiling.enabled" setting, which is off by default.
         """
         super().__init__(resources, label, story, user)
         self._key_nodes = key_nodes
@@ -730,9 +1873,7 @@ class Graph(ExperimentDefinition):
                 "graph parameter type is not supported, please pass a Node or set of nodes"
             )
 
-        all_ancestors = set(
-            [anc for node in self._original_nodes for anc in node.ancestors()]
-        )
+        all_ancestors = _ancestors_of(self._original_nodes)
         if all_ancestors != self._original_nodes:
             raise Exception(
                 f"nodes has inputs that are not part of this graph: "
@@ -744,16 +1885,43 @@ class Graph(ExperimentDefinition):
         )
         self._to_node: Optional[Node] = None
         self._execution_type: GraphExecutionType = execution_type
+        self._max_workers = max_workers
+        self._max_concurrency = max_concurrency
+        self._critical_path_first = critical_path_first
+        self._resource_limits = resource_limits
+        if execution_type == GraphExecutionType.Distributed and coordinator is None:
+            raise EntropyError("Distributed execution requires a NodeCoordinator")
+        self._coordinator = coordinator
+        self._profile = profile
+        # node outputs that are restored instead of running the nodes, while
+        # resuming an experiment or running incrementally
+        self._restored_outputs: Optional[Dict[Node, Dict[str, Any]]] = None
+        self._resumed_from: Optional[int] = None
+        self._param_store: Optional[ParamStore] = None
 
     def _get_execution_instructions(self) -> ExperimentExecutor:
-        executors = {node.node: _NodeExecutor(node) for node in self._actual_graph}
-
-        if self._execution_type == GraphExecutionType.Sync:
-            return _GraphExecutor(self._actual_graph, executors, **self._kwargs)
-        elif self._execution_type == GraphExecutionType.Async:
-            return _AsyncGraphExecutor(self._actual_graph, executors, **self._kwargs)
-        else:
-            raise Exception(f"Execution type {self._execution_type} is not supported")
+        _warn_unknown_resources(self._actual_graph, self._resources)
+        executor = _create_graph_executor(
+            GraphHelper(self._actual_graph),
+            self._actual_graph,
+            self._kwargs,
+            self._execution_type,
+            self._max_workers,
+            self._max_concurrency,
+            self._critical_path_first,
+            self._restored_outputs,
+            self._resource_limits,
+            self._param_store,
+            self._coordinator,
+            self._profile,
+        )
+        if self._resumed_from is not None:
+            return _ResumedGraphExecutor(
+                executor,
+                self._resumed_from,
+                sorted(node.label for node in self._restored_outputs),
+            )
+        return executor
 
     def serialize(self) -> str:
         """
@@ -801,6 +1969,108 @@ class Graph(ExperimentDefinition):
             self.label = old_label
             self._actual_graph = full_graph
 
+    def resume(
+        self,
+        experiment_id: int,
+        db: Optional[DataWriter] = None,
+        label: Optional[str] = None,
+        **kwargs,
+    ) -> GraphExperimentHandle:
+        """
+            Continues a failed run of this graph in a new experiment. Outputs of
+            nodes that finished in the failed run are restored from its results,
+            and only the other nodes and their descendants run again.
+            Nodes are matched by their labels, so node labels should be unique.
+            Nodes without outputs, and generator nodes, count as finished only if
+            a node that waits for them started in the failed run.
+            The new experiment records the id of the failed run, in metadata
+            labeled "resumed_from".
+
+        :param experiment_id: the id of the failed experiment
+        :param db: results db that holds the failed experiment. the new experiment
+                    is saved to it as well. Defaults to the results db of the
+                    experiment resources.
+        :param label: label for the new experiment
+        :param kwargs: key word arguments that will be passed to the experiment code,
+                        usually the same as in the failed run.
+        :return: a handle of the new graph experiment run
+        """
+        reader = db if db is not None else self._resources.get_results_db()
+        if not isinstance(reader, DataReader):
+            raise EntropyError("resuming an experiment requires a results db reader")
+        if reader.get_experiment_record(experiment_id) is None:
+            raise EntropyError(f"experiment {experiment_id} does not exist")
+        graph = GraphHelper(self._actual_graph)
+        restored_outputs = _finished_node_outputs(graph, reader, experiment_id)
+        if len(restored_outputs) == len(self._actual_graph):
+            raise EntropyError(
+                f"all nodes finished in experiment {experiment_id}, nothing to resume"
+            )
+        logger.info(
+            f"Resuming experiment {experiment_id}, restored outputs of "
+            f"{len(restored_outputs)} nodes"
+        )
+        self._restored_outputs = restored_outputs
+        self._resumed_from = experiment_id
+        old_label, old_story = self.label, self.story
+        if label:
+            self.label = label
+        self.story = f"Resumed from experiment {experiment_id}" + (
+            f"\n{self.story}" if self.story else ""
+        )
+        try:
+            return self.run(reader, **kwargs)
+        finally:
+            self._restored_outputs = None
+            self._resumed_from = None
+            self.label, self.story = old_label, old_story
+
+    def run_incremental(
+        self,
+        param_store: ParamStore,
+        db: Optional[DataWriter] = None,
+        label: Optional[str] = None,
+        **kwargs,
+    ) -> GraphExperimentHandle:
+        """
+            Runs only the nodes whose params changed or expired since they last ran
+            incrementally, and the nodes that depend on them. The outputs of other
+            nodes are restored from their last run with the same params.
+            A node runs again when the values of its param_reads changed, when one
+            of them expired, or when one of its parents, or a node that writes one
+            of its params, runs again. Nodes that stream their outputs always run.
+            Nodes should be connected (by inputs or must_run_after) to the nodes
+            that write the params they read.
+
+        :param param_store: the params the nodes read
+        :param db: results db of earlier runs, the new experiment is saved to it as
+                    well. Defaults to the results db of the experiment resources.
+        :param label: label for the new experiment
+        :param kwargs: key word arguments that will be passed to the experiment code
+        :return: a handle of the new graph experiment run
+        """
+        reader = db if db is not None else self._resources.get_results_db()
+        if not isinstance(reader, DataReader):
+            raise EntropyError("incremental runs require a results db reader")
+        restored_outputs = up_to_date_outputs(
+            GraphHelper(self._actual_graph), param_store, reader
+        )
+        logger.info(
+            f"Running {len(self._actual_graph) - len(restored_outputs)} stale nodes, "
+            f"restored outputs of {len(restored_outputs)} nodes"
+        )
+        self._restored_outputs = restored_outputs
+        self._param_store = param_store
+        old_label = self.label
+        if label:
+            self.label = label
+        try:
+            return self.run(reader, **kwargs)
+        finally:
+            self._restored_outputs = None
+            self._param_store = None
+            self.label = old_label
+
     def _calculate_ancestors(self, node):
         ancestors: Set = set()
         for parent in node.ancestors():
@@ -810,3 +2080,624 @@ class Graph(ExperimentDefinition):
 
     def dot_graph(self) -> Digraph:
         return GraphHelper(self._actual_graph).export_dot_graph()
+
+    def run_sweep(
+        self,
+        grid: Union[Mapping[str, Iterable], Iterable[Mapping[str, Any]]],
+        db: Optional[DataWriter] = None,
+        max_workers: Optional[int] = None,
+        label: Optional[str] = None,
+        **kwargs,
+    ) -> "GraphSweepHandle":
+        """
+            Runs the graph once for every point of a parameter grid, as a single
+            experiment. Points run in parallel in a thread pool, and each point runs
+            the graph with its execution type. The graph is compiled and serialized
+            once, and the results of every point are written by the calling thread,
+            point after point.
+
+        :param grid: a dictionary of run kwargs names to the values they sweep,
+                        which sweeps their cartesian product, or a list of points,
+                        each a dictionary of run kwargs.
+        :param db: results db. if given, results will be saved in this DB. otherwise
+                results will only be saved during this python session
+        :param max_workers: maximal number of points that run in parallel.
+                        Defaults to 1 when the experiment uses lab resources, which
+                        are shared by all points, or to the concurrent.futures
+                        default otherwise.
+        :param label: label for the sweep experiment
+        :param kwargs: key word arguments that will be passed to the experiment code
+                        in every point, in addition to the point kwargs.
+        :return: a handle of the sweep, that reads the results of all points
+        """
+        return self.compile().run_sweep(grid, db, max_workers, label, **kwargs)
+
+    def compile(self) -> "CompiledGraph":
+        """
+            Validates and indexes the graph once, into an immutable execution plan
+            that can run many times with a low overhead per run.
+            Later changes to the graph nodes do not affect the compiled graph.
+        :return: the compiled graph
+        """
+        return CompiledGraph(self)
+
+
+class CompiledGraph(ExperimentDefinition):
+    """
+    An immutable execution plan of a graph experiment, created by Graph.compile().
+    The topological order, the ready sets of the scheduler and the input wiring of
+    every node are computed once, and node bindings are validated, so every run
+    only creates the per-run state of the nodes.
+    """
+
+    def __init__(self, graph: Graph) -> None:
+        """
+            An immutable execution plan of a graph experiment.
+        :param graph: the graph experiment to compile
+        """
+        super().__init__(graph._resources, graph.label, graph.story, graph._user)
+        self._nodes: FrozenSet[_NodeExecutionInfo] = frozenset(graph._actual_graph)
+        self._graph = GraphHelper(set(self._nodes))
+        self._execution_type = graph._execution_type
+        self._max_workers = graph._max_workers
+        self._max_concurrency = graph._max_concurrency
+        self._critical_path_first = graph._critical_path_first
+        self._resource_limits = graph._resource_limits
+        self._coordinator = graph._coordinator
+        self._profile = graph._profile
+        # computes the topological order once, and raises if the graph has a cycle
+        self._graph.nodes_in_topological_order()
+        if self._critical_path_first:
+            self._graph.critical_path_lengths()
+        self._validate_inputs()
+        _warn_unknown_resources(self._nodes, self._resources)
+        self._required_kwargs: FrozenSet[str] = frozenset().union(
+            *(info.node._required_kwargs() for info in self._nodes)
+        )
+        self._serialized: Optional[str] = None
+
+    @property
+    def required_kwargs(self) -> FrozenSet[str]:
+        """
+        names of the run kwargs that are required by the node functions
+        """
+        return self._required_kwargs
+
+    def _validate_inputs(self):
+        for info in self._nodes:
+            node = info.node
+            for input_name, parent, output_name, _ in self._graph.inputs(node):
+                if parent not in self._graph.parents(node):
+                    raise EntropyError(
+                        f"input {input_name} of node {node.label} is connected to "
+                        f"node {parent.label}, which is not part of the graph"
+                    )
+                if output_name not in parent._output_vars:
+                    raise EntropyError(
+                        f"input {input_name} of node {node.label} is connected to "
+                        f"output {output_name}, which node {parent.label} "
+                        f"does not declare"
+                    )
+
+    def _get_execution_instructions(self) -> ExperimentExecutor:
+        return self._create_executor(self._kwargs)
+
+    def _create_executor(
+        self, node_kwargs: Dict[str, Any]
+    ) -> "_SchedulingGraphExecutor":
+        return _create_graph_executor(
+            self._graph,
+            self._nodes,
+            node_kwargs,
+            self._execution_type,
+            self._max_workers,
+            self._max_concurrency,
+            self._critical_path_first,
+            resource_limits=self._resource_limits,
+            coordinator=self._coordinator,
+            profile=self._profile,
+        )
+
+    def serialize(self) -> str:
+        """
+        dot graph representing the experiment
+        """
+        if self._serialized is None:
+            self._serialized = str(self._graph.export_dot_graph())
+        return self._serialized
+
+    def run(self, db: Optional[DataWriter] = None, **kwargs) -> GraphExperimentHandle:
+        missing = self._required_kwargs.difference(kwargs)
+        if missing:
+            raise EntropyError(
+                f"graph nodes require run kwargs that were not given: "
+                f"{sorted(missing)}"
+            )
+        experiment = self._run(db, **kwargs)
+        return GraphExperimentHandle(experiment, self._graph)
+
+    def run_sweep(
+        self,
+        grid: Union[Mapping[str, Iterable], Iterable[Mapping[str, Any]]],
+        db: Optional[DataWriter] = None,
+        max_workers: Optional[int] = None,
+        label: Optional[str] = None,
+        **kwargs,
+    ) -> "GraphSweepHandle":
+        """
+        Runs the graph once for every point of a parameter grid, as a single
+        experiment. See Graph.run_sweep().
+        """
+        points, shape = _grid_points(grid)
+        names = set().union(*points)
+        missing = self._required_kwargs.difference(kwargs, names)
+        if missing:
+            raise EntropyError(
+                f"graph nodes require run kwargs that were not given: "
+                f"{sorted(missing)}"
+            )
+        sweep = _GraphSweep(self, points, shape, max_workers, label)
+        experiment = sweep._run(db, **kwargs)
+        return GraphSweepHandle(experiment, self._graph)
+
+    def dot_graph(self) -> Digraph:
+        return self._graph.export_dot_graph()
+
+
+SWEEP_POINTS_LABEL = "sweep_points"
+"""Label of the metadata that records the points of a graph sweep"""
+
+
+def _grid_points(
+    grid: Union[Mapping[str, Iterable], Iterable[Mapping[str, Any]]]
+) -> Tuple[List[Dict[str, Any]], Tuple[int, ...]]:
+    if isinstance(grid, Mapping):
+        names = list(grid)
+        values = [list(grid[name]) for name in names]
+        points = [dict(zip(names, point)) for point in product(*values)]
+        shape = tuple(len(axis) for axis in values)
+    else:
+        points = [dict(point) for point in grid]
+        shape = (len(points),)
+    if not points:
+        raise ValueError("sweep grid has no points")
+    return points, shape
+
+
+class _PointWriteBuffer(DataWriter):
+    """
+    Collects the writes of sweep points, so points can run in parallel, and their
+    writes are passed to the results db by a single thread. Results and nodes are
+    passed with bulk writes, so the writes of several points take a few commits.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._results: Dict[int, List[RawResultData]] = {}
+        self._nodes: Dict[int, List[NodeData]] = {}
+        self._writes: List[Tuple[str, tuple]] = []
+        self.stages: Dict[str, int] = {}
+
+    def save_experiment_initial_data(self, initial_data: ExperimentInitialData) -> int:
+        raise EntropyError("sweep points can not create experiments")
+
+    def save_experiment_end_data(self, experiment_id: int, end_data: ExperimentEndData):
+        raise EntropyError("sweep points can not end experiments")
+
+    def save_result(self, experiment_id: int, result: RawResultData):
+        self._results.setdefault(experiment_id, []).append(result)
+
+    def save_results(self, experiment_id: int, results: List[RawResultData]):
+        self._results.setdefault(experiment_id, []).extend(results)
+
+    def save_metadata(self, experiment_id: int, metadata: Metadata):
+        self._writes.append(("save_metadata", (experiment_id, metadata)))
+
+    def save_indexed_metadata(self, experiment_id: int, metadata: Metadata):
+        self._writes.append(("save_indexed_metadata", (experiment_id, metadata)))
+
+    def save_debug(self, experiment_id: int, debug: Debug):
+        self._writes.append(("save_debug", (experiment_id, debug)))
+
+    def save_plot(self, experiment_id: int, plot: PlotSpec, data: Any):
+        self._writes.append(("save_plot", (experiment_id, plot, data)))
+
+    def save_figure(self, experiment_id: int, figure: go.Figure) -> None:
+        self._writes.append(("save_figure", (experiment_id, figure)))
+
+    def save_node(self, experiment_id: int, node_data: NodeData):
+        self.stages[node_data.label] = node_data.stage_id
+        self._nodes.setdefault(experiment_id, []).append(node_data)
+
+    def update_experiment_favorite(self, experiment_id: int, favorite: bool) -> None:
+        raise EntropyError("sweep points can not update experiments")
+
+    def extend(self, other: "_PointWriteBuffer"):
+        """
+        adds the writes of another point
+        """
+        for experiment_id, results in other._results.items():
+            self.save_results(experiment_id, results)
+        for experiment_id, nodes in other._nodes.items():
+            self._nodes.setdefault(experiment_id, []).extend(nodes)
+        self._writes.extend(other._writes)
+
+    def flush(self, db: DataWriter):
+        """
+        writes the collected writes to the given db. Nodes and results are written
+        in bulk, and other writes in the order they were made
+        """
+        for experiment_id, nodes in self._nodes.items():
+            db.save_nodes(experiment_id, nodes)
+        for experiment_id, results in self._results.items():
+            db.save_results(experiment_id, results)
+        for method, args in self._writes:
+            getattr(db, method)(*args)
+        self._nodes.clear()
+        self._results.clear()
+        self._writes.clear()
+
+
+class _SweepExecutor(ExperimentExecutor):
+    """
+    Runs a compiled graph once for every sweep point, in a thread pool. Every point
+    gets its own stages, and its writes are saved by the calling thread, in chunks
+    of points (the "sweep.write_chunk_points" setting).
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph,
+        points: List[Dict[str, Any]],
+        shape: Tuple[int, ...],
+        node_kwargs: Dict[str, Any],
+        max_workers: Optional[int],
+    ) -> None:
+        super().__init__()
+        self._graph = graph
+        self._points = points
+        self._shape = shape
+        self._node_kwargs = node_kwargs
+        self._max_workers = max_workers
+        self._failed = False
+
+    @property
+    def failed(self) -> bool:
+        return self._failed
+
+    def execute(self, context_factory: _EntropyContextFactory) -> Any:
+        db = context_factory._data_writer
+        stages = count()
+        layout = []
+        chunk = _PointWriteBuffer()
+        chunk_points = settings.get("sweep.write_chunk_points", 16)
+        with ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="entropy-sweep"
+        ) as pool:
+            futures = [
+                pool.submit(self._run_point, point, context_factory, stages)
+                for point in self._points
+            ]
+            for point, future in zip(self._points, futures):
+                if self._failed:
+                    future.cancel()
+                    continue
+                failed, buffer = future.result()
+                chunk.extend(buffer)
+                layout.append({"kwargs": point, "stages": buffer.stages})
+                if failed:
+                    logger.error(f"Stopping sweep, point {point} failed")
+                    self._failed = True
+                if failed or len(layout) % chunk_points == 0:
+                    chunk.flush(db)
+        chunk.flush(db)
+        db.save_metadata(
+            context_factory._exp_id,
+            Metadata(SWEEP_POINTS_LABEL, -1, {"shape": self._shape, "points": layout}),
+        )
+        return None
+
+    def _run_point(
+        self,
+        point: Dict[str, Any],
+        context_factory: _EntropyContextFactory,
+        stages: Iterator[int],
+    ) -> Tuple[bool, _PointWriteBuffer]:
+        buffer = _PointWriteBuffer()
+        executor = self._graph._create_executor({**self._node_kwargs, **point})
+        executor.execute(
+            _EntropyContextFactory(
+                context_factory._exp_id,
+                buffer,
+                context_factory._experiment_resources,
+                stages,
+            )
+        )
+        return executor.failed, buffer
+
+
+class _GraphSweep(ExperimentDefinition):
+    """
+    Experiment of a compiled graph that runs once for every sweep point
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph,
+        points: List[Dict[str, Any]],
+        shape: Tuple[int, ...],
+        max_workers: Optional[int],
+        label: Optional[str],
+    ) -> None:
+        resources = graph.get_experiment_resources()
+        super().__init__(resources, label or graph.label, graph.story, graph._user)
+        self._graph = graph
+        self._points = points
+        self._shape = shape
+        self._max_workers = max_workers
+        if self._max_workers is None and (
+            resources._resources or resources._local_resources
+        ):
+            # lab resources are shared by all points
+            self._max_workers = 1
+
+    def _get_execution_instructions(self) -> ExperimentExecutor:
+        return _SweepExecutor(
+            self._graph, self._points, self._shape, self._kwargs, self._max_workers
+        )
+
+    def serialize(self) -> str:
+        return self._graph.serialize()
+
+    def run(self, db: Optional[DataWriter] = None, **kwargs) -> "GraphSweepHandle":
+        return GraphSweepHandle(self._run(db, **kwargs), self._graph._graph)
+
+
+class GraphSweepHandle(GraphExperimentHandle):
+    """
+    An handle of a graph sweep execution. Results of every node are read back
+    stacked by the sweep points.
+    """
+
+    def __init__(self, experiment: _Experiment, graph: GraphHelper) -> None:
+        super().__init__(experiment, graph)
+        self._layout: Optional[Dict[str, Any]] = None
+
+    def _get_layout(self) -> Dict[str, Any]:
+        if self._layout is None:
+            records = self._experiment.data_reader().get_metadata_records(
+                self.id, label=SWEEP_POINTS_LABEL
+            )
+            if not records:
+                raise EntropyError(f"Experiment {self.id} is not a graph sweep")
+            self._layout = records[0].data
+        return self._layout
+
+    @property
+    def points(self) -> List[Dict[str, Any]]:
+        """
+        the run kwargs of every sweep point, in the order they were swept
+        """
+        return [point["kwargs"] for point in self._get_layout()["points"]]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """
+        the shape of the sweep grid
+        """
+        return tuple(self._get_layout()["shape"])
+
+    def get_results(self, node_label: str, result_label: str) -> np.ndarray:
+        """
+            returns a result of a node in every sweep point, stacked into an array
+            in the shape of the sweep grid (followed by the shape of the result)
+        :param node_label: label of the node
+        :param result_label: label of the result, the node output name
+        """
+        stages = []
+        for point in self._get_layout()["points"]:
+            if node_label not in point["stages"]:
+                raise KeyError(f"Node {node_label} did not run in sweep point {point}")
+            stages.append(point["stages"][node_label])
+        records = self._experiment.data_reader().get_results_of_stages(
+            stages, self.id, result_label
+        )
+        values = []
+        for stage in stages:
+            if not records.get(stage):
+                raise KeyError(f"Node {node_label} has no result {result_label}")
+            values.append(records[stage][0].data)
+        values = np.asarray(values)
+        return values.reshape(self.shape + values.shape[1:])
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        returns a table with a row for every sweep point, with the point kwargs and
+        the results of all nodes, in columns named "<node label>.<result label>"
+        """
+        layout = self._get_layout()["points"]
+        labels = {}
+        for point in layout:
+            for node_label, stage in point["stages"].items():
+                labels[stage] = node_label
+        records = self._experiment.data_reader().get_results_of_stages(labels, self.id)
+        rows = []
+        for point in layout:
+            row = dict(point["kwargs"])
+            for node_label, stage in point["stages"].items():
+                for record in records.get(stage, []):
+                    row[f"{node_label}.{record.label}"] = record.data
+            rows.append(row)
+        return DataFrame(rows)
+
+
+def _warn_unknown_resources(
+    nodes: Iterable[_NodeExecutionInfo], resources: ExperimentResources
+):
+    if not (resources._resources or resources._local_resources):
+        # resource names are only used for scheduling
+        return
+    for info in nodes:
+        for name in info.node.resources:
+            if not resources.has_resource(name):
+                logger.warning(
+                    f"node {info.node.label} uses resource {name}, "
+                    f"which is not one of the experiment resources"
+                )
+
+
+def _create_graph_executor(
+    graph: GraphHelper,
+    nodes: Iterable[_NodeExecutionInfo],
+    node_kwargs: Dict[str, Any],
+    execution_type: GraphExecutionType,
+    max_workers: Optional[int],
+    max_concurrency: Optional[int],
+    critical_path_first: bool,
+    restored_outputs: Optional[Dict[Node, Dict[str, Any]]] = None,
+    resource_limits: Optional[Dict[str, int]] = None,
+    param_store: Optional[ParamStore] = None,
+    coordinator: Optional["NodeCoordinator"] = None,
+    profile: Optional[bool] = None,
+) -> ExperimentExecutor:
+    executors = _node_executors(nodes, profile)
+    if restored_outputs:
+        for node, outputs in restored_outputs.items():
+            executors[node].restore(outputs)
+    if param_store is not None:
+        for executor in executors.values():
+            executor.param_store = param_store
+    if execution_type == GraphExecutionType.Sync:
+        return _GraphExecutor(graph, executors, node_kwargs, critical_path_first)
+    elif execution_type == GraphExecutionType.Async:
+        return _AsyncGraphExecutor(
+            graph,
+            executors,
+            node_kwargs,
+            max_concurrency,
+            critical_path_first,
+            resource_limits,
+        )
+    elif execution_type in (
+        GraphExecutionType.Threads,
+        GraphExecutionType.Processes,
+        GraphExecutionType.Distributed,
+    ):
+        return _PoolGraphExecutor(
+            graph,
+            executors,
+            node_kwargs,
+            execution_type == GraphExecutionType.Processes,
+            max_workers,
+            max_concurrency,
+            critical_path_first,
+            resource_limits,
+            coordinator if execution_type == GraphExecutionType.Distributed else None,
+        )
+    else:
+        raise Exception(f"Execution type {execution_type} is not supported")
+
+
+RESUMED_FROM_LABEL = "resumed_from"
+"""Label of the metadata that links a resumed graph experiment to the failed one"""
+
+
+class _ResumedGraphExecutor(ExperimentExecutor):
+    """
+    Executes the nodes of a resumed graph experiment, after recording the
+    experiment it continues
+    """
+
+    def __init__(
+        self, executor: ExperimentExecutor, experiment_id: int, restored: List[str]
+    ) -> None:
+        super().__init__()
+        self._executor = executor
+        self._experiment_id = experiment_id
+        self._restored = restored
+
+    @property
+    def failed(self) -> bool:
+        return self._executor.failed
+
+    def execute(self, context_factory: _EntropyContextFactory) -> Any:
+        context_factory._data_writer.save_metadata(
+            context_factory._exp_id,
+            Metadata(
+                RESUMED_FROM_LABEL,
+                -1,
+                {
+                    "experiment_id": self._experiment_id,
+                    "restored_nodes": self._restored,
+                },
+            ),
+        )
+        return self._executor.execute(context_factory)
+
+
+def _finished_node_outputs(
+    graph: GraphHelper, reader: DataReader, experiment_id: int
+) -> Dict[Node, Dict[str, Any]]:
+    # returns the outputs of the nodes that finished in the given experiment, for
+    # the nodes whose descendants did not run again
+    by_label: Dict[str, List[Node]] = {}
+    for node in graph.nodes:
+        by_label.setdefault(node.label, []).append(node)
+    stages: Dict[Node, int] = {}
+    for node_label, nodes in by_label.items():
+        node_stages = reader.get_node_stage_ids_by_label(node_label, experiment_id)
+        if not node_stages:
+            continue
+        if len(nodes) > 1:
+            logger.warning(f"Nodes labeled {node_label} are not unique, will run again")
+            continue
+        stages[nodes[0]] = max(node_stages)
+    results = reader.get_results_of_stages(set(stages.values()), experiment_id)
+
+    def has_started_child(node: Node) -> bool:
+        return any(
+            child in stages and graph.stream_producer(child) is not node
+            for child in graph.children(node)
+        )
+
+    restored = {}
+    for node in graph.nodes_in_topological_order():
+        if node not in stages or not node._should_save_results():
+            continue
+        if any(parent not in restored for parent in graph.parents(node)):
+            continue
+        streamed = node._streams_outputs()
+        if (streamed or not node._output_vars) and not has_started_child(node):
+            continue
+        records = results.get(stages[node], [])
+        if streamed:
+            values = _streamed_outputs(records, node._output_vars)
+        else:
+            values = {record.label: record.data for record in records}
+        if all(name in values for name in node._output_vars):
+            restored[node] = {name: values[name] for name in node._output_vars}
+    return restored
+
+
+def _streamed_outputs(
+    records: Iterable[ResultRecord], output_vars: Iterable[str]
+) -> Dict[str, List[Any]]:
+    # streamed values are saved one by one, labeled "<output>[<index>]", and the
+    # outputs of a streaming node that was restored from the cache as a whole
+    labels = {
+        name: re.compile(rf"^{re.escape(name)}\[(\d+)\]$") for name in output_vars
+    }
+    outputs: Dict[str, Any] = {}
+    items: Dict[str, Dict[int, Any]] = {}
+    for record in records:
+        if record.label in labels:
+            outputs[record.label] = list(record.data)
+            continue
+        for name, label in labels.items():
+            match = label.match(record.label)
+            if match is not None:
+                items.setdefault(name, {})[int(match.group(1))] = record.data
+                break
+    for name, values in items.items():
+        outputs[name] = [values[index] for index in sorted(values)]
+    return outputs
@@ -12,9 +12,6 @@ import pandas as pd
 
 from entropylab.config import settings
 from entropylab.pipeline.params.persistence.persistence import Commit, Metadata
-from entropylab.pipeline.params.persistence.sqlalchemy.sqlalchemypersistence import (
-    SqlAlchemyPersistence,
-)
 from entropylab.pipeline.params.persistence.tinydb.tinydbpersistence import (
     TinyDbPersistence,
 )
@@ -22,6 +19,15 @@ from entropylab.pipeline.params.persistence.tinydb.tinydbpersistence import (
 UTC_TZ = "UTC"
 
 
+def _sqlalchemy_persistence(url: str):
+    # imported on use, since sqlalchemy and alembic are slow to import
+    from entropylab.pipeline.params.persistence.sqlalchemy.sqlalchemypersistence import (  # noqa: E501
+        SqlAlchemyPersistence,
+    )
+
+    return SqlAlchemyPersistence(url)
+
+
 @unique
 class MergeStrategy(Enum):
     OURS = 1
@@ -84,13 +90,13 @@ class ParamStore(MutableMapping):
         if path:
             self.__persistence = TinyDbPersistence(path)
         elif url:
-            self.__persistence = SqlAlchemyPersistence(url)
+            self.__persistence = _sqlalchemy_persistence(url)
         else:
             # ...over configuration settings
             if "param_store_path" in settings:
                 self.__persistence = TinyDbPersistence(settings.param_store_path)
             elif "param_store_url" in settings:
-                self.__persistence = SqlAlchemyPersistence(settings.param_store_url)
+                self.__persistence = _sqlalchemy_persistence(settings.param_store_url)
             else:
                 # default
                 self.__persistence = TinyDbPersistence()
@@ -0,0 +1,120 @@
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Any
+
+from entropylab.config import settings
+from entropylab.logger import logger
+
+InstrumentationHook = Callable[[str, float, Dict[str, Any]], None]
+"""A callback that is called with (operation, elapsed seconds, details) after every
+measured storage operation"""
+
+
+@dataclass
+class OperationStats:
+    """
+    Timing statistics of a single storage operation
+    """
+
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+
+class StorageInstrumentation:
+    """
+    Per-operation timers and counters for a results storage backend.
+
+    Operations are named "<layer>.<operation>", e.g. "hdf5.open" or "sql.commit".
+    Measurements may nest, so "hdf5.write" includes the time of "hdf5.serialize".
+    Operations slower than the slow operation threshold are logged as warnings.
+    """
+
+    def __init__(self, slow_operation_threshold: Optional[float] = None) -> None:
+        """
+            Per-operation timers and counters for a results storage backend.
+        :param slow_operation_threshold: operations that take longer than this number
+                        of seconds are logged. Defaults to the
+                        "instrumentation.slow_operation_threshold" setting, or no
+                        logging.
+        """
+        super().__init__()
+        if slow_operation_threshold is None:
+            slow_operation_threshold = settings.get(
+                "instrumentation.slow_operation_threshold", None
+            )
+        self.slow_operation_threshold: Optional[float] = slow_operation_threshold
+        self._stats: Dict[str, OperationStats] = {}
+        self._hooks: List[InstrumentationHook] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: InstrumentationHook) -> None:
+        """
+            registers a callback that is called after every measured operation
+        :param hook: a callable accepting (operation, elapsed seconds, details)
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: InstrumentationHook) -> None:
+        self._hooks.remove(hook)
+
+    @contextmanager
+    def measure(self, operation: str, **details):
+        """
+            measures the duration of the code within the context
+        :param operation: the operation name
+        :param details: extra information passed to hooks and the slow operation log
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(operation, perf_counter() - start, details)
+
+    def record(
+        self, operation: str, elapsed: float, details: Optional[Dict] = None
+    ) -> None:
+        """
+            records a single measurement of the given operation
+        :param operation: the operation name
+        :param elapsed: duration of the operation in seconds
+        :param details: extra information passed to hooks and the slow operation log
+        """
+        with self._lock:
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = OperationStats()
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+        threshold = self.slow_operation_threshold
+        if threshold is not None and elapsed >= threshold:
+            logger.warning(
+                f"Slow storage operation '{operation}' took {elapsed:.3f} seconds"
+                f" {details or ''}"
+            )
+        for hook in self._hooks:
+            try:
+                hook(operation, elapsed, details or {})
+            except Exception as e:
+                logger.error(f"Instrumentation hook failed for '{operation}': {e}")
+
+    def stats(self) -> Dict[str, OperationStats]:
+        """
+        returns a snapshot of the statistics of all measured operations
+        """
+        with self._lock:
+            return {name: replace(stats) for name, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        """
+        clears all collected statistics
+        """
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,5 @@
+from ._security import generate_secret_key
+from .client import RemoteDB
+from .server import ResultsServer, serve_results
+
+__all__ = ["RemoteDB", "ResultsServer", "serve_results", "generate_secret_key"]
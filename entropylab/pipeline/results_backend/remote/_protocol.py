@@ -0,0 +1,248 @@
+""" Wire protocol of the remote results service.
+
+Requests and replies are ZeroMQ multipart messages. A request sent from a client
+DEALER socket is:
+
+    [request id, method, payload, *buffers]
+
+where method is BATCH for a batch of write requests, whose frames are
+
+    [request id, BATCH, frame counts, *frames of each request]
+
+and the server replies with:
+
+    [request id, status, payload, *buffers]
+
+The request payload is a JSON encoding of the call arguments, that the server decodes
+without running code: it holds only numbers, strings, containers, datetimes, plotly
+figures and the dataclasses of the DataWriter and PersistentLabDB APIs. Numpy arrays
+and bytes are sent as separate frames, without being copied into the JSON payload.
+
+The reply payload is a pickle of the return value, since the records that are read
+may hold any picklable result data. Large binary objects, such as numpy arrays, are
+pickled out-of-band (pickle protocol 5), so their memory is sent as separate frames.
+Clients only unpickle replies of the server they connect to, which is authenticated
+when a secret key is used (see _security).
+"""
+import dataclasses
+import importlib
+import json
+import pickle
+from datetime import datetime
+from typing import Any, List
+
+import numpy as np
+from plotly import graph_objects as go
+from plotly import io as pio
+
+from entropylab.components.instrument_driver import Function, Parameter
+from entropylab.pipeline.api.data_writer import (
+    ExperimentInitialData,
+    ExperimentEndData,
+    RawResultData,
+    Metadata,
+    Debug,
+    PlotGenerator,
+    PlotSpec,
+    NodeData,
+)
+from entropylab.pipeline.api.errors import EntropyError
+
+BATCH = b"__batch__"
+OK = b"ok"
+ERROR = b"error"
+
+_OUT_OF_BAND = pickle.HIGHEST_PROTOCOL >= 5
+
+
+def dumps(obj: Any) -> List:
+    """Serializes the given object to a list of frames"""
+    if _OUT_OF_BAND:
+        buffers = []
+        payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        return [payload] + [buffer.raw() for buffer in buffers]
+    return [pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)]
+
+
+def loads(frames: List) -> Any:
+    """Deserializes an object from a list of frames (zmq.Frame or bytes)"""
+    payload = getattr(frames[0], "buffer", frames[0])
+    if _OUT_OF_BAND:
+        return pickle.loads(payload, buffers=[_writable(f) for f in frames[1:]])
+    return pickle.loads(payload)
+
+
+def dumps_error(e: BaseException) -> List:
+    """Serializes an exception, falling back to an EntropyError with its message"""
+    try:
+        return dumps(e)
+    except Exception:
+        return dumps(EntropyError(f"{e.__class__.__qualname__}: {e}"))
+
+
+def _writable(frame):
+    # out-of-band buffers are wrapped by the objects they belong to (e.g. arrays),
+    # so they are copied once into writable memory:
+    buffer = getattr(frame, "buffer", frame)
+    return bytearray(buffer)
+
+
+# the dataclasses that requests may hold
+_DATACLASSES = {
+    cls.__name__: cls
+    for cls in (
+        ExperimentInitialData,
+        ExperimentEndData,
+        RawResultData,
+        Metadata,
+        Debug,
+        PlotSpec,
+        NodeData,
+        Function,
+        Parameter,
+    )
+}
+
+_COLLECTIONS = {"tuple": tuple, "set": set, "frozenset": frozenset}
+
+# numpy kinds that are sent as raw memory: bool, numbers, strings and times
+_ARRAY_KINDS = "biufcSUmM"
+
+
+def dumps_request(obj: Any) -> List:
+    """Serializes the arguments of a request to a list of frames, without pickle"""
+    buffers = []
+    payload = json.dumps(_encode(obj, buffers)).encode()
+    return [payload] + buffers
+
+
+def loads_request(frames: List) -> Any:
+    """Deserializes the arguments of a request, without running any of its code"""
+    buffers = [_writable(f) for f in frames[1:]]
+    try:
+        return _decode(
+            json.loads(bytes(getattr(frames[0], "buffer", frames[0]))), buffers
+        )
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        raise EntropyError(f"Malformed request: {e}") from e
+
+
+def dumps_batch(calls: List[List]) -> List:
+    """Combines the frames of several serialized requests into one list of frames"""
+    return [json.dumps([len(frames) for frames in calls]).encode()] + [
+        frame for frames in calls for frame in frames
+    ]
+
+
+def loads_batch(frames: List) -> List[List]:
+    """Splits the frames of a batch to the frames of its requests"""
+    try:
+        counts = json.loads(bytes(getattr(frames[0], "buffer", frames[0])))
+    except ValueError as e:
+        raise EntropyError(f"Malformed batch: {e}") from e
+    calls, start = [], 1
+    for n in counts:
+        calls.append(frames[start : start + n])
+        start += n
+    return calls
+
+
+def _encode(obj: Any, buffers: List) -> Any:
+    if isinstance(obj, np.generic):
+        # numpy scalars subclass some of the builtin types, but keep their dtype
+        return _encode_array(obj, "npscalar", buffers)
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    for cls in (list, tuple, set, frozenset):
+        if isinstance(obj, cls):
+            return {"t": cls.__name__, "v": [_encode(item, buffers) for item in obj]}
+    if isinstance(obj, dict):
+        return {
+            "t": "dict",
+            "v": [[_encode(k, buffers), _encode(v, buffers)] for k, v in obj.items()],
+        }
+    if isinstance(obj, datetime):
+        return {"t": "datetime", "v": obj.isoformat()}
+    if isinstance(obj, complex):
+        return {"t": "complex", "v": [obj.real, obj.imag]}
+    if isinstance(obj, (bytes, bytearray)):
+        buffers.append(bytes(obj))
+        return {"t": "bytes", "i": len(buffers) - 1}
+    if isinstance(obj, np.ndarray):
+        return _encode_array(obj, "ndarray", buffers)
+    if isinstance(obj, go.Figure):
+        return {"t": "figure", "v": obj.to_json()}
+    if isinstance(obj, type) and issubclass(obj, PlotGenerator):
+        return {"t": "generator", "module": obj.__module__, "name": obj.__qualname__}
+    if dataclasses.is_dataclass(obj) and _DATACLASSES.get(type(obj).__name__) is type(
+        obj
+    ):
+        return {
+            "t": "dataclass",
+            "name": type(obj).__name__,
+            "v": {
+                field.name: _encode(getattr(obj, field.name), buffers)
+                for field in dataclasses.fields(obj)
+            },
+        }
+    raise EntropyError(
+        f"Values of type {type(obj).__qualname__} can not be sent to the results "
+        f"server. Use numbers, strings, numpy arrays, lists or dicts"
+    )
+
+
+def _encode_array(obj, kind: str, buffers: List) -> dict:
+    array = np.asarray(obj)
+    if array.dtype.kind not in _ARRAY_KINDS:
+        raise EntropyError(
+            f"numpy arrays of dtype {array.dtype} can not be sent to the results server"
+        )
+    # the memory of the array is sent without a copy
+    buffers.append(memoryview(array.reshape(-1).view(np.uint8)))
+    return {
+        "t": kind,
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "i": len(buffers) - 1,
+    }
+
+
+def _decode(obj: Any, buffers: List) -> Any:
+    if not isinstance(obj, dict):
+        return obj
+    kind = obj["t"]
+    if kind == "list":
+        return [_decode(item, buffers) for item in obj["v"]]
+    if kind in _COLLECTIONS:
+        return _COLLECTIONS[kind](_decode(item, buffers) for item in obj["v"])
+    if kind == "dict":
+        return {_decode(k, buffers): _decode(v, buffers) for k, v in obj["v"]}
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["v"])
+    if kind == "complex":
+        return complex(*obj["v"])
+    if kind == "bytes":
+        return bytes(buffers[obj["i"]])
+    if kind in ("ndarray", "npscalar"):
+        dtype = np.dtype(obj["dtype"])
+        if dtype.kind not in _ARRAY_KINDS:
+            raise ValueError(f"unsupported dtype {dtype}")
+        array = np.frombuffer(buffers[obj["i"]], dtype=dtype).reshape(obj["shape"])
+        return array if kind == "ndarray" else array[()]
+    if kind == "figure":
+        return pio.from_json(obj["v"])
+    if kind == "generator":
+        return _plot_generator(obj["module"], obj["name"])
+    if kind == "dataclass":
+        cls = _DATACLASSES[obj["name"]]
+        return cls(**{name: _decode(v, buffers) for name, v in obj["v"].items()})
+    raise ValueError(f"unknown type '{kind}'")
+
+
+def _plot_generator(module_name: str, name: str) -> type:
+    # plot generators are stored by their module and class names, so they are
+    # resolved like when plots are read from the db
+    cls = getattr(importlib.import_module(module_name), name, None)
+    if not (isinstance(cls, type) and issubclass(cls, PlotGenerator)):
+        raise ValueError(f"{module_name}.{name} is not a PlotGenerator")
+    return cls
@@ -0,0 +1,133 @@
+""" Authentication and bind checks of the ZeroMQ services.
+
+A service and its clients share a secret key: a CURVE secret key in Z85 form (see
+generate_secret_key()). The service and the clients use the key pair derived from
+it, so all messages are encrypted, and the service only accepts connections from
+peers that hold the same key.
+
+Services bind to loopback addresses by default. Binding to any other address must
+be allowed explicitly, and requires a secret key. Clients that run what a service
+sends them (node workers) connect to other machines only with a secret key.
+"""
+import ipaddress
+from typing import Optional
+from urllib.parse import urlsplit
+
+import zmq
+from zmq.auth.thread import ThreadAuthenticator
+
+from entropylab.config import settings
+from entropylab.pipeline.api.errors import EntropyError
+
+_LOCAL_TRANSPORTS = ("ipc", "inproc")
+_LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def generate_secret_key() -> str:
+    """Returns a new secret key, to be shared by a service and its clients"""
+    return zmq.curve_keypair()[1].decode("ascii")
+
+
+def secret_key_or_default(secret_key: Optional[str]) -> Optional[str]:
+    """the given secret key, or the "remote.secret_key" setting"""
+    if secret_key is None:
+        secret_key = settings.get("remote.secret_key", None)
+    return secret_key
+
+
+def is_loopback(address: str) -> bool:
+    """True if the given ZeroMQ address can only be reached from this machine"""
+    parts = urlsplit(address)
+    if parts.scheme in _LOCAL_TRANSPORTS:
+        return True
+    host = parts.netloc.rsplit(":", 1)[0].strip("[]")
+    if host in _LOCAL_HOSTS:
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        # "*", interface names and host names
+        return False
+
+
+def check_bind_address(
+    service: str, address: str, secret_key: Optional[str], allow_remote: bool
+) -> None:
+    """Raises EntropyError if the service would be reachable from the network
+    without being allowed to, or without authentication"""
+    if is_loopback(address):
+        return
+    if not allow_remote:
+        raise EntropyError(
+            f"{service} would be reachable from other machines at '{address}'. "
+            f"Bind to a loopback address, or allow remote connections explicitly "
+            f"(allow_remote=True, or --allow-remote)"
+        )
+    if secret_key is None:
+        raise EntropyError(
+            f"{service} at non-loopback address '{address}' requires a secret key, "
+            f"shared with its clients (secret_key, or the remote.secret_key setting)"
+        )
+
+
+def check_connect_address(service: str, address: str, secret_key: Optional[str]):
+    """Raises EntropyError if a client would connect to a service on another
+    machine without authenticating it"""
+    if is_loopback(address) or secret_key is not None:
+        return
+    raise EntropyError(
+        f"Connecting to {service} at non-loopback address '{address}' requires a "
+        f"secret key, shared with the service (secret_key, or the remote.secret_key "
+        f"setting)"
+    )
+
+
+class _SharedKey:
+    def __init__(self, public_key: bytes) -> None:
+        super().__init__()
+        self._public_key = public_key
+
+    def callback(self, domain: str, client_key: bytes) -> bool:
+        return client_key == self._public_key
+
+
+def secure_server(
+    context: zmq.Context, socket: zmq.Socket, secret_key: Optional[str]
+) -> Optional[ThreadAuthenticator]:
+    """
+        makes the socket a CURVE server that accepts only peers with the same secret
+        key. Must be called before the socket is bound.
+    :return: the authenticator, to be stopped when the socket is closed, or None
+                if no secret key is given
+    """
+    if secret_key is None:
+        return None
+    secret, public = _key_pair(secret_key)
+    authenticator = ThreadAuthenticator(context)
+    authenticator.start()
+    authenticator.configure_curve_callback("*", _SharedKey(public))
+    socket.curve_server = True
+    socket.curve_secretkey = secret
+    socket.curve_publickey = public
+    return authenticator
+
+
+def secure_client(socket: zmq.Socket, secret_key: Optional[str]) -> None:
+    """authenticates the socket to a CURVE server with the same secret key. Must be
+    called before the socket is connected"""
+    if secret_key is None:
+        return
+    secret, public = _key_pair(secret_key)
+    socket.curve_secretkey = secret
+    socket.curve_publickey = public
+    socket.curve_serverkey = public
+
+
+def _key_pair(secret_key: str):
+    secret = secret_key.encode("ascii")
+    try:
+        return secret, zmq.curve_public(secret)
+    except (zmq.ZMQError, ValueError) as e:
+        raise EntropyError(
+            "Invalid secret key, use generate_secret_key() to create one"
+        ) from e
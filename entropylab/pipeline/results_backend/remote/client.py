@@ -0,0 +1,538 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import count
+from typing import Optional, Any, List, Iterable, Dict, Set
+
+import zmq
+from pandas import DataFrame
+from plotly import graph_objects as go
+
+from entropylab.components.instrument_driver import Function, Parameter
+from entropylab.components.lab_topology import PersistentLabDB, ResourceRecord
+from entropylab.pipeline.api.data_reader import (
+    DataReader,
+    ExperimentRecord,
+    ResultRecord,
+    MetadataRecord,
+    DebugRecord,
+    PlotRecord,
+    FigureRecord,
+)
+from entropylab.pipeline.api.data_writer import (
+    DataWriter,
+    ExperimentInitialData,
+    ExperimentEndData,
+    RawResultData,
+    Metadata,
+    Debug,
+    PlotSpec,
+    NodeData,
+)
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.results_backend.remote import _protocol, _security
+from entropylab.pipeline.results_backend.remote.server import DEFAULT_ADDRESS
+
+
+class _Connection:
+    """
+    A DEALER socket with at most one outstanding request
+    """
+
+    def __init__(
+        self,
+        context: zmq.Context,
+        address: str,
+        timeout: float,
+        secret_key: Optional[str],
+    ) -> None:
+        super().__init__()
+        self._socket = context.socket(zmq.DEALER)
+        self._socket.setsockopt(zmq.LINGER, 0)
+        _security.secure_client(self._socket, secret_key)
+        self._socket.connect(address)
+        self._timeout_ms = int(timeout * 1000)
+        self._request_ids = count()
+
+    def request(self, method: bytes, payload: List) -> Any:
+        """
+            sends a request and waits for its reply
+        :param method: name of the method to call
+        :param payload: the frames of the call arguments, see dumps_request()
+        """
+        request_id = str(next(self._request_ids)).encode()
+        frames = [request_id, method] + payload
+        self._socket.send_multipart(frames, copy=False)
+        while True:
+            if not self._socket.poll(self._timeout_ms):
+                raise EntropyError(
+                    f"Results server did not respond to '{method.decode()}' in time"
+                )
+            reply = self._socket.recv_multipart(copy=False)
+            # a late reply to a request that timed out is discarded
+            if reply[0].bytes == request_id:
+                return _unpack_reply(reply[1:])
+
+    def close(self):
+        self._socket.close()
+
+
+def _unpack_reply(frames: List) -> Any:
+    status, payload = frames[0].bytes, _protocol.loads(frames[1:])
+    if status == _protocol.ERROR:
+        raise payload
+    return payload
+
+
+class _ConnectionPool:
+    """
+    A pool of connections, so several threads can make requests concurrently
+    """
+
+    def __init__(
+        self,
+        context: zmq.Context,
+        address: str,
+        size: int,
+        timeout: float,
+        secret_key: Optional[str],
+    ) -> None:
+        super().__init__()
+        self._context = context
+        self._address = address
+        self._timeout = timeout
+        self._secret_key = secret_key
+        self._idle: "queue.LifoQueue[_Connection]" = queue.LifoQueue()
+        self._available = threading.BoundedSemaphore(size)
+        self._all: List[_Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> _Connection:
+        with self._available:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            except EntropyError:
+                # the connection may hold a late reply, so it is replaced
+                self._discard(connection)
+                raise
+            else:
+                self._idle.put(connection)
+
+    def close(self):
+        with self._lock:
+            for connection in self._all:
+                connection.close()
+            self._all.clear()
+
+    def _connect(self) -> _Connection:
+        connection = _Connection(
+            self._context, self._address, self._timeout, self._secret_key
+        )
+        with self._lock:
+            self._all.append(connection)
+        return connection
+
+    def _discard(self, connection: _Connection):
+        with self._lock:
+            self._all.remove(connection)
+        connection.close()
+
+
+class _PipelinedWriter:
+    """
+    Sends write calls from a background thread, in order. Calls that are queued
+    while a batch is being sent are combined into the next batch, and up to
+    max_in_flight batches are sent without waiting for their replies.
+    Since a write returns before the server executes it, the error of a failed
+    write is raised by the next flush().
+    """
+
+    def __init__(
+        self,
+        context: zmq.Context,
+        address: str,
+        batch_size: int,
+        max_in_flight: int,
+        timeout: float,
+        secret_key: Optional[str],
+    ) -> None:
+        super().__init__()
+        self._context = context
+        self._address = address
+        self._batch_size = batch_size
+        self._max_in_flight = max_in_flight
+        self._timeout = timeout
+        self._secret_key = secret_key
+        # the frames of each call, see dumps_request()
+        self._pending: List[List] = []
+        self._in_flight: Dict[bytes, float] = {}
+        self._error: Optional[BaseException] = None
+        self._closing = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="entropy-remote-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, call: List):
+        with self._condition:
+            if self._closing:
+                raise EntropyError("RemoteDB is closed")
+            self._pending.append(call)
+            self._condition.notify_all()
+
+    def flush(self):
+        """
+        waits until all submitted calls were acknowledged by the server and raises
+        the first error that occurred since the last flush
+        """
+        with self._condition:
+            while self._pending or self._in_flight:
+                self._condition.wait()
+            error, self._error = self._error, None
+        if error is not None:
+            raise EntropyError(
+                f"Failed to write to the results server: {error}"
+            ) from error
+
+    def close(self):
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        socket = self._context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        _security.secure_client(socket, self._secret_key)
+        socket.connect(self._address)
+        request_ids = count()
+        try:
+            while True:
+                with self._condition:
+                    while not (self._pending or self._in_flight or self._closing):
+                        self._condition.wait()
+                    if self._closing and not (self._pending or self._in_flight):
+                        return
+                    batch = []
+                    if len(self._in_flight) < self._max_in_flight:
+                        batch = self._pending[: self._batch_size]
+                        del self._pending[: self._batch_size]
+                    if batch:
+                        request_id = str(next(request_ids)).encode()
+                        self._in_flight[request_id] = time.monotonic()
+                if batch:
+                    frames = [request_id, _protocol.BATCH] + _protocol.dumps_batch(
+                        batch
+                    )
+                    socket.send_multipart(frames, copy=False)
+                self._receive_replies(socket, block=not batch)
+        finally:
+            socket.close()
+
+    def _receive_replies(self, socket: zmq.Socket, block: bool):
+        timeout = 10 if block else 0
+        while socket.poll(timeout):
+            reply = socket.recv_multipart(copy=False)
+            try:
+                _unpack_reply(reply[1:])
+            except BaseException as e:
+                self._set_error(e)
+            with self._condition:
+                self._in_flight.pop(reply[0].bytes, None)
+                self._condition.notify_all()
+            timeout = 0
+        self._expire_in_flight()
+
+    def _expire_in_flight(self):
+        now = time.monotonic()
+        with self._condition:
+            expired = [
+                request_id
+                for request_id, sent in self._in_flight.items()
+                if now - sent > self._timeout
+            ]
+            for request_id in expired:
+                del self._in_flight[request_id]
+            if expired:
+                self._error = self._error or EntropyError(
+                    "Results server did not acknowledge writes in time"
+                )
+                self._condition.notify_all()
+
+    def _set_error(self, e: BaseException):
+        with self._condition:
+            if self._error is None:
+                self._error = e
+
+
+class RemoteDB(DataWriter, DataReader, PersistentLabDB):
+    """
+    Client of a ResultsServer, for saving and reading results of a project that is
+    hosted on another machine (or process).
+    Writes that don't return a value are batched and pipelined to the server in the
+    background, in the order they were made. Any call that reads data, or returns a
+    value, first waits for all previous writes to be acknowledged. Numpy arrays
+    are transferred in binary form.
+    Since writes return before the server executed them, a write that fails on the
+    server raises EntropyError (naming the failed write) on the next flush(),
+    close(), or call that reads data, rather than on the write itself.
+    Data is sent without pickle, so results must be numbers, strings, numpy arrays,
+    or lists and dicts of them. Writes of other values raise EntropyError.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        pool_size: int = 4,
+        batch_size: int = 256,
+        max_in_flight: int = 8,
+        timeout: float = 60,
+        secret_key: Optional[str] = None,
+    ):
+        """
+            Client of a ResultsServer
+        :param address: ZeroMQ address of the results server, e.g.
+                        "tcp://lab-server:5755"
+        :param pool_size: maximal number of concurrent requests from different threads
+        :param batch_size: maximal number of writes that are sent in one request
+        :param max_in_flight: maximal number of write batches that are sent
+                        before their acknowledgement is received
+        :param timeout: number of seconds to wait for the server to reply
+        :param secret_key: the secret key of the server. Defaults to the
+                        "remote.secret_key" setting
+        """
+        super().__init__()
+        self._address = address
+        secret_key = _security.secret_key_or_default(secret_key)
+        self._context = zmq.Context()
+        self._pool = _ConnectionPool(
+            self._context, address, pool_size, timeout, secret_key
+        )
+        self._writer = _PipelinedWriter(
+            self._context, address, batch_size, max_in_flight, timeout, secret_key
+        )
+        self._closed = False
+
+    def flush(self) -> None:
+        """
+        waits for all writes to be acknowledged by the server. Raises EntropyError
+        if any of them failed.
+        """
+        self._writer.flush()
+
+    def close(self) -> None:
+        """
+        sends all pending writes and closes the connections to the server
+        """
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._writer.close()
+            self._pool.close()
+            self._context.term()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def stats(self) -> Dict:
+        """
+        returns a snapshot of the storage operation statistics of the server
+        """
+        return self._call("stats")
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        payload = _protocol.dumps_request((args, kwargs))
+        self.flush()
+        with self._pool.connection() as connection:
+            return connection.request(method.encode(), payload)
+
+    def _write(self, method: str, *args, **kwargs) -> None:
+        # serialized by the caller, so a value that can't be sent raises here
+        self._writer.submit(_protocol.dumps_request((method, args, kwargs)))
+
+    # DataWriter
+
+    def save_experiment_initial_data(self, initial_data: ExperimentInitialData) -> int:
+        return self._call("save_experiment_initial_data", initial_data)
+
+    def save_experiment_end_data(self, experiment_id: int, end_data: ExperimentEndData):
+        self._write("save_experiment_end_data", experiment_id, end_data)
+
+    def save_result(self, experiment_id: int, result: RawResultData):
+        if result.label is None:
+            raise TypeError("result.label cannot be None")
+        if result.label == "":
+            raise ValueError("result.label cannot be empty")
+        self._write("save_result", experiment_id, result)
+
+    def save_results(self, experiment_id: int, results: List[RawResultData]):
+        for result in results:
+            if result.label is None:
+                raise TypeError("result.label cannot be None")
+            if result.label == "":
+                raise ValueError("result.label cannot be empty")
+        self._write("save_results", experiment_id, list(results))
+
+    def save_metadata(self, experiment_id: int, metadata: Metadata):
+        if metadata.label is None:
+            raise TypeError("metadata.label cannot be None")
+        if metadata.label == "":
+            raise ValueError("metadata.label cannot be empty")
+        self._write("save_metadata", experiment_id, metadata)
+
+    def save_indexed_metadata(self, experiment_id: int, metadata: Metadata):
+        self._write("save_indexed_metadata", experiment_id, metadata)
+
+    def save_debug(self, experiment_id: int, debug: Debug):
+        self._write("save_debug", experiment_id, debug)
+
+    def save_plot(self, experiment_id: int, plot: PlotSpec, data: Any):
+        self._write("save_plot", experiment_id, plot, data)
+
+    def save_figure(self, experiment_id: int, figure: go.Figure) -> None:
+        self._write("save_figure", experiment_id, figure)
+
+    def save_node(self, experiment_id: int, node_data: NodeData):
+        self._write("save_node", experiment_id, node_data)
+
+    def save_nodes(self, experiment_id: int, nodes: List[NodeData]):
+        self._write("save_nodes", experiment_id, list(nodes))
+
+    def update_experiment_favorite(self, experiment_id: int, favorite: bool) -> None:
+        self._write("update_experiment_favorite", experiment_id, favorite)
+
+    # DataReader
+
+    def get_experiments_range(
+        self, starting_from_index: int, count: int, success: bool = None
+    ) -> DataFrame:
+        return self._call("get_experiments_range", starting_from_index, count, success)
+
+    def get_experiment_record(self, experiment_id: int) -> Optional[ExperimentRecord]:
+        return self._call("get_experiment_record", experiment_id)
+
+    def get_experiments(
+        self,
+        label: Optional[str] = None,
+        start_after: Optional[datetime] = None,
+        end_after: Optional[datetime] = None,
+        success: Optional[bool] = None,
+    ) -> Iterable[ExperimentRecord]:
+        return self._call("get_experiments", label, start_after, end_after, success)
+
+    def get_results(
+        self,
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+        stage: Optional[int] = None,
+    ) -> Iterable[ResultRecord]:
+        return self._call("get_results", experiment_id, label, stage)
+
+    def get_results_of_stages(
+        self,
+        stages: Iterable[int],
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+    ) -> Dict[int, List[ResultRecord]]:
+        return self._call("get_results_of_stages", list(stages), experiment_id, label)
+
+    def get_metadata_records(
+        self,
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+        stage: Optional[int] = None,
+    ) -> Iterable[MetadataRecord]:
+        return self._call("get_metadata_records", experiment_id, label, stage)
+
+    def get_metadata_records_by_value(
+        self, label: str, data: Any
+    ) -> Iterable[MetadataRecord]:
+        return self._call("get_metadata_records_by_value", label, data)
+
+    def get_last_result_of_experiment(
+        self, experiment_id: int
+    ) -> Optional[ResultRecord]:
+        return self._call("get_last_result_of_experiment", experiment_id)
+
+    def get_debug_record(self, experiment_id: int) -> Optional[DebugRecord]:
+        return self._call("get_debug_record", experiment_id)
+
+    def get_plots(self, experiment_id: int) -> List[PlotRecord]:
+        return self._call("get_plots", experiment_id)
+
+    def get_figures(self, experiment_id: int) -> List[FigureRecord]:
+        return self._call("get_figures", experiment_id)
+
+    def get_node_stage_ids_by_label(
+        self, label: str, experiment_id: Optional[int] = None
+    ) -> List[int]:
+        return self._call("get_node_stage_ids_by_label", label, experiment_id)
+
+    # PersistentLabDB
+
+    def save_new_resource_driver(
+        self,
+        name: str,
+        driver_source_code: str,
+        module: str,
+        class_name: str,
+        serialized_args: str,
+        serialized_kwargs: str,
+        number_of_experiment_args: int,
+        keys_of_experiment_kwargs: List[str],
+        functions: List[Function],
+        parameters: List[Parameter],
+        undeclared_functions: List[Function],
+    ):
+        return self._call(
+            "save_new_resource_driver",
+            name,
+            driver_source_code,
+            module,
+            class_name,
+            serialized_args,
+            serialized_kwargs,
+            number_of_experiment_args,
+            keys_of_experiment_kwargs,
+            functions,
+            parameters,
+            undeclared_functions,
+        )
+
+    def remove_resource(self, name: str):
+        self._write("remove_resource", name)
+
+    def save_state(self, name: str, state: str, snapshot_name: str):
+        return self._call("save_state", name, state, snapshot_name)
+
+    def get_state(self, resource_name: str, snapshot_name: str) -> str:
+        return self._call("get_state", resource_name, snapshot_name)
+
+    def get_all_states(self, name) -> Iterable[str]:
+        return self._call("get_all_states", name)
+
+    def get_resource(self, name) -> Optional[ResourceRecord]:
+        return self._call("get_resource", name)
+
+    def set_locked(self, resource_name):
+        self._write("set_locked", resource_name)
+
+    def set_released(self, resource_name):
+        self._write("set_released", resource_name)
+
+    def get_all_resources(self) -> Set[str]:
+        return self._call("get_all_resources")
@@ -0,0 +1,222 @@
+import threading
+from typing import Optional, List, Any
+
+import zmq
+
+from entropylab.logger import logger
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.results_backend.remote import _protocol, _security
+from entropylab.pipeline.results_backend.sqlalchemy.db import SqlAlchemyDB
+
+DEFAULT_ADDRESS = "tcp://127.0.0.1:5755"
+
+# Methods of SqlAlchemyDB that clients are allowed to call
+REMOTE_METHODS = frozenset(
+    {
+        # DataWriter
+        "save_experiment_initial_data",
+        "save_experiment_end_data",
+        "save_result",
+        "save_results",
+        "save_metadata",
+        "save_indexed_metadata",
+        "save_debug",
+        "save_plot",
+        "save_figure",
+        "save_node",
+        "save_nodes",
+        "update_experiment_favorite",
+        # DataReader
+        "get_experiments_range",
+        "get_experiment_record",
+        "get_experiments",
+        "get_results",
+        "get_results_of_stages",
+        "get_metadata_records",
+        "get_metadata_records_by_value",
+        "get_last_result_of_experiment",
+        "get_debug_record",
+        "get_plots",
+        "get_figures",
+        "get_node_stage_ids_by_label",
+        # PersistentLabDB
+        "save_new_resource_driver",
+        "remove_resource",
+        "save_state",
+        "get_state",
+        "get_all_states",
+        "get_resource",
+        "set_locked",
+        "set_released",
+        "get_all_resources",
+        # Instrumentation
+        "stats",
+    }
+)
+
+_POLL_INTERVAL_MS = 100
+
+
+class ResultsServer:
+    """
+    A results service that serves a single SqlAlchemyDB to RemoteDB clients over
+    ZeroMQ. All requests are executed one at a time, in the order they arrive,
+    so the project database and HDF5 files are only accessed from one process.
+    """
+
+    def __init__(
+        self,
+        db: SqlAlchemyDB,
+        address: str = DEFAULT_ADDRESS,
+        secret_key: Optional[str] = None,
+        allow_remote: bool = False,
+    ) -> None:
+        """
+            A results service that serves a single SqlAlchemyDB to RemoteDB clients.
+        :param db: the project database to serve
+        :param address: ZeroMQ address to bind to, e.g. "tcp://0.0.0.0:5755".
+                        Use "tcp://127.0.0.1:*" to bind to a random free port.
+        :param secret_key: key shared with the clients (see generate_secret_key()),
+                        that encrypts the connections and rejects clients without
+                        it. Defaults to the "remote.secret_key" setting.
+        :param allow_remote: allows binding to addresses that are reachable from
+                        other machines, which also requires a secret key
+        """
+        super().__init__()
+        self._db = db
+        self._secret_key = _security.secret_key_or_default(secret_key)
+        _security.check_bind_address(
+            "Results server", address, self._secret_key, allow_remote
+        )
+        self._requested_address = address
+        self._address: Optional[str] = None
+        self._stop = threading.Event()
+        self._bound = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def address(self) -> Optional[str]:
+        """
+        the address the server is bound to, once it is serving
+        """
+        return self._address
+
+    def serve_forever(self) -> None:
+        """
+        serves requests in the current thread until stop() is called
+        """
+        context = zmq.Context()
+        socket = context.socket(zmq.ROUTER)
+        socket.setsockopt(zmq.LINGER, 0)
+        authenticator = None
+        try:
+            authenticator = _security.secure_server(context, socket, self._secret_key)
+            socket.bind(self._requested_address)
+            self._address = socket.getsockopt_string(zmq.LAST_ENDPOINT)
+            logger.info(f"Results server is serving at {self._address}")
+        except BaseException as e:
+            self._error = e
+            socket.close()
+            if authenticator is not None:
+                authenticator.stop()
+            context.term()
+            raise
+        finally:
+            self._bound.set()
+        try:
+            while not self._stop.is_set():
+                if socket.poll(_POLL_INTERVAL_MS):
+                    frames = socket.recv_multipart(copy=False)
+                    if len(frames) < 3:
+                        logger.warning("Results server discarded a malformed request")
+                        continue
+                    socket.send_multipart(self._handle(frames), copy=False)
+        finally:
+            socket.close()
+            if authenticator is not None:
+                authenticator.stop()
+            context.term()
+            logger.info("Results server stopped")
+
+    def start(self) -> "ResultsServer":
+        """
+        serves requests in a background thread
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="entropy-results-server", daemon=True
+        )
+        self._thread.start()
+        self._bound.wait()
+        if self._error is not None:
+            raise EntropyError(
+                f"Results server failed to bind to {self._requested_address}"
+            ) from self._error
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _handle(self, frames: List) -> List:
+        identity, request_id, method = frames[0], frames[1], frames[2].bytes
+        try:
+            if method == _protocol.BATCH:
+                calls = _protocol.loads_batch(frames[3:])
+                result = self._dispatch_batch(
+                    [_protocol.loads_request(call) for call in calls]
+                )
+            else:
+                args, kwargs = _protocol.loads_request(frames[3:])
+                result = self._dispatch(method.decode(), args, kwargs)
+            return [identity, request_id, _protocol.OK] + _protocol.dumps(result)
+        except BaseException as e:
+            logger.error(f"Results server request {method} failed: {e}")
+            return [identity, request_id, _protocol.ERROR] + _protocol.dumps_error(e)
+
+    def _dispatch_batch(self, calls: List[tuple]) -> List[Any]:
+        results = []
+        for i, call in enumerate(calls):
+            try:
+                results.append(self._dispatch(*call))
+            except Exception as e:
+                raise EntropyError(
+                    f"Call #{i} '{call[0]}' of batch failed with "
+                    f"{e.__class__.__qualname__}: {e}"
+                ) from e
+        return results
+
+    def _dispatch(self, method: str, args: tuple, kwargs: dict) -> Any:
+        if method not in REMOTE_METHODS:
+            raise EntropyError(f"Method '{method}' is not served remotely")
+        return getattr(self._db, method)(*args, **kwargs)
+
+
+def serve_results(
+    path: str,
+    address: str = DEFAULT_ADDRESS,
+    secret_key: Optional[str] = None,
+    allow_remote: bool = False,
+) -> None:
+    """Serves the results database of an Entropy project until interrupted
+
+    :param path: The path to the Entropy project directory
+    :param address: ZeroMQ address to bind to
+    :param secret_key: key shared with the clients, defaults to the
+                    "remote.secret_key" setting
+    :param allow_remote: allows binding to addresses that are reachable from
+                    other machines
+    """
+    server = ResultsServer(SqlAlchemyDB(path), address, secret_key, allow_remote)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
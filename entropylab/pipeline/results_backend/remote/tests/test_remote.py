@@ -0,0 +1,169 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+import zmq
+
+from entropylab import SqlAlchemyDB, RawResultData, Graph, PyNode
+from entropylab.pipeline.api.data_writer import Metadata
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.results_backend.remote import (
+    ResultsServer,
+    RemoteDB,
+    generate_secret_key,
+)
+
+
+@pytest.fixture()
+def server(initialized_project_dir_path):
+    with ResultsServer(
+        SqlAlchemyDB(initialized_project_dir_path), "tcp://127.0.0.1:*"
+    ) as server:
+        yield server
+
+
+def test_save_result_round_trips_numpy_array(server):
+    # arrange
+    data = np.arange(100_000, dtype=np.float64).reshape(100, 1000)
+    with RemoteDB(server.address) as target:
+        # act
+        target.save_result(1, RawResultData(stage=0, label="array", data=data))
+        actual = list(target.get_results(1, "array"))
+    # assert
+    assert len(actual) == 1
+    np.testing.assert_array_equal(actual[0].data, data)
+
+
+def test_batched_writes_are_visible_to_following_reads(server):
+    # arrange
+    with RemoteDB(server.address, batch_size=7) as target:
+        # act
+        for i in range(50):
+            target.save_result(1, RawResultData(stage=i, label="foo", data=i))
+        actual = target.get_results_of_stages(range(50), experiment_id=1)
+    # assert
+    assert [records[0].data for records in actual.values()] == list(range(50))
+
+
+def test_save_metadata_with_empty_label_raises_locally(server):
+    with RemoteDB(server.address) as target:
+        with pytest.raises(ValueError):
+            target.save_metadata(1, Metadata(label="", stage=0, data="bar"))
+
+
+def test_flush_raises_when_a_batched_write_failed(server):
+    # arrange
+    target = RemoteDB(server.address)
+    raw_result = RawResultData(stage=1, label="foo", data=42)
+    target.save_result(1, raw_result)
+    target.save_result(1, raw_result)
+    # act & assert
+    with pytest.raises(EntropyError):
+        target.flush()
+    target.close()
+
+
+def test_graph_run_with_remote_db(server):
+    # arrange
+    def a():
+        return {"x": 1}
+
+    def b(x):
+        return {"y": x + 1}
+
+    node_a = PyNode("a", a, output_vars={"x"})
+    node_b = PyNode("b", b, {"x": node_a.outputs["x"]}, {"y"})
+    with RemoteDB(server.address) as db:
+        # act
+        handle = Graph(None, {node_a, node_b}, "remote").run(db)
+        actual = handle.results.get_results_from_node("b")
+        # assert
+        assert list(actual)[0].results[0].data == 2
+
+
+def test_failed_write_is_raised_by_next_read_with_its_method(server):
+    # arrange
+    target = RemoteDB(server.address)
+    raw_result = RawResultData(stage=1, label="foo", data=42)
+    target.save_result(1, raw_result)
+    target.save_result(1, raw_result)
+    # act & assert
+    with pytest.raises(EntropyError, match="save_result"):
+        target.get_results(1)
+    target.close()
+
+
+def test_write_of_value_that_can_not_be_sent_raises_on_the_call(server):
+    with RemoteDB(server.address) as target:
+        with pytest.raises(EntropyError):
+            target.save_result(1, RawResultData(stage=0, label="foo", data=object()))
+
+
+class _CreatesFile:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, "w")
+
+
+def test_server_does_not_unpickle_requests(server, tmp_path):
+    # arrange
+    path = str(tmp_path / "created")
+    socket = zmq.Context.instance().socket(zmq.DEALER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(server.address)
+    # act
+    payload = pickle.dumps(((_CreatesFile(path),), {}))
+    socket.send_multipart([b"0", b"get_experiment_record", payload])
+    assert socket.poll(10_000)
+    reply = socket.recv_multipart()
+    socket.close()
+    # assert
+    assert reply[1] == b"error"
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize(
+    "address, secret_key, allow_remote",
+    [
+        ("tcp://0.0.0.0:*", None, False),
+        ("tcp://*:*", generate_secret_key(), False),
+        ("tcp://0.0.0.0:*", None, True),
+    ],
+    ids=["not_allowed", "not_allowed_with_key", "allowed_without_key"],
+)
+def test_server_refuses_unauthenticated_remote_address(
+    initialized_project_dir_path, address, secret_key, allow_remote
+):
+    with pytest.raises(EntropyError):
+        ResultsServer(
+            SqlAlchemyDB(initialized_project_dir_path),
+            address,
+            secret_key=secret_key,
+            allow_remote=allow_remote,
+        )
+
+
+def test_server_with_secret_key_serves_only_clients_with_the_key(
+    initialized_project_dir_path,
+):
+    # arrange
+    secret_key = generate_secret_key()
+    with ResultsServer(
+        SqlAlchemyDB(initialized_project_dir_path),
+        "tcp://0.0.0.0:*",
+        secret_key=secret_key,
+        allow_remote=True,
+    ) as server:
+        address = server.address.replace("0.0.0.0", "127.0.0.1")
+        with RemoteDB(address, secret_key=secret_key) as target:
+            # act
+            target.save_result(1, RawResultData(stage=0, label="foo", data=42))
+            # assert
+            assert list(target.get_results(1))[0].data == 42
+        for other_key in (None, generate_secret_key()):
+            with RemoteDB(address, timeout=1, secret_key=other_key) as other:
+                with pytest.raises(EntropyError):
+                    other.get_experiment_record(1)
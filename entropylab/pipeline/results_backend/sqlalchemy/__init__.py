@@ -1,10 +1,14 @@
 from . import db
-from .db import SqlAlchemyDB
+from .db import SqlAlchemyDB, ExperimentFilter
 
+import os
+
+from entropylab.pipeline.api.errors import EntropyError
 from entropylab.pipeline.results_backend.sqlalchemy.db_initializer import (
     _DbInitializer,
     _DbUpgrader,
 )
+from entropylab.pipeline.results_backend.sqlalchemy.project import db_file_path
 
 
 def init_db(path: str):
@@ -19,3 +23,32 @@ def upgrade_db(path: str):
     :param path: The path to the SQLite database to be upgraded
     """
     _DbUpgrader(path).upgrade_db()
+
+
+def delete_experiments(path: str, experiment_filter: ExperimentFilter):
+    """Deletes experiments, with their results and HDF5 files, from an Entropy project
+
+    :param path: The path to the Entropy project directory
+    :param experiment_filter: Selects the experiments to delete
+    """
+    return _existing_project_db(path).delete_experiments(experiment_filter)
+
+
+def archive_experiments(
+    path: str, experiment_filter: ExperimentFilter, dest: str, compress: bool = False
+):
+    """Moves experiments from an Entropy project to an archive project
+
+    :param path: The path to the Entropy project directory
+    :param experiment_filter: Selects the experiments to archive
+    :param dest: The path to the archive project directory
+    :param compress: If True, the archive is bundled into a "<dest>.tar.gz" file
+    """
+    project_db = _existing_project_db(path)
+    return project_db.archive_experiments(experiment_filter, dest, compress)
+
+
+def _existing_project_db(path: str) -> SqlAlchemyDB:
+    if not os.path.isfile(db_file_path(path)):
+        raise EntropyError(f"No Entropy project exists at '{path}'")
+    return SqlAlchemyDB(path)
@@ -1,6 +1,9 @@
+import os
+import shutil
+from dataclasses import dataclass
 from datetime import datetime
 from typing import List, TypeVar, Optional, ContextManager, Iterable, Union, Any
-from typing import Set
+from typing import Dict, Set
 from warnings import warn
 
 import jsonpickle
@@ -24,6 +27,7 @@ from entropylab.components.lab_topology import (
     ResourceRecord,
 )
 from entropylab.config import settings
+from entropylab.logger import logger
 from entropylab.pipeline.api.data_reader import (
     DataReader,
     ExperimentRecord,
@@ -44,6 +48,10 @@ from entropylab.pipeline.api.data_writer import (
     NodeData,
 )
 from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.results_backend.instrumentation import (
+    StorageInstrumentation,
+    OperationStats,
+)
 from entropylab.pipeline.results_backend.sqlalchemy.db_initializer import _DbInitializer
 from entropylab.pipeline.results_backend.sqlalchemy.model import (
     ExperimentTable,
@@ -53,12 +61,53 @@ from entropylab.pipeline.results_backend.sqlalchemy.model import (
     MetadataTable,
     NodeTable,
     FigureTable,
+    _encode_serialized_data,
 )
 
 T = TypeVar(
     "T",
 )
 
+# SQLite limits the number of host parameters in a single statement
+_MAX_QUERY_PARAMETERS = 500
+
+# Tables whose rows belong to a single experiment
+_EXPERIMENT_CHILD_TABLES = (
+    ResultTable,
+    MetadataTable,
+    DebugTable,
+    PlotTable,
+    FigureTable,
+    NodeTable,
+)
+
+
+def _chunks(items: List, size: int = _MAX_QUERY_PARAMETERS) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _check_result_label(result: RawResultData):
+    if result.label is None:
+        raise TypeError("result.label cannot be None")
+    if result.label == "":
+        raise ValueError("result.label cannot be empty")
+
+
+@dataclass
+class ExperimentFilter:
+    """
+    Selects experiments for bulk operations. Only the given criteria are applied,
+    so an empty filter selects all experiments.
+    """
+
+    ids: Optional[Iterable[int]] = None
+    label: Optional[str] = None
+    start_before: Optional[datetime] = None
+    start_after: Optional[datetime] = None
+    success: Optional[bool] = None
+    favorite: Optional[bool] = None
+
 
 class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
     """
@@ -75,8 +124,23 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
         super(SqlAlchemyDB, self).__init__()
         self._enable_hdf5_storage = kwargs.get("enable_hdf5_storage")
         self._engine, self._storage = _DbInitializer(path, echo=echo).init_db()
+        self._instrumentation: StorageInstrumentation = self._storage.instrumentation
         self._Session = sessionmaker(bind=self._engine)
 
+    @property
+    def instrumentation(self) -> StorageInstrumentation:
+        """
+        timers, counters and hooks for the storage operations of this database
+        """
+        return self._instrumentation
+
+    def stats(self) -> Dict[str, OperationStats]:
+        """
+        returns a snapshot of the timing statistics of storage operations,
+        indexed by operation name (e.g. "hdf5.open", "sql.commit")
+        """
+        return self._instrumentation.stats()
+
     def save_experiment_initial_data(self, initial_data: ExperimentInitialData) -> int:
         transaction = ExperimentTable.from_initial_data(initial_data)
         return self._execute_transaction(transaction)
@@ -94,10 +158,7 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
                 sess.flush()
 
     def save_result(self, experiment_id: int, result: RawResultData):
-        if result.label is None:
-            raise TypeError("result.label cannot be None")
-        if result.label == "":
-            raise ValueError("result.label cannot be empty")
+        _check_result_label(result)
         if self.__hdf5_storage_enabled():
             try:
                 self._storage.save_result(experiment_id, result)
@@ -112,9 +173,36 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
                     f"[{experiment_id}], result=[{result}])"
                 ) from re
         else:
-            transaction = ResultTable.from_model(experiment_id, result)
+            with self._instrumentation.measure("sql.serialize"):
+                transaction = ResultTable.from_model(experiment_id, result)
             return self._execute_transaction(transaction)
 
+    def save_results(self, experiment_id: int, results: List[RawResultData]):
+        for result in results:
+            _check_result_label(result)
+        if not results:
+            return
+        if self.__hdf5_storage_enabled():
+            # a single open of the experiment HDF5 file
+            try:
+                self._storage.save_results(experiment_id, results)
+            except ValueError as ve:
+                raise ValueError(
+                    f"Result already exists (experiment_id=[{experiment_id}], "
+                    f"labels=[{[result.label for result in results]}])"
+                ) from ve
+            except RuntimeError as re:
+                raise EntropyError(
+                    f"Failed to write results to HDF5 file (experiment_id="
+                    f"[{experiment_id}], labels=[{[r.label for r in results]}])"
+                ) from re
+        else:
+            with self._instrumentation.measure("sql.serialize"):
+                transactions = [
+                    ResultTable.from_model(experiment_id, result) for result in results
+                ]
+            self._execute_transactions(transactions)
+
     def save_metadata(self, experiment_id: int, metadata: Metadata):
         if metadata.label is None:
             raise TypeError("metadata.label cannot be None")
@@ -134,9 +222,16 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
                     f"[{experiment_id}], result=[{metadata}])"
                 ) from re
         else:
-            transaction = MetadataTable.from_model(experiment_id, metadata)
+            with self._instrumentation.measure("sql.serialize"):
+                transaction = MetadataTable.from_model(experiment_id, metadata)
             return self._execute_transaction(transaction)
 
+    def save_indexed_metadata(self, experiment_id: int, metadata: Metadata):
+        # kept in the db even with HDF5 storage, so it is found by a single query
+        with self._instrumentation.measure("sql.serialize"):
+            transaction = MetadataTable.from_model(experiment_id, metadata)
+        return self._execute_transaction(transaction)
+
     def save_debug(self, experiment_id: int, debug: Debug):
         transaction = DebugTable.from_model(experiment_id, debug)
         return self._execute_transaction(transaction)
@@ -158,6 +253,12 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
         transaction = NodeTable.from_model(experiment_id, node_data)
         return self._execute_transaction(transaction)
 
+    def save_nodes(self, experiment_id: int, nodes: List[NodeData]):
+        if nodes:
+            self._execute_transactions(
+                [NodeTable.from_model(experiment_id, node_data) for node_data in nodes]
+            )
+
     def get_experiments_range(
         self, starting_from_index: int, count: int, success: bool = None
     ) -> DataFrame:
@@ -218,6 +319,32 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
 
         pass
 
+    def get_results_of_stages(
+        self,
+        stages: Iterable[int],
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+    ) -> Dict[int, List[ResultRecord]]:
+        stages = list(stages)
+        if self.__hdf5_storage_enabled():
+            return self._storage.get_result_records_of_stages(
+                stages, experiment_id, label
+            )
+        records = {stage: [] for stage in stages}
+        with self._session_maker() as sess:
+            for i in range(0, len(stages), _MAX_QUERY_PARAMETERS):
+                chunk = [int(stage) for stage in stages[i : i + _MAX_QUERY_PARAMETERS]]
+                query = sess.query(ResultTable).filter(ResultTable.stage.in_(chunk))
+                if experiment_id is not None:
+                    query = query.filter(
+                        ResultTable.experiment_id == int(experiment_id)
+                    )
+                if label is not None:
+                    query = query.filter(ResultTable.label == str(label))
+                for item in self._read(query):
+                    records[item.stage].append(self._decode(item))
+        return records
+
     def __get_results_from_sqlalchemy(
         self,
         experiment_id: Optional[int] = None,
@@ -235,7 +362,7 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
                 query = query.filter(ResultTable.stage == int(stage))
             if self.__hdf5_storage_enabled() and saved_in_hdf5 is not None:
                 query = query.filter(ResultTable.saved_in_hdf5 == bool(saved_in_hdf5))
-            return [item.to_record() for item in query.all()]
+            return [self._decode(item) for item in self._read(query)]
 
     def get_metadata_records(
         self,
@@ -243,6 +370,36 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
         label: Optional[str] = None,
         stage: Optional[int] = None,
     ) -> Iterable[MetadataRecord]:
+        if self.__hdf5_storage_enabled():
+            # metadata saved while HDF5 storage was disabled is still in the db
+            records = self.__get_metadata_from_sqlalchemy(
+                experiment_id, label, stage, saved_in_hdf5=False
+            )
+            records += self._storage.get_metadata_records(experiment_id, stage, label)
+            return sorted(records, key=lambda record: record.experiment_id)
+        return self.__get_metadata_from_sqlalchemy(experiment_id, label, stage)
+
+    def get_metadata_records_by_value(
+        self, label: str, data: Any
+    ) -> Iterable[MetadataRecord]:
+        data_type, serialized_data = _encode_serialized_data(data)
+        with self._session_maker() as sess:
+            query = (
+                sess.query(MetadataTable)
+                .filter(MetadataTable.label == label)
+                .filter(MetadataTable.data_type == data_type)
+                .filter(MetadataTable.data == serialized_data)
+                .order_by(MetadataTable.time.desc())
+            )
+            return [self._decode(item) for item in self._read(query)]
+
+    def __get_metadata_from_sqlalchemy(
+        self,
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+        stage: Optional[int] = None,
+        saved_in_hdf5: Optional[bool] = None,
+    ) -> List[MetadataRecord]:
         with self._session_maker() as sess:
             query = sess.query(MetadataTable)
             if experiment_id is not None:
@@ -251,7 +408,9 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
                 query = query.filter(MetadataTable.label == label)
             if stage is not None:
                 query = query.filter(MetadataTable.stage == stage)
-            return [item.to_record() for item in query.all()]
+            if saved_in_hdf5 is not None:
+                query = query.filter(MetadataTable.saved_in_hdf5 == bool(saved_in_hdf5))
+            return [self._decode(item) for item in self._read(query)]
 
     def get_debug_record(self, experiment_id: int) -> Optional[DebugRecord]:
         with self._session_maker() as sess:
@@ -333,6 +492,125 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
             if query:
                 return query.to_record()
 
+    def delete_experiments(self, experiment_filter: ExperimentFilter) -> List[int]:
+        """
+            Deletes the experiments that match the given filter in a single
+            transaction, including their results, metadata, nodes, plots, figures
+            and HDF5 files.
+
+        :param experiment_filter: selects the experiments to delete
+        :return: the ids of the deleted experiments
+        """
+        with self._session_maker() as sess:
+            experiment_ids = self._filter_experiment_ids(sess, experiment_filter)
+            self._delete_experiment_rows(sess, experiment_ids)
+        self._storage.delete_experiment_files(experiment_ids)
+        logger.info(f"Deleted {len(experiment_ids)} experiments")
+        return experiment_ids
+
+    def archive_experiments(
+        self, experiment_filter: ExperimentFilter, dest: str, compress: bool = False
+    ) -> List[int]:
+        """
+            Moves the experiments that match the given filter to an archive project
+            and removes them from this project.
+
+        :param experiment_filter: selects the experiments to archive
+        :param dest: path to the archive project directory. A new project is
+                    created if none exists. An existing project must not contain
+                    experiments, since the archived rows keep their ids.
+        :param compress: if True, the archive project directory is bundled into a
+                    "<dest>.tar.gz" file. The directory is removed if it was
+                    created by this call.
+        :return: the ids of the archived experiments
+        """
+        with self._session_maker() as sess:
+            experiment_ids = self._filter_experiment_ids(sess, experiment_filter)
+            if not experiment_ids:
+                logger.info("No experiments to archive")
+                return experiment_ids
+            created_dest = not os.path.exists(dest)
+            archive = SqlAlchemyDB(dest)
+            try:
+                with archive._session_maker() as archive_sess:
+                    if archive_sess.query(ExperimentTable.id).first() is not None:
+                        raise EntropyError(
+                            f"Archive project at '{dest}' already contains "
+                            f"experiments. Archive to a new or empty project"
+                        )
+                    for table in (ExperimentTable,) + _EXPERIMENT_CHILD_TABLES:
+                        self._copy_experiment_rows(
+                            sess, archive_sess, table, experiment_ids
+                        )
+                self._storage.copy_experiment_files(experiment_ids, archive._storage)
+            finally:
+                archive._engine.dispose()
+            self._delete_experiment_rows(sess, experiment_ids)
+        self._storage.delete_experiment_files(experiment_ids)
+        if compress:
+            bundle = shutil.make_archive(dest, "gztar", root_dir=dest)
+            if created_dest:
+                shutil.rmtree(dest)
+            logger.info(f"Archived {len(experiment_ids)} experiments to '{bundle}'")
+        else:
+            logger.info(f"Archived {len(experiment_ids)} experiments to '{dest}'")
+        return experiment_ids
+
+    @staticmethod
+    def _filter_experiment_ids(
+        sess: Session, experiment_filter: ExperimentFilter
+    ) -> List[int]:
+        query = sess.query(ExperimentTable.id)
+        if experiment_filter.label is not None:
+            query = query.filter(ExperimentTable.label == experiment_filter.label)
+        if experiment_filter.start_before is not None:
+            query = query.filter(
+                ExperimentTable.start_time < experiment_filter.start_before
+            )
+        if experiment_filter.start_after is not None:
+            query = query.filter(
+                ExperimentTable.start_time > experiment_filter.start_after
+            )
+        if experiment_filter.success is not None:
+            query = query.filter(ExperimentTable.success == experiment_filter.success)
+        if experiment_filter.favorite is not None:
+            query = query.filter(ExperimentTable.favorite == experiment_filter.favorite)
+        if experiment_filter.ids is None:
+            return [row.id for row in query.order_by(ExperimentTable.id).all()]
+        selected = sorted(
+            {int(experiment_id) for experiment_id in experiment_filter.ids}
+        )
+        experiment_ids = []
+        for chunk in _chunks(selected):
+            rows = query.filter(ExperimentTable.id.in_(chunk)).all()
+            experiment_ids += [row.id for row in rows]
+        return sorted(experiment_ids)
+
+    @staticmethod
+    def _delete_experiment_rows(sess: Session, experiment_ids: List[int]):
+        for chunk in _chunks(experiment_ids):
+            for table in _EXPERIMENT_CHILD_TABLES:
+                sess.query(table).filter(table.experiment_id.in_(chunk)).delete(
+                    synchronize_session=False
+                )
+            sess.query(ExperimentTable).filter(ExperimentTable.id.in_(chunk)).delete(
+                synchronize_session=False
+            )
+
+    @staticmethod
+    def _copy_experiment_rows(
+        sess: Session, dest_sess: Session, table, experiment_ids: List[int]
+    ):
+        sql_table = table.__table__
+        if table is ExperimentTable:
+            column = sql_table.c.id
+        else:
+            column = sql_table.c.experiment_id
+        for chunk in _chunks(experiment_ids):
+            rows = sess.execute(sql_table.select().where(column.in_(chunk))).all()
+            if rows:
+                dest_sess.execute(sql_table.insert(), [dict(r._mapping) for r in rows])
+
     def custom_query(self, query: Union[str, Selectable]) -> DataFrame:
         with self._session_maker() as sess:
             if isinstance(query, str):
@@ -344,10 +622,30 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
 
     def _execute_transaction(self, transaction):
         with self._session_maker() as sess:
-            sess.add(transaction)
-            sess.flush()
+            with self._instrumentation.measure(
+                "sql.write", table=transaction.__tablename__
+            ):
+                sess.add(transaction)
+                sess.flush()
             return transaction.id
 
+    def _execute_transactions(self, transactions: List):
+        # adds all the rows in a single transaction
+        with self._session_maker() as sess:
+            with self._instrumentation.measure(
+                "sql.write", table=transactions[0].__tablename__
+            ):
+                sess.add_all(transactions)
+                sess.flush()
+
+    def _read(self, query) -> List:
+        with self._instrumentation.measure("sql.read"):
+            return query.all()
+
+    def _decode(self, item):
+        with self._instrumentation.measure("sql.decode"):
+            return item.to_record()
+
     @staticmethod
     def _query_pandas(query):
         return pd.read_sql(query.statement, query.session.bind)
@@ -358,7 +656,8 @@ class SqlAlchemyDB(DataWriter, DataReader, PersistentLabDB):
         session = self._Session()
         try:
             yield session
-            session.commit()
+            with self._instrumentation.measure("sql.commit"):
+                session.commit()
         except DBAPIError:
             session.rollback()
             raise
@@ -1,8 +1,9 @@
 import os.path
 import pickle
+import shutil
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Any, Iterable, TypeVar, Callable, List
+from typing import Optional, Any, Iterable, TypeVar, Callable, List, Dict
 
 import h5py
 import numpy as np
@@ -11,6 +12,9 @@ from entropylab import RawResultData
 from entropylab.pipeline.api.data_reader import ResultRecord, MetadataRecord
 from entropylab.pipeline.api.data_writer import Metadata
 from entropylab.logger import logger
+from entropylab.pipeline.results_backend.instrumentation import (
+    StorageInstrumentation,
+)
 from entropylab.pipeline.results_backend.sqlalchemy.model import (
     ResultDataType,
     ResultTable,
@@ -150,6 +154,39 @@ class _HDF5Reader:
             )
         return sorted(entities, key=lambda entity: entity.experiment_id)
 
+    def get_result_records_of_stages(
+        self,
+        stages: Iterable[int],
+        experiment_id: Optional[int] = None,
+        label: Optional[str] = None,
+    ) -> Dict[int, List[ResultRecord]]:
+        """
+        Returns the result records of many stages, indexed by stage. Every experiment
+        file is opened once, no matter how many stages are requested.
+        """
+        records = {stage: [] for stage in stages}
+        if experiment_id:
+            experiment_ids = [experiment_id]
+        else:
+            experiment_ids = self._list_experiment_ids_in_fs()
+        for experiment_id in experiment_ids:
+            try:
+                # noinspection PyUnresolvedReferences
+                file = self._open_hdf5(experiment_id, "r")
+            except FileNotFoundError:
+                logger.error(
+                    f"HDF5 file for experiment_id [{experiment_id}] was not found"
+                )
+                continue
+            with file:
+                for stage, stage_records in records.items():
+                    stage_records += self._read_entities(
+                        file, EntityType.RESULT, _build_result_record, stage, label
+                    )
+        for stage in records:
+            records[stage].sort(key=lambda entity: entity.experiment_id)
+        return records
+
     def _list_experiment_ids_in_fs(self) -> List[int]:
         # noinspection PyUnresolvedReferences
         dir_list = os.listdir(self._path)
@@ -174,15 +211,32 @@ class _HDF5Reader:
             logger.error(f"HDF5 file for experiment_id [{experiment_id}] was not found")
         else:
             with file:
-                stage_groups = _get_all_or_single(file, stage)
-                for stage_group in stage_groups:
-                    label_groups = _get_all_or_single(stage_group, label)
-                    for label_group in label_groups:
-                        dset_name = entity_type.name.lower()
-                        dset = label_group[dset_name]
-                        dsets.append(convert_from_dset(dset))
+                dsets = self._read_entities(
+                    file, entity_type, convert_from_dset, stage, label
+                )
         return dsets
 
+    def _read_entities(
+        self,
+        file: h5py.File,
+        entity_type: EntityType,
+        convert_from_dset: Callable,
+        stage: Optional[int] = None,
+        label: Optional[str] = None,
+    ) -> List:
+        entities = []
+        dset_name = entity_type.name.lower()
+        # noinspection PyUnresolvedReferences
+        instrumentation = self._instrumentation
+        with instrumentation.measure("hdf5.read", stage=stage, label=label):
+            for stage_group in _get_all_or_single(file, stage):
+                for label_group in _get_all_or_single(stage_group, label):
+                    if dset_name in label_group:
+                        dset = label_group[dset_name]
+                        with instrumentation.measure("hdf5.decode"):
+                            entities.append(convert_from_dset(dset))
+        return entities
+
     def get_last_result_of_experiment(
         self, experiment_id: int
     ) -> Optional[ResultRecord]:
@@ -209,6 +263,25 @@ class _HDF5Writer:
                 result.story,
             )
 
+    def save_results(
+        self, experiment_id: int, results: List[RawResultData]
+    ) -> List[str]:
+        # noinspection PyUnresolvedReferences
+        with self._open_hdf5(experiment_id, "a") as file:
+            return [
+                self._save_entity_to_file(
+                    file,
+                    EntityType.RESULT,
+                    experiment_id,
+                    result.stage,
+                    result.label,
+                    result.data,
+                    datetime.now(),
+                    result.story,
+                )
+                for result in results
+            ]
+
     def save_metadata(self, experiment_id: int, metadata: Metadata):
         # noinspection PyUnresolvedReferences
         with self._open_hdf5(experiment_id, "a") as file:
@@ -235,8 +308,10 @@ class _HDF5Writer:
         migrated_id: Optional[str] = None,
     ) -> str:
         path = f"/{stage}/{label}"
-        label_group = file.require_group(path)
-        dset = self._create_dataset(label_group, entity_type, data)
+        # noinspection PyUnresolvedReferences
+        with self._instrumentation.measure("hdf5.write", path=path):
+            label_group = file.require_group(path)
+            dset = self._create_dataset(label_group, entity_type, data)
         dset.attrs.create("experiment_id", experiment_id)
         dset.attrs.create("stage", stage)
         dset.attrs.create("label", label)
@@ -254,7 +329,9 @@ class _HDF5Writer:
         try:
             dset = group.create_dataset(name=name, data=data)
         except TypeError:
-            data_type, pickled = self._pickle_data(data)
+            # noinspection PyUnresolvedReferences
+            with self._instrumentation.measure("hdf5.serialize"):
+                data_type, pickled = self._pickle_data(data)
             # np.void turns our string to bytes (HDF5 Opaque):
             dset = group.create_dataset(name=name, data=np.void(pickled))
             dset.attrs.create("data_type", data_type.value, dtype="i2")
@@ -346,13 +423,22 @@ class _HDF5Migrator(_HDF5Writer):
 
 
 class HDF5Storage(_HDF5Reader, _HDF5Migrator, _HDF5Writer):
-    def __init__(self, path=None):
+    def __init__(
+        self,
+        path=None,
+        instrumentation: Optional[StorageInstrumentation] = None,
+    ):
         """Initializes a new storage class instance  for storing experiment results
                  and metadata in HDF5 files.
 
         :param path: filesystem path to a directory where HDF5 files reside. If no path
                  is given or the path is empty, HDF5 files are stored in memory only.
+        :param instrumentation: timers and counters for storage operations. A new
+                 instance is created if none is given.
         """
+        if instrumentation is None:
+            instrumentation = StorageInstrumentation()
+        self._instrumentation = instrumentation
         if path is None or path == "":  # memory files
             self._path = "./entropy_temp_hdf5"
             self._in_memory_mode = True
@@ -364,17 +450,45 @@ class HDF5Storage(_HDF5Reader, _HDF5Migrator, _HDF5Writer):
     def _open_hdf5(self, experiment_id: int, mode: str) -> h5py.File:
         path = self._build_hdf5_filepath(experiment_id)
         try:
-            if self._in_memory_mode:
-                """Note that because backing_store=False, self._path is ignored & no
-                file is saved on disk.
-                See https://docs.h5py.org/en/stable/high/file.html#file-drivers
-                """
-                return h5py.File(path, mode, driver="core", backing_store=False)
-            else:
-                return h5py.File(path, mode)
+            with self._instrumentation.measure("hdf5.open", path=path, mode=mode):
+                if self._in_memory_mode:
+                    """Note that because backing_store=False, self._path is ignored &
+                    no file is saved on disk.
+                    See https://docs.h5py.org/en/stable/high/file.html#file-drivers
+                    """
+                    return h5py.File(path, mode, driver="core", backing_store=False)
+                else:
+                    return h5py.File(path, mode)
         except FileNotFoundError:
             logger.exception(f"HDF5 file not found at '{path}'")
             raise
 
+    @property
+    def instrumentation(self) -> StorageInstrumentation:
+        return self._instrumentation
+
+    def copy_experiment_files(
+        self, experiment_ids: Iterable[int], target: "HDF5Storage"
+    ) -> None:
+        """Copies the HDF5 files of the given experiments to another storage"""
+        if self._in_memory_mode or target._in_memory_mode:
+            return
+        for experiment_id in experiment_ids:
+            path = self._build_hdf5_filepath(experiment_id)
+            if os.path.isfile(path):
+                shutil.copy2(path, target._build_hdf5_filepath(experiment_id))
+
+    def delete_experiment_files(self, experiment_ids: Iterable[int]) -> None:
+        """Deletes the HDF5 files of the given experiments, if they exist"""
+        if self._in_memory_mode:
+            return
+        for experiment_id in experiment_ids:
+            path = self._build_hdf5_filepath(experiment_id)
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+            except OSError:
+                logger.warning(f"Could not delete HDF5 file at '{path}'")
+
     def _build_hdf5_filepath(self, experiment_id: int) -> str:
         return os.path.join(self._path, f"{experiment_id}.hdf5")
@@ -5,7 +5,15 @@ import pytest
 from plotly import express as px
 
 from entropylab import SqlAlchemyDB, RawResultData
-from entropylab.pipeline.api.data_writer import ExperimentInitialData, ExperimentEndData
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.results_backend import instrumentation
+from entropylab.pipeline.results_backend.sqlalchemy.db import ExperimentFilter
+from entropylab.pipeline.api.data_writer import (
+    ExperimentInitialData,
+    ExperimentEndData,
+    Metadata,
+    NodeData,
+)
 from entropylab.pipeline.results_backend.sqlalchemy.db_initializer import (
     _ENTROPY_DIRNAME,
     _HDF5_DIRNAME,
@@ -36,6 +44,34 @@ def test_get_last_result_of_experiment_when_hdf_is_enabled_then_result_is_from_h
     assert actual.data == "in storage"
 
 
+def test_get_metadata_records_when_hdf_is_enabled_then_db_metadata_is_included(
+    initialized_project_dir_path,
+):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path, enable_hdf5_storage=False)
+    target.save_metadata(1, Metadata(label="calibration", stage=0, data="in db"))
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    target.save_metadata(1, Metadata(label="calibration", stage=1, data="in storage"))
+    # act
+    actual = target.get_metadata_records(1, label="calibration")
+    # assert
+    assert sorted(record.data for record in actual) == ["in db", "in storage"]
+
+
+def test_get_metadata_records_when_hdf_is_disabled_then_metadata_is_from_db(
+    initialized_project_dir_path,
+):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    target.save_metadata(1, Metadata(label="calibration", stage=0, data="in storage"))
+    target = SqlAlchemyDB(initialized_project_dir_path, enable_hdf5_storage=False)
+    target.save_metadata(1, Metadata(label="calibration", stage=1, data="in db"))
+    # act
+    actual = target.get_metadata_records(1, label="calibration")
+    # assert
+    assert [record.data for record in actual] == ["in db"]
+
+
 def test_get_last_result_of_experiment_when_hdf_is_disabled_then_result_is_from_db(
     initialized_project_dir_path,
 ):
@@ -124,3 +160,169 @@ def __save_one_record_to(target):
     )
     target.save_experiment_end_data(1, end_data)
     return initial_data, end_data
+
+
+@pytest.mark.parametrize("enable_hdf5_storage", [True, False])
+def test_get_results_from_node_reads_all_stages(
+    initialized_project_dir_path, enable_hdf5_storage
+):
+    # arrange
+    target = SqlAlchemyDB(
+        initialized_project_dir_path, enable_hdf5_storage=enable_hdf5_storage
+    )
+    for stage in range(3):
+        target.save_node(1, NodeData(stage, datetime.now(), "node", False))
+        target.save_result(1, RawResultData(label="x", data=stage, stage=stage))
+    target.save_node(1, NodeData(3, datetime.now(), "other", False))
+    target.save_result(1, RawResultData(label="x", data=3, stage=3))
+    # act
+    actual = target.get_results_from_node("node", 1)
+    # assert
+    assert [node.execution_id for node in actual] == [0, 1, 2]
+    assert [[r.data for r in node.results] for node in actual] == [[0], [1], [2]]
+
+
+def _save_experiment(db, label):
+    experiment_id = db.save_experiment_initial_data(
+        ExperimentInitialData(label, "user", "", "script", datetime.now())
+    )
+    db.save_node(experiment_id, NodeData(0, datetime.now(), "node", False))
+    db.save_result(experiment_id, RawResultData(label="x", data=42, stage=0))
+    return experiment_id
+
+
+def test_delete_experiments_removes_rows_and_hdf5_files(initialized_project_dir_path):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    old_id = _save_experiment(target, "old")
+    new_id = _save_experiment(target, "new")
+    hdf5_dir = os.path.join(
+        initialized_project_dir_path, _ENTROPY_DIRNAME, _HDF5_DIRNAME
+    )
+    # act
+    actual = target.delete_experiments(ExperimentFilter(label="old"))
+    # assert
+    assert actual == [old_id]
+    assert target.get_experiment_record(old_id) is None
+    assert target.get_node_stage_ids_by_label("node", old_id) == []
+    assert not os.path.isfile(os.path.join(hdf5_dir, f"{old_id}.hdf5"))
+    assert os.path.isfile(os.path.join(hdf5_dir, f"{new_id}.hdf5"))
+
+
+def test_archive_experiments_moves_experiments_to_archive_project(
+    initialized_project_dir_path,
+):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    old_id = _save_experiment(target, "old")
+    _save_experiment(target, "new")
+    dest = os.path.join(initialized_project_dir_path, "archive")
+    # act
+    target.archive_experiments(ExperimentFilter(ids=[old_id]), dest)
+    # assert
+    assert target.get_experiment_record(old_id) is None
+    archive = SqlAlchemyDB(dest)
+    assert archive.get_experiment_record(old_id).label == "old"
+    assert archive.get_results_from_node("node", old_id)[0].results[0].data == 42
+
+
+def test_archive_experiments_with_compress_writes_bundle(initialized_project_dir_path):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    _save_experiment(target, "old")
+    dest = os.path.join(initialized_project_dir_path, "archive")
+    # act
+    target.archive_experiments(ExperimentFilter(), dest, compress=True)
+    # assert
+    assert os.path.isfile(dest + ".tar.gz")
+    assert not os.path.exists(dest)
+
+
+def test_archive_experiments_with_compress_keeps_existing_dest(
+    initialized_project_dir_path, tmp_path
+):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    _save_experiment(target, "old")
+    dest = str(tmp_path / "archive")
+    SqlAlchemyDB(dest)._engine.dispose()
+    # act
+    target.archive_experiments(ExperimentFilter(), dest, compress=True)
+    # assert
+    assert os.path.isfile(dest + ".tar.gz")
+    assert os.path.isdir(dest)
+
+
+def test_archive_experiments_to_project_with_experiments_raises(
+    initialized_project_dir_path, tmp_path
+):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    old_id = _save_experiment(target, "old")
+    dest = str(tmp_path / "archive")
+    archive = SqlAlchemyDB(dest)
+    _save_experiment(archive, "archived")
+    archive._engine.dispose()
+    # act & assert
+    with pytest.raises(EntropyError):
+        target.archive_experiments(ExperimentFilter(), dest)
+    assert target.get_experiment_record(old_id).label == "old"
+
+
+def test_stats_counts_storage_operations(initialized_project_dir_path):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    # act
+    target.save_result(1, RawResultData(label="x", data=[1, 2], stage=0))
+    list(target.get_results(1))
+    actual = target.stats()
+    # assert
+    assert actual["hdf5.open"].count == 2
+    assert actual["hdf5.write"].count == 1
+    assert actual["hdf5.decode"].count == 1
+    assert actual["hdf5.open"].total_time > 0
+
+
+@pytest.mark.parametrize(
+    "enable_hdf5_storage, operation", [(True, "hdf5.open"), (False, "sql.commit")]
+)
+def test_save_results_writes_all_results_at_once(
+    initialized_project_dir_path, enable_hdf5_storage, operation
+):
+    # arrange
+    target = SqlAlchemyDB(
+        initialized_project_dir_path, enable_hdf5_storage=enable_hdf5_storage
+    )
+    results = [RawResultData(label=f"r{i}", data=i, stage=0) for i in range(5)]
+    # act
+    target.save_results(1, results)
+    # assert
+    assert target.stats()[operation].count == 1
+    actual = {result.label: result.data for result in target.get_results(1)}
+    assert actual == {f"r{i}": i for i in range(5)}
+
+
+def test_save_results_raises_when_a_label_is_empty(initialized_project_dir_path):
+    # arrange
+    target = SqlAlchemyDB(initialized_project_dir_path)
+    results = [RawResultData(label="ok", data=1), RawResultData(label="", data=2)]
+    # act & assert
+    with pytest.raises(ValueError):
+        target.save_results(1, results)
+    assert list(target.get_results(1)) == []
+
+
+def test_slow_operations_are_logged_and_passed_to_hooks(monkeypatch):
+    # arrange
+    warnings = []
+    monkeypatch.setattr(instrumentation.logger, "warning", warnings.append)
+    target = SqlAlchemyDB()
+    target.instrumentation.slow_operation_threshold = 0
+    calls = []
+    target.instrumentation.add_hook(lambda op, elapsed, details: calls.append(op))
+    # act
+    target.save_node(1, NodeData(0, datetime.now(), "node", False))
+    # assert
+    assert "sql.write" in calls
+    assert "sql.commit" in calls
+    assert any("Slow storage operation 'sql.commit'" in w for w in warnings)
@@ -159,6 +159,23 @@ def test_get_results_two_items(project_dir_path):
     assert actual[1].label == "foo"
 
 
+def test_get_result_records_of_stages(project_dir_path):
+    target = HDF5Storage(project_dir_path)
+    # arrange
+    experiment_id = randrange(10000000)
+    for stage in range(3):
+        target.save_result(experiment_id, RawResultData("foo", stage, stage))
+        target.save_metadata(experiment_id, Metadata("bar", stage, stage))
+
+    # act
+    actual = target.get_result_records_of_stages([0, 2, 5], experiment_id)
+
+    # assert
+    assert [r.data for r in actual[0]] == [0]
+    assert [r.data for r in actual[2]] == [2]
+    assert actual[5] == []
+
+
 def test_get_metadata_two_items(project_dir_path):
     target = HDF5Storage(project_dir_path)
     # arrange
@@ -0,0 +1,76 @@
+import pytest
+
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.api.graph import Output
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+
+
+def sweep(points):
+    return {"data": list(range(points))}
+
+
+def total(data):
+    return {"sum": sum(data)}
+
+
+def _graph(execution_type=GraphExecutionType.Sync):
+    a = PyNode("sweep", sweep, output_vars={"data"})
+    b = PyNode("total", total, {"data": a.outputs["data"]}, {"sum"})
+    return Graph(None, {a, b}, "compiled", execution_type=execution_type)
+
+
+def _sum(handle):
+    return list(handle.results.get_results_from_node("total"))[0].results[0].data
+
+
+@pytest.mark.parametrize(
+    "execution_type",
+    [GraphExecutionType.Sync, GraphExecutionType.Async, GraphExecutionType.Threads],
+)
+def test_compiled_graph_runs_many_times(execution_type):
+    # arrange
+    compiled = _graph(execution_type).compile()
+    # act
+    handles = [compiled.run(points=points) for points in (3, 4, 5)]
+    # assert
+    assert [_sum(handle) for handle in handles] == [3, 6, 10]
+    assert len({handle.id for handle in handles}) == 3
+
+
+def test_compiled_graph_is_not_affected_by_later_changes():
+    # arrange
+    a = PyNode("sweep", sweep, output_vars={"data"})
+    b = PyNode("total", total, {"data": a.outputs["data"]}, {"sum"})
+    compiled = Graph(None, {a, b}, "compiled").compile()
+    # act
+    b._program = lambda data: {"sum": -1}
+    handle = compiled.run(points=3)
+    # assert
+    assert _sum(handle) == 3
+
+
+def test_missing_run_kwargs_fail_before_running():
+    # arrange
+    compiled = _graph().compile()
+    # act & assert
+    assert compiled.required_kwargs == {"points"}
+    with pytest.raises(EntropyError, match="points"):
+        compiled.run()
+
+
+def test_input_of_undeclared_output_fails_to_compile():
+    # arrange
+    a = PyNode("sweep", sweep, output_vars={"data"})
+    b = PyNode("total", total, {"data": Output(a, "missing")}, {"sum"})
+    graph = Graph(None, {a, b}, "compiled")
+    # act & assert
+    with pytest.raises(EntropyError, match="missing"):
+        graph.compile()
+
+
+def test_compiled_graph_serializes_once():
+    # arrange
+    compiled = _graph().compile()
+    # act & assert
+    assert compiled.serialize() is compiled.serialize()
+    assert "total" in compiled.serialize()
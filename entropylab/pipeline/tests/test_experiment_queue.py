@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from entropylab import SqlAlchemyDB
+from entropylab.components.lab_topology import ExperimentResources
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.api.memory_reader_writer import MemoryOnlyDataReaderWriter
+from entropylab.pipeline.experiment_queue import (
+    ExperimentQueue,
+    QueuedExperimentStatus,
+)
+from entropylab.pipeline.graph_experiment import Graph, PyNode
+from entropylab.pipeline.script_experiment import Script
+
+
+def _script(label, calls, resources=None, fail=False):
+    def run():
+        calls.append(label)
+        if fail:
+            raise ValueError("broken")
+
+    return Script(resources or ExperimentResources(), run, label)
+
+
+def test_experiments_run_by_priority_then_submission_order():
+    # arrange
+    calls = []
+    gate = threading.Event()
+    with ExperimentQueue(MemoryOnlyDataReaderWriter()) as queue:
+        queue.submit(Script(ExperimentResources(), gate.wait, "gate"))
+        queue.submit(_script("low", calls))
+        queue.submit(_script("high", calls), priority=5)
+        queue.submit(_script("low again", calls))
+        # act
+        gate.set()
+    # assert
+    assert calls == ["high", "low", "low again"]
+
+
+def test_dependencies_run_first_and_failures_propagate():
+    # arrange
+    calls = []
+    with ExperimentQueue(MemoryOnlyDataReaderWriter()) as queue:
+        calibrate = queue.submit(_script("calibrate", calls, fail=True))
+        measure = queue.submit(_script("measure", calls), 10, [calibrate])
+        report = queue.submit(_script("report", calls), 10, [measure])
+    # assert
+    assert calls == ["calibrate"]
+    assert measure.status == QueuedExperimentStatus.Failed
+    with pytest.raises(EntropyError, match="measure"):
+        report.result()
+    assert queue.metrics().failed == 3
+
+
+def test_experiments_that_share_a_resource_do_not_run_together(
+    initialized_project_dir_path,
+):
+    # arrange
+    db = SqlAlchemyDB(initialized_project_dir_path)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def use_scope():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        threading.Event().wait(0.05)
+        with lock:
+            running.pop()
+        return {"done": True}
+
+    def graph(label, resource):
+        resources = ExperimentResources()
+        resources.add_temp_resource(resource, object())
+        return Graph(resources, PyNode(label, use_scope, output_vars={"done"}), label)
+
+    with ExperimentQueue(db, max_workers=3) as queue:
+        # act
+        submitted = [
+            queue.submit(graph("a", "scope")),
+            queue.submit(graph("b", "scope")),
+            queue.submit(graph("c", "awg")),
+        ]
+    # assert
+    assert all(s.status == QueuedExperimentStatus.Done for s in submitted)
+    assert max(peak) == 2
+    a, b, c = submitted
+    assert b.start_time >= a.end_time
+    assert c.start_time < a.end_time
+
+
+def test_metrics_report_depth_wait_time_and_throughput():
+    # arrange
+    calls = []
+    gate = threading.Event()
+    queue = ExperimentQueue(MemoryOnlyDataReaderWriter())
+    queue.submit(Script(ExperimentResources(), gate.wait, "gate"))
+    waiting = [queue.submit(_script(f"s{i}", calls)) for i in range(3)]
+    # act
+    pending_metrics = queue.metrics()
+    waiting[2].cancel()
+    gate.set()
+    queue.shutdown()
+    metrics = queue.metrics()
+    # assert
+    assert pending_metrics.depth == 3 and pending_metrics.running == 1
+    assert metrics.depth == 0
+    assert (metrics.done, metrics.cancelled) == (3, 1)
+    assert metrics.max_wait_time >= waiting[1].wait_time > 0
+    assert metrics.throughput > 0
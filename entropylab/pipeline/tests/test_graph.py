@@ -1,5 +1,6 @@
 import asyncio
 import os
+import threading
 from time import sleep
 
 import pytest
@@ -8,6 +9,7 @@ from bokeh.plotting import Figure
 
 from entropylab.pipeline.api.data_writer import PlotSpec
 from entropylab.pipeline.api.execution import EntropyContext
+from entropylab.pipeline.api.memory_reader_writer import MemoryOnlyDataReaderWriter
 from entropylab.pipeline.api.plot import CirclePlotGenerator
 from entropylab.pipeline.graph_experiment import (
     Graph,
@@ -210,3 +212,67 @@ def test_sync_graph_short_edit():
         dot = handle.dot_graph()
         print(dot)
         print(reader.get_experiment_info())
+
+
+def test_graph_shares_objects_captured_by_nodes():
+    # arrange
+    instrument = threading.Lock()  # can't be deep copied
+
+    def acquire():
+        with instrument:
+            return {"x": id(instrument)}
+
+    a1 = PyNode("a", acquire, output_vars={"x"})
+    # act
+    handle = Graph(None, {a1}, "shared").run()
+    # assert
+    assert list(handle.results.get_results_from_node("a"))[0].results[0].data == id(
+        instrument
+    )
+
+
+def test_long_chain_graph_builds_and_runs():
+    # arrange
+    def start():
+        return {"x": 0}
+
+    def increment(x):
+        return {"x": x + 1}
+
+    nodes = [PyNode("n0", start, output_vars={"x"}, save_results=False)]
+    for i in range(1, 2000):
+        nodes.append(
+            PyNode(
+                f"n{i}",
+                increment,
+                {"x": nodes[-1].outputs["x"]},
+                {"x"},
+                save_results=False,
+            )
+        )
+    # act
+    handle = Graph(None, set(nodes), "chain").run()
+    # assert
+    assert handle.results.get_results(label="experiment_result")[0].data == {"x": 1999}
+
+
+def test_node_outputs_are_saved_in_a_single_write():
+    # arrange
+    class CountingDB(MemoryOnlyDataReaderWriter):
+        def __init__(self):
+            super().__init__()
+            self.bulk_writes = []
+
+        def save_results(self, experiment_id, results):
+            self.bulk_writes.append([result.label for result in results])
+            super().save_results(experiment_id, results)
+
+    db = CountingDB()
+    outputs = {f"out{i}" for i in range(10)}
+    node = PyNode("many", lambda: {name: 1 for name in outputs}, output_vars=outputs)
+    # act
+    handle = Graph(None, node, "bulk").run(db)
+    # assert
+    assert [sorted(labels) for labels in db.bulk_writes] == [sorted(outputs)]
+    saved = list(handle.results.get_results_from_node("many"))[0].results
+    assert {result.label for result in saved} == outputs
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+
+from entropylab import SqlAlchemyDB
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+
+
+def measure(amplitude, frequency):
+    return {"signal": amplitude * np.ones(3) * frequency}
+
+
+def peak(signal):
+    return {"max": float(signal.max())}
+
+
+def _graph(execution_type=GraphExecutionType.Sync):
+    a = PyNode("measure", measure, output_vars={"signal"})
+    b = PyNode("peak", peak, {"signal": a.outputs["signal"]}, {"max"})
+    return Graph(None, {a, b}, "sweep", execution_type=execution_type)
+
+
+def test_sweep_results_are_stacked_by_grid():
+    # act
+    handle = _graph().run_sweep(
+        {"amplitude": [1, 2], "frequency": [1, 10, 100]}, max_workers=4
+    )
+    # assert
+    assert handle.shape == (2, 3)
+    assert handle.points[4] == {"amplitude": 2, "frequency": 10}
+    np.testing.assert_array_equal(
+        handle.get_results("peak", "max"), [[1, 10, 100], [2, 20, 200]]
+    )
+    assert handle.get_results("measure", "signal").shape == (2, 3, 3)
+
+
+def test_sweep_of_points_with_fixed_kwargs(initialized_project_dir_path):
+    # arrange
+    db = SqlAlchemyDB(initialized_project_dir_path)
+    # act
+    handle = _graph(GraphExecutionType.Async).run_sweep(
+        [{"amplitude": 1}, {"amplitude": 3}], db, frequency=2
+    )
+    # assert
+    df = handle.to_dataframe()
+    assert list(df["amplitude"]) == [1, 3]
+    assert list(df["peak.max"]) == [2, 6]
+    assert len(db.get_experiments()) == 1
+
+
+def test_sweep_points_run_in_parallel():
+    # arrange
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait(index):
+        barrier.wait()
+        return {"index": index}
+
+    graph = Graph(None, PyNode("wait", wait, output_vars={"index"}), "parallel")
+    # act
+    handle = graph.run_sweep({"index": range(3)}, max_workers=3)
+    # assert
+    np.testing.assert_array_equal(handle.get_results("wait", "index"), [0, 1, 2])
+
+
+def test_failed_point_fails_the_sweep():
+    # arrange
+    def fail(value):
+        if value == 2:
+            raise ValueError("bad point")
+        return {"value": value}
+
+    graph = Graph(None, PyNode("fail", fail, output_vars={"value"}), "failing")
+    # act & assert
+    with pytest.raises(RuntimeError):
+        graph.run_sweep({"value": range(4)}, max_workers=1)
+
+
+@pytest.mark.parametrize("enable_hdf5_storage", [True, False])
+def test_sweep_writes_results_and_nodes_in_bulk(
+    initialized_project_dir_path, enable_hdf5_storage
+):
+    # arrange
+    db = SqlAlchemyDB(
+        initialized_project_dir_path, enable_hdf5_storage=enable_hdf5_storage
+    )
+    writes = []
+    db.instrumentation.add_hook(
+        lambda operation, elapsed, details: writes.append(details.get("table"))
+        if operation == "sql.write"
+        else None
+    )
+    # act
+    handle = _graph().run_sweep({"amplitude": list(range(10))}, db, frequency=1)
+    # assert
+    assert writes.count("Nodes") == 1
+    assert writes.count("Results") == (0 if enable_hdf5_storage else 1)
+    assert db.stats()["sql.commit"].count < 10
+    np.testing.assert_array_equal(handle.get_results("peak", "max"), range(10))
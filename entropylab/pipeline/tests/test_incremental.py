@@ -0,0 +1,94 @@
+import time
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from entropylab import ParamStore
+from entropylab.pipeline.api.memory_reader_writer import MemoryOnlyDataReaderWriter
+from entropylab.pipeline.graph_experiment import Graph, PyNode
+
+calls = []
+
+
+@pytest.fixture
+def param_store(tmp_path):
+    with ParamStore(tmp_path / "params.json") as param_store:
+        param_store["qubit.freq"] = 5.0
+        param_store["readout.amp"] = 0.1
+        yield param_store
+
+
+def _graph(param_store):
+    def find_freq():
+        calls.append("find_freq")
+        param_store["qubit.freq"] = round(param_store["qubit.freq"] + 0.1, 3)
+        return {"freq": param_store["qubit.freq"]}
+
+    def readout():
+        calls.append("readout")
+        return {"amp": param_store["readout.amp"]}
+
+    def rabi(freq, amp):
+        calls.append("rabi")
+        return {"pi": freq * amp}
+
+    a = PyNode(
+        "find_freq",
+        find_freq,
+        output_vars={"freq"},
+        param_reads={"qubit.freq"},
+        param_writes={"qubit.freq"},
+    )
+    b = PyNode("readout", readout, output_vars={"amp"}, param_reads={"readout.amp"})
+    c = PyNode(
+        "rabi",
+        rabi,
+        {"freq": a.outputs["freq"], "amp": b.outputs["amp"]},
+        {"pi"},
+    )
+    return Graph(None, {a, b, c}, "calibration")
+
+
+def test_only_nodes_with_changed_params_run_again(param_store):
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    graph = _graph(param_store)
+    graph.run_incremental(param_store, db)
+    calls.clear()
+    # act
+    param_store["readout.amp"] = 0.2
+    handle = graph.run_incremental(param_store, db)
+    # assert
+    assert calls == ["readout", "rabi"]
+    result = list(handle.results.get_results_from_node("rabi"))[0].results[0]
+    assert result.data == pytest.approx(5.1 * 0.2)
+
+
+def test_unchanged_params_run_nothing(param_store):
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    graph = _graph(param_store)
+    graph.run_incremental(param_store, db)
+    calls.clear()
+    # act
+    graph.run_incremental(param_store, db)
+    # assert
+    assert calls == []
+
+
+def test_expired_param_runs_node_and_descendants(param_store):
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    graph = _graph(param_store)
+    graph.run_incremental(param_store, db)
+    calls.clear()
+    # act
+    param_store.set_param(
+        "qubit.freq",
+        param_store["qubit.freq"],
+        expiration=pd.Timestamp(time.time_ns()) - timedelta(minutes=1),
+    )
+    graph.run_incremental(param_store, db)
+    # assert
+    assert calls == ["find_freq", "rabi"]
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.graph_experiment import (
+    Graph,
+    PyNode,
+    SubGraphNode,
+    GraphExecutionType,
+)
+
+
+def _results(handle, node_label):
+    return [
+        result.data
+        for node in handle.results.get_results_from_node(node_label)
+        for result in node.results
+    ]
+
+
+def _calibration():
+    a = PyNode("offset", lambda: {"offset": 2}, output_vars={"offset"})
+    b = PyNode(
+        "gain",
+        lambda offset: {"gain": offset * 3},
+        {"offset": a.outputs["offset"]},
+        {"gain"},
+    )
+    return {a, b}
+
+
+def test_inlined_sub_graph_outputs_are_wired_to_its_leaves():
+    # arrange
+    start = PyNode("start", lambda: {"ready": True}, output_vars={"ready"})
+    sub_graph = SubGraphNode(
+        _calibration(),
+        "calibration",
+        output_vars={"gain"},
+        must_run_after={start},
+        inline=True,
+    )
+    report = PyNode(
+        "report",
+        lambda gain: {"report": f"gain={gain}"},
+        {"gain": sub_graph.outputs["gain"]},
+        {"report"},
+    )
+    graph = Graph(None, {start, sub_graph, report}, "inlined")
+    # act
+    handle = graph.run()
+    # assert
+    assert _results(handle, "report") == ["gain=6"]
+    assert _results(handle, "calibration.gain") == [6]
+    labels = [node.label for node in handle._graph.nodes_in_topological_order()]
+    assert labels == ["start", "calibration.offset", "calibration.gain", "report"]
+
+
+def test_inlined_nodes_run_in_parallel_with_outer_nodes():
+    # arrange
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait(name):
+        barrier.wait()
+        return {name: True}
+
+    inner = PyNode("inner", lambda: wait("inner"), output_vars={"inner"})
+    sub_graph = SubGraphNode({inner}, "sub", output_vars={"inner"}, inline=True)
+    outer = PyNode("outer", lambda: wait("outer"), output_vars={"outer"})
+    graph = Graph(
+        None, {sub_graph, outer}, "parallel", execution_type=GraphExecutionType.Threads
+    )
+    # act
+    handle = graph.run()
+    # assert
+    assert _results(handle, "sub.inner") == [True]
+
+
+def test_output_that_no_leaf_produces_fails():
+    # arrange
+    sub_graph = SubGraphNode(
+        _calibration(), "calibration", output_vars={"gain", "phase"}, inline=True
+    )
+    report = PyNode("report", lambda phase: {}, {"phase": sub_graph.outputs["phase"]})
+    # act & assert
+    with pytest.raises(EntropyError, match="phase"):
+        Graph(None, {sub_graph, report}, "inlined")
+
+
+def test_inlined_sub_graph_can_not_retry():
+    # act & assert
+    with pytest.raises(ValueError):
+        SubGraphNode(_calibration(), "calibration", inline=True, timeout=1)
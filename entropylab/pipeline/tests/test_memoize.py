@@ -0,0 +1,172 @@
+import threading
+import time
+
+import numpy as np
+
+from entropylab import SqlAlchemyDB
+from entropylab.pipeline.api.graph import MemoizeBehavior
+from entropylab.pipeline.api.node_cache import NodeResultCache, find_cached_outputs
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+
+calls = []
+
+
+def sweep(points):
+    calls.append("sweep")
+    return {"data": np.linspace(0, 1, points)}
+
+
+def fit(data):
+    calls.append("fit")
+    return {"peak": float(data.max())}
+
+
+def _scale_by(factor):
+    def scale(points):
+        calls.append(f"scale by {factor}")
+        return {"data": np.linspace(0, 1, points) * factor}
+
+    return scale
+
+
+def _closure_graph(program, cache):
+    node = PyNode(
+        "scale", program, output_vars={"data"}, memoize=MemoizeBehavior(cache=cache)
+    )
+    return Graph(None, node, "scaling")
+
+
+def _graph(cache, execution_type=GraphExecutionType.Sync, ttl=None):
+    memoize = MemoizeBehavior(ttl=ttl, cache=cache)
+    a = PyNode("sweep", sweep, output_vars={"data"}, memoize=memoize)
+    b = PyNode("fit", fit, {"data": a.outputs["data"]}, {"peak"}, memoize=memoize)
+    return Graph(None, {a, b}, "calibration", execution_type=execution_type)
+
+
+def test_rerun_with_same_inputs_restores_outputs():
+    # arrange
+    calls.clear()
+    graph = _graph(NodeResultCache())
+    graph.run(points=11)
+    # act
+    handle = graph.run(points=11)
+    # assert
+    assert calls == ["sweep", "fit"]
+    assert list(handle.results.get_results_from_node("fit"))[0].results[0].data == 1
+
+
+def test_rerun_with_changed_kwargs_runs_again():
+    # arrange
+    calls.clear()
+    graph = _graph(NodeResultCache())
+    graph.run(points=11)
+    # act
+    graph.run(points=21)
+    # assert
+    assert calls == ["sweep", "fit", "sweep", "fit"]
+
+
+def test_rerun_in_thread_pool_restores_outputs():
+    # arrange
+    calls.clear()
+    graph = _graph(NodeResultCache(), GraphExecutionType.Threads)
+    graph.run(points=11)
+    # act
+    graph.run(points=11)
+    # assert
+    assert calls == ["sweep", "fit"]
+
+
+def test_outputs_are_restored_from_results_db(initialized_project_dir_path):
+    # arrange
+    calls.clear()
+    db = SqlAlchemyDB(initialized_project_dir_path)
+    _graph(NodeResultCache()).run(db, points=11)
+    # act
+    _graph(NodeResultCache()).run(db, points=11)
+    # assert
+    assert calls == ["sweep", "fit"]
+
+
+def test_results_db_miss_does_not_read_earlier_experiments(
+    initialized_project_dir_path,
+):
+    # arrange
+    db = SqlAlchemyDB(initialized_project_dir_path)
+    for points in (11, 21):
+        _graph(NodeResultCache()).run(db, points=points)
+    opened = db.stats()["hdf5.open"].count
+    # act
+    outputs = find_cached_outputs(db, "missing key", ["data"])
+    # assert
+    assert outputs is None
+    assert db.stats()["hdf5.open"].count == opened
+
+
+def test_expired_outputs_are_not_restored():
+    # arrange
+    calls.clear()
+    graph = _graph(NodeResultCache(), ttl=0.01)
+    graph.run(points=11)
+    time.sleep(0.02)
+    # act
+    graph.run(points=11)
+    # assert
+    assert calls == ["sweep", "fit", "sweep", "fit"]
+
+
+def test_cache_evicts_least_recently_used_entries():
+    # arrange
+    target = NodeResultCache(max_entries=2)
+    target.put("a", {"x": 1})
+    target.put("b", {"x": 2})
+    target.get("a")
+    # act
+    target.put("c", {"x": 3})
+    # assert
+    assert target.get("b") is None
+    assert target.get("a") == {"x": 1}
+
+
+def test_cache_evicts_by_size():
+    # arrange
+    target = NodeResultCache(max_bytes=1000)
+    target.put("a", {"x": np.zeros(100)})
+    # act
+    target.put("b", {"x": np.zeros(100)})
+    # assert
+    assert len(target) == 1
+    assert target.size_bytes == 800
+
+
+def test_closures_with_different_captured_values_are_cached_apart():
+    # arrange
+    calls.clear()
+    cache = NodeResultCache()
+    _closure_graph(_scale_by(1), cache).run(points=11)
+    # act
+    handle = _closure_graph(_scale_by(2), cache).run(points=11)
+    # assert
+    assert calls == ["scale by 1", "scale by 2"]
+    result = list(handle.results.get_results_from_node("scale"))[0].results[0]
+    assert result.data.max() == 2
+
+
+def test_closure_that_can_not_be_hashed_is_not_memoized():
+    # arrange
+    calls.clear()
+    cache = NodeResultCache()
+    lock = threading.Lock()
+
+    def locked(points):
+        with lock:
+            calls.append("locked")
+        return {"data": np.zeros(points)}
+
+    graph = _closure_graph(locked, cache)
+    graph.run(points=11)
+    # act
+    graph.run(points=11)
+    # assert
+    assert calls == ["locked", "locked"]
+    assert len(cache) == 0
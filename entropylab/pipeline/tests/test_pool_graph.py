@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+import pytest
+
+from entropylab.pipeline.api.execution import EntropyContext
+from entropylab.pipeline.graph_experiment import (
+    Graph,
+    PyNode,
+    GraphExecutionType,
+    SubGraphNode,
+)
+
+
+def rest(duration):
+    time.sleep(duration)
+    return {"x": duration}
+
+
+def number(value):
+    return {"x": value}
+
+
+def square(x, context: EntropyContext):
+    context.add_result("squared_in_node", x**2)
+    return {"y": x**2}
+
+
+def total(y1, y2):
+    return {"total": np.array([y1, y2]).sum()}
+
+
+def fail():
+    raise ValueError("node failed")
+
+
+def test_threads_run_independent_nodes_in_parallel():
+    # arrange
+    nodes = {PyNode(f"rest_{i}", rest, output_vars={"x"}) for i in range(4)}
+    graph = Graph(
+        None, nodes, "threads", execution_type=GraphExecutionType.Threads, max_workers=4
+    )
+    start = time.perf_counter()
+    # act
+    graph.run(duration=0.3)
+    # assert
+    assert time.perf_counter() - start < 1.0
+
+
+def test_threads_save_results_of_every_node():
+    # arrange
+    a = PyNode("a", lambda: {"x": 2}, output_vars={"x"})
+    b1 = PyNode("b1", square, {"x": a.outputs["x"]}, {"y"})
+    b2 = PyNode("b2", square, {"x": a.outputs["x"]}, {"y"})
+    c = PyNode("c", total, {"y1": b1.outputs["y"], "y2": b2.outputs["y"]}, {"total"})
+    graph = Graph(
+        None, {a, b1, b2, c}, "fan_in", execution_type=GraphExecutionType.Threads
+    )
+    # act
+    handle = graph.run()
+    # assert
+    c_results = list(handle.results.get_results_from_node("c"))
+    assert c_results[0].results[0].data == 8
+    b1_results = list(handle.results.get_results_from_node("b1"))[0].results
+    assert {r.label for r in b1_results} == {"squared_in_node", "y"}
+    stages = [
+        result.stage for result in handle.results.get_results(label="squared_in_node")
+    ]
+    assert len(set(stages)) == 2
+
+
+def test_processes_run_picklable_nodes():
+    # arrange
+    a = PyNode("a", number, output_vars={"x"})
+    b = PyNode("b", square, {"x": a.outputs["x"]}, {"y"})
+    graph = Graph(
+        None, {a, b}, "processes", execution_type=GraphExecutionType.Processes
+    )
+    # act
+    handle = graph.run(value=3)
+    # assert
+    b_results = list(handle.results.get_results_from_node("b"))[0].results
+    assert {r.label: r.data for r in b_results} == {"squared_in_node": 9, "y": 9}
+
+
+@pytest.mark.parametrize(
+    "execution_type", [GraphExecutionType.Threads, GraphExecutionType.Processes]
+)
+def test_pool_stops_graph_on_node_error(execution_type):
+    # arrange
+    a = PyNode("a", fail, output_vars={"x"})
+    b = PyNode("b", square, {"x": a.outputs["x"]}, {"y"})
+    graph = Graph(None, {a, b}, "failing", execution_type=execution_type)
+    # act & assert
+    with pytest.raises(RuntimeError):
+        graph.run()
+
+
+def test_threads_run_sub_graph_node():
+    # arrange
+    a = PyNode("a", rest, output_vars={"x"})
+    sub_graph = SubGraphNode({a}, "sub", output_vars={"x"})
+    b = PyNode("b", square, {"x": sub_graph.outputs["x"]}, {"y"})
+    # act
+    handle = Graph(
+        None, {sub_graph, b}, "sub", execution_type=GraphExecutionType.Threads
+    ).run(duration=0)
+    # assert
+    assert list(handle.results.get_results_from_node("b"))[0].results[0].data == 0
@@ -0,0 +1,131 @@
+import json
+import time
+
+import pytest
+
+from entropylab import SqlAlchemyDB
+from entropylab.pipeline.api.graph import RetryBehavior
+from entropylab.pipeline.api.memory_reader_writer import MemoryOnlyDataReaderWriter
+from entropylab.pipeline.api.profiler import (
+    GraphProfile,
+    NodeProfile,
+    NODE_PROFILE_LABEL,
+)
+from entropylab.pipeline.graph_experiment import (
+    Graph,
+    PyNode,
+    GraphExecutionType,
+    SubGraphNode,
+)
+
+attempts = []
+
+
+def calibrate():
+    time.sleep(0.05)
+    return {"offset": 1}
+
+
+def measure(offset):
+    attempts.append(1)
+    if len(attempts) < 2:
+        raise ValueError("instrument busy")
+    return {"data": [offset] * 10}
+
+
+def _graph(execution_type=GraphExecutionType.Sync):
+    a = PyNode("calibrate", calibrate, output_vars={"offset"})
+    b = PyNode(
+        "measure",
+        measure,
+        {"offset": a.outputs["offset"]},
+        {"data"},
+        retry_on_error=RetryBehavior(number_of_attempts=2, wait_time=0),
+    )
+    return Graph(None, {a, b}, "profiled", execution_type=execution_type, profile=True)
+
+
+@pytest.mark.parametrize(
+    "execution_type",
+    [GraphExecutionType.Sync, GraphExecutionType.Async, GraphExecutionType.Threads],
+)
+def test_profile_records_every_node(initialized_project_dir_path, execution_type):
+    # arrange
+    attempts.clear()
+    db = SqlAlchemyDB(initialized_project_dir_path)
+    # act
+    profile = _graph(execution_type).run(db).profile()
+    # assert
+    calibrate_profile, measure_profile = profile.nodes
+    assert calibrate_profile.label == "calibrate"
+    assert calibrate_profile.execution_time >= 0.05
+    assert measure_profile.attempts == 2
+    assert measure_profile.retries == 1
+    assert measure_profile.ready_time >= calibrate_profile.start_time
+    assert measure_profile.start_time >= calibrate_profile.end_time
+    assert profile.wall_time >= profile.busy_time * 0.99
+
+
+def test_chrome_trace_shows_parallel_nodes_in_lanes(tmp_path):
+    # arrange
+    profile = GraphProfile(
+        [
+            NodeProfile("a", 1, "done", 10.0, 11.0, 10.0),
+            NodeProfile("b", 2, "done", 10.5, 12.0, 10.0, serialization_time=0.5),
+            NodeProfile("c", 3, "done", 11.0, 12.0, 11.0),
+        ]
+    )
+    path = tmp_path / "trace.json"
+    # act
+    profile.save_chrome_trace(str(path))
+    # assert
+    events = json.loads(path.read_text())["traceEvents"]
+    nodes = {e["name"]: e for e in events if e.get("cat") == "node"}
+    assert [nodes[label]["tid"] for label in "abc"] == [0, 1, 0]
+    assert nodes["b"]["ts"] == 0.5e6 and nodes["b"]["dur"] == 1.5e6
+    queued = [e["name"] for e in events if e.get("cat") == "queue"]
+    assert queued == ["b"]
+    assert profile.parallelism == pytest.approx(3.5 / 2)
+
+
+def test_failed_node_is_profiled():
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+
+    def fail():
+        raise ValueError("broken")
+
+    graph = Graph(None, PyNode("fail", fail), "failing", profile=True)
+    # act
+    with pytest.raises(RuntimeError):
+        graph.run(db)
+    # assert
+    (record,) = db.get_metadata_records(label=NODE_PROFILE_LABEL)
+    assert NodeProfile.from_dict(record.data).status == "failed"
+
+
+def test_nodes_are_not_profiled_by_default():
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    graph = Graph(None, PyNode("quiet", lambda: {"x": 1}, output_vars={"x"}), "quiet")
+    # act
+    graph.run(db)
+    # assert
+    assert db.get_metadata_records(label=NODE_PROFILE_LABEL) == []
+
+
+@pytest.mark.parametrize(
+    "execution_type", [GraphExecutionType.Sync, GraphExecutionType.Async]
+)
+def test_sub_graph_nodes_are_profiled(execution_type):
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    inner = PyNode("inner", lambda: {"x": 1}, output_vars={"x"})
+    sub_graph = SubGraphNode({inner}, "sub", output_vars={"x"})
+    graph = Graph(
+        None, sub_graph, "nested", execution_type=execution_type, profile=True
+    )
+    # act
+    handle = graph.run(db)
+    # assert
+    assert sorted(node.label for node in handle.profile().nodes) == ["inner", "sub"]
@@ -1,7 +1,10 @@
 import asyncio
 
+import pytest
+
+from entropylab.pipeline import graph_experiment
 from entropylab.pipeline.api.graph import GraphHelper
-from entropylab.pipeline.graph_experiment import pynode, Graph
+from entropylab.pipeline.graph_experiment import pynode, Graph, PyNode
 
 
 @pynode("a", output_vars={"x"})
@@ -37,3 +40,40 @@ async def decor2(*args):
 
 def test_sync_graph_short_decor():
     Graph(None, {decor, decor1, decor2}, "run_a").run()
+
+
+def scale(x, factor=2, *, offset=0):
+    return {"y": x * factor + offset}
+
+
+def test_parameters_with_defaults_are_optional():
+    # arrange
+    a = PyNode("a", lambda: {"x": 3}, output_vars={"x"})
+    b = PyNode("b", scale, {"x": a.outputs["x"]}, {"y"})
+    # act
+    handle = Graph(None, {a, b}, "defaults").run(offset=1)
+    # assert
+    assert list(handle.results.get_results_from_node("b"))[0].results[0].data == 7
+
+
+def test_missing_parameter_fails_the_node():
+    # arrange
+    b = PyNode("b", scale, output_vars={"y"})
+    # act & assert
+    with pytest.raises(RuntimeError):
+        Graph(None, {b}, "missing").run()
+
+
+def test_function_is_inspected_once(monkeypatch):
+    # arrange
+    a = PyNode("a", lambda: {"x": 3}, output_vars={"x"})
+    b = PyNode("b", scale, {"x": a.outputs["x"]}, {"y"})
+    graph = Graph(None, {a, b}, "inspect_once")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("signature was inspected again")
+
+    monkeypatch.setattr(graph_experiment, "signature", fail)
+    # act
+    graph.run()
+    graph.run()
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from entropylab.pipeline.api.graph import GraphHelper, _NodeScheduler
+from entropylab.pipeline.graph_experiment import (
+    Graph,
+    PyNode,
+    SubGraphNode,
+    GraphExecutionType,
+    _create_actual_graph,
+)
+
+running = set()
+overlaps = []
+peak = []
+lock = threading.Lock()
+
+
+def _use(name, instrument):
+    with lock:
+        if any(other.startswith(instrument) for other in running):
+            overlaps.append(name)
+        running.add(f"{instrument}:{name}")
+        peak.append(len(running))
+    time.sleep(0.05)
+    with lock:
+        running.discard(f"{instrument}:{name}")
+    return {name: True}
+
+
+def _node(name, instrument):
+    return PyNode(
+        name,
+        lambda: _use(name, instrument),
+        output_vars={name},
+        resources={instrument},
+    )
+
+
+@pytest.mark.parametrize("max_concurrency", [None, 3])
+def test_nodes_of_the_same_resource_do_not_overlap(max_concurrency):
+    # arrange
+    overlaps.clear()
+    peak.clear()
+    nodes = {_node(f"{instrument}{i}", instrument) for instrument in "ab" for i in "12"}
+    graph = Graph(
+        None,
+        nodes,
+        "instruments",
+        execution_type=GraphExecutionType.Threads,
+        max_concurrency=max_concurrency,
+    )
+    # act
+    graph.run()
+    # assert
+    assert overlaps == []
+    # nodes of different resources run in parallel
+    assert max(peak) == 2
+
+
+def test_resource_limit_allows_concurrent_nodes():
+    # arrange
+    nodes = {_node(f"scope{i}", "scope") for i in range(3)}
+    graph = GraphHelper(_create_actual_graph(nodes, set()))
+    scheduler = _NodeScheduler(graph, resource_limits={"scope": 2})
+    # act
+    started = scheduler.pop_ready()
+    # assert
+    assert len(started) == 2
+    scheduler.done(started[0])
+    assert len(scheduler.pop_ready()) == 1
+
+
+def test_sub_graph_holds_the_resources_of_its_nodes():
+    # arrange
+    sub_graph = SubGraphNode({_node("a1", "a")}, "sub", output_vars={"a1"})
+    # assert
+    assert sub_graph.resources == {"a"}
+    assert SubGraphNode({_node("a1", "a")}, "sub", inline=True).resources == set()
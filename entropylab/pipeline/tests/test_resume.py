@@ -0,0 +1,138 @@
+import pytest
+
+from entropylab import SqlAlchemyDB
+from entropylab.pipeline.api.errors import EntropyError
+from entropylab.pipeline.api.memory_reader_writer import MemoryOnlyDataReaderWriter
+from entropylab.pipeline.graph_experiment import (
+    Graph,
+    PyNode,
+    GraphExecutionType,
+    RESUMED_FROM_LABEL,
+)
+
+calls = []
+fail_fit = []
+
+
+def calibrate():
+    calls.append("calibrate")
+    return {"offset": 3}
+
+
+def measure(offset):
+    calls.append("measure")
+    return {"data": [offset, offset + 1]}
+
+
+def fit(data):
+    calls.append("fit")
+    if fail_fit:
+        raise ValueError("fit did not converge")
+    return {"slope": data[1] - data[0]}
+
+
+def report(slope):
+    calls.append("report")
+    return {"report": f"slope={slope}"}
+
+
+def acquire(traces):
+    calls.append("acquire")
+    for i in range(traces):
+        yield {"trace": [i, i + 1]}
+
+
+def total(trace):
+    calls.append("total")
+    return {"data": [0, sum(sum(t) for t in trace)]}
+
+
+def _graph(execution_type=GraphExecutionType.Sync):
+    a = PyNode("calibrate", calibrate, output_vars={"offset"})
+    b = PyNode("measure", measure, {"offset": a.outputs["offset"]}, {"data"})
+    c = PyNode("fit", fit, {"data": b.outputs["data"]}, {"slope"})
+    d = PyNode("report", report, {"slope": c.outputs["slope"]}, {"report"})
+    return Graph(None, {a, b, c, d}, "resumable", execution_type=execution_type)
+
+
+def _failed_run(graph, db):
+    calls.clear()
+    fail_fit.append(True)
+    with pytest.raises(RuntimeError):
+        graph.run(db)
+    fail_fit.clear()
+    calls.clear()
+    return max(record.id for record in db.get_experiments())
+
+
+@pytest.mark.parametrize(
+    "execution_type", [GraphExecutionType.Sync, GraphExecutionType.Async]
+)
+def test_resume_runs_failed_node_and_descendants(
+    initialized_project_dir_path, execution_type
+):
+    # arrange
+    db = SqlAlchemyDB(initialized_project_dir_path)
+    graph = _graph(execution_type)
+    failed_id = _failed_run(graph, db)
+    # act
+    handle = graph.resume(failed_id, db)
+    # assert
+    assert calls == ["fit", "report"]
+    result = list(handle.results.get_results_from_node("report"))[0].results[0]
+    assert result.data == "slope=1"
+    link = db.get_metadata_records(handle.id, label=RESUMED_FROM_LABEL)[0].data
+    assert link["experiment_id"] == failed_id
+    assert link["restored_nodes"] == ["calibrate", "measure"]
+
+
+def test_resume_of_finished_experiment_fails():
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    graph = _graph()
+    handle = graph.run(db)
+    # act & assert
+    with pytest.raises(EntropyError):
+        graph.resume(handle.id, db)
+
+
+def test_node_without_outputs_runs_again_unless_a_child_started():
+    # arrange
+    db = MemoryOnlyDataReaderWriter()
+    setup = PyNode("setup", lambda: calls.append("setup"))
+    a = PyNode("calibrate", calibrate, output_vars={"offset"}, must_run_after={setup})
+    b = PyNode("check", lambda: calls.append("check"), must_run_after={a})
+    graph = Graph(None, {setup, a, b}, "no outputs")
+    handle = graph.run(db)
+    calls.clear()
+    # act
+    graph.resume(handle.id, db)
+    # assert
+    assert calls == ["check"]
+
+
+@pytest.mark.parametrize("enable_hdf5_storage", [True, False])
+def test_resume_restores_streamed_outputs(
+    initialized_project_dir_path, enable_hdf5_storage
+):
+    # arrange
+    db = SqlAlchemyDB(
+        initialized_project_dir_path, enable_hdf5_storage=enable_hdf5_storage
+    )
+    a = PyNode("acquire", acquire, output_vars={"trace"})
+    b = PyNode("total", total, {"trace": a.outputs["trace"]}, {"data"})
+    c = PyNode("fit", fit, {"data": b.outputs["data"]}, {"slope"})
+    graph = Graph(None, {a, b, c}, "streaming resumable")
+    calls.clear()
+    fail_fit.append(True)
+    with pytest.raises(RuntimeError):
+        graph.run(db, traces=12)
+    fail_fit.clear()
+    calls.clear()
+    failed_id = max(record.id for record in db.get_experiments())
+    # act
+    handle = graph.resume(failed_id, db, traces=12)
+    # assert
+    assert calls == ["fit"]
+    result = list(handle.results.get_results_from_node("fit"))[0].results[0]
+    assert result.data == sum(2 * i + 1 for i in range(12))
@@ -1,42 +1,85 @@
-from entropylab import PyNode, Graph
-from entropylab.pipeline.api.graph import RetryBehavior
-from entropylab.logger import logger
-
-counter = 1
-
-
-def a():
-    global counter
-    if counter < 3:
-        counter = counter + 1
-        raise Exception("still not working")
-    counter = 1
-    return {"x": 1}
-
-
-def test_retry_behavior(caplog):
-    a1 = PyNode(
-        "a1",
-        a,
-        output_vars={"x"},
-        retry_on_error=RetryBehavior(backoff=2, wait_time=0.2),
-    )
-    a2 = PyNode(
-        "a2",
-        a,
-        output_vars={"x"},
-        must_run_after={a1},
-        retry_on_error=RetryBehavior(added_delay=0.1, wait_time=0.2, backoff=1),
-    )
-    handle = Graph(None, {a1, a2}, "must_run_after").run()
-    assert len(list(handle.results.get_results_from_node("a1"))) == 1
-    assert len(list(handle.results.get_results_from_node("a2"))) == 1
-    # assert (
-    #     list(list(handle.results.get_results_from_node("a2"))[0].results)[0].label
-    #     == "x"
-    # )
-    # assert (
-    #     "node a1 has error, retrying #2 in 0.4 seconds : still not working"
-    #     in caplog.text
-    # )
-    # assert "node a2 has error, retrying #2 in 0.3" in caplog.text
+import pytest
+
+from entropylab import PyNode, Graph
+from entropylab.pipeline.graph_experiment import GraphExecutionType
+from entropylab.pipeline.api.graph import RetryBehavior
+from entropylab.logger import logger
+
+counter = 1
+
+
+def a():
+    global counter
+    if counter < 3:
+        counter = counter + 1
+        raise Exception("still not working")
+    counter = 1
+    return {"x": 1}
+
+
+def test_retry_behavior(caplog):
+    a1 = PyNode(
+        "a1",
+        a,
+        output_vars={"x"},
+        retry_on_error=RetryBehavior(backoff=2, wait_time=0.2),
+    )
+    a2 = PyNode(
+        "a2",
+        a,
+        output_vars={"x"},
+        must_run_after={a1},
+        retry_on_error=RetryBehavior(added_delay=0.1, wait_time=0.2, backoff=1),
+    )
+    handle = Graph(None, {a1, a2}, "must_run_after").run()
+    assert len(list(handle.results.get_results_from_node("a1"))) == 1
+    assert len(list(handle.results.get_results_from_node("a2"))) == 1
+    # assert (
+    #     list(list(handle.results.get_results_from_node("a2"))[0].results)[0].label
+    #     == "x"
+    # )
+    # assert (
+    #     "node a1 has error, retrying #2 in 0.4 seconds : still not working"
+    #     in caplog.text
+    # )
+    # assert "node a2 has error, retrying #2 in 0.3" in caplog.text
+
+
+def test_async_retry_awaits_every_attempt():
+    # arrange
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ValueError("still not working")
+        return {"x": len(attempts)}
+
+    node = PyNode(
+        "flaky",
+        flaky,
+        output_vars={"x"},
+        retry_on_error=RetryBehavior(number_of_attempts=3, wait_time=0.01),
+    )
+    graph = Graph(None, {node}, "async retry", execution_type=GraphExecutionType.Async)
+    # act
+    handle = graph.run()
+    # assert
+    result = list(handle.results.get_results_from_node("flaky"))[0].results[0]
+    assert result.data == 3
+
+
+def test_last_failed_attempt_fails_the_node():
+    # arrange
+    def broken():
+        raise ValueError("broken")
+
+    node = PyNode(
+        "broken",
+        broken,
+        output_vars={"x"},
+        retry_on_error=RetryBehavior(number_of_attempts=2, wait_time=0.01),
+    )
+    # act & assert
+    with pytest.raises(RuntimeError):
+        Graph(None, {node}, "retry").run()
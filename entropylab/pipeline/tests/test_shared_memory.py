@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from entropylab.pipeline.api.shared_memory import (
+    SharedArray,
+    SharedMemoryTransport,
+    _MappedBlock,
+    share_outputs,
+)
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+
+shared_memory = pytest.importorskip("multiprocessing.shared_memory")
+
+
+def trace():
+    return {"trace": np.arange(512 * 1024, dtype=np.float64)}
+
+
+def average(trace):
+    return {"mean": trace.mean(), "mapped": isinstance(trace.base, _MappedBlock)}
+
+
+def _block_exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def test_large_outputs_are_passed_to_processes_in_shared_memory():
+    # arrange
+    a = PyNode("trace", trace, output_vars={"trace"})
+    b = PyNode("average", average, {"trace": a.outputs["trace"]}, {"mean", "mapped"})
+    graph = Graph(None, {a, b}, "shared", execution_type=GraphExecutionType.Processes)
+    # act
+    handle = graph.run()
+    # assert
+    results = {
+        r.label: r.data
+        for r in list(handle.results.get_results_from_node("average"))[0].results
+    }
+    assert results == {"mean": pytest.approx(512 * 1024 / 2 - 0.5), "mapped": True}
+    saved = list(handle.results.get_results_from_node("trace"))[0].results[0]
+    np.testing.assert_array_equal(saved.data, trace()["trace"])
+
+
+def test_blocks_are_unlinked_when_all_consumers_released_them():
+    # arrange
+    transport = SharedMemoryTransport({"producer": 2}, min_bytes=0)
+    results = share_outputs({"x": np.ones(10), "label": "raw"}, min_bytes=0)
+    handle = results["x"]
+    # act
+    outputs = transport.adopt("producer", results)
+    inputs = transport.handles({"x": outputs["x"]})
+    transport.release("producer")
+    still_shared = _block_exists(handle.name)
+    transport.release("producer")
+    # assert
+    assert isinstance(handle, SharedArray) and inputs["x"] == handle
+    assert still_shared and not _block_exists(handle.name)
+    assert outputs["label"] == "raw" and outputs["x"].sum() == 10
+
+
+def test_small_arrays_are_not_shared():
+    # act
+    results = share_outputs({"x": np.ones(10)}, min_bytes=1024)
+    # assert
+    assert isinstance(results["x"], np.ndarray)
+
+
+def test_block_is_closed_when_its_last_array_is_deleted():
+    # arrange
+    handle = SharedArray.create(np.arange(4.0))
+    array = handle.attach()
+    view = array[1:]
+    block = array.base._block
+    # act
+    del array
+    still_open = block.buf is not None
+    del view
+    # assert
+    assert still_open and block.buf is None
+    shared_memory.SharedMemory(name=handle.name).unlink()
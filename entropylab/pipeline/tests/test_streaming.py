@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+
+from entropylab import SqlAlchemyDB
+from entropylab.pipeline.api.output_stream import OutputStream
+from entropylab.pipeline.graph_experiment import Graph, PyNode, GraphExecutionType
+
+
+def acquire(traces):
+    for i in range(traces):
+        yield {"trace": [i, i]}
+
+
+def analyze(trace: OutputStream):
+    return {"total": sum(sum(t) for t in trace)}
+
+
+def _results(handle, node_label, label):
+    return [
+        result.data
+        for node in handle.results.get_results_from_node(node_label, label)
+        for result in node.results
+    ]
+
+
+@pytest.mark.parametrize(
+    "execution_type",
+    [GraphExecutionType.Sync, GraphExecutionType.Async, GraphExecutionType.Threads],
+)
+def test_streamed_outputs_are_consumed_and_saved(execution_type):
+    # arrange
+    a = PyNode("acquire", acquire, output_vars={"trace"})
+    b = PyNode("analyze", analyze, {"trace": a.streams["trace"]}, {"total"})
+    c = PyNode(
+        "count",
+        lambda trace: {"count": len(trace)},
+        {"trace": a.outputs["trace"]},
+        {"count"},
+    )
+    graph = Graph(None, {a, b, c}, "streaming", execution_type=execution_type)
+    # act
+    handle = graph.run(traces=4)
+    # assert
+    assert _results(handle, "analyze", "total") == [12]
+    assert [_results(handle, "acquire", f"trace[{i}]") for i in range(4)] == [
+        [[i, i]] for i in range(4)
+    ]
+    assert _results(handle, "count", "count") == [4]
+
+
+@pytest.mark.parametrize("enable_hdf5_storage", [True, False])
+def test_streamed_values_are_saved_to_the_db(
+    initialized_project_dir_path, enable_hdf5_storage
+):
+    # arrange
+    db = SqlAlchemyDB(
+        initialized_project_dir_path, enable_hdf5_storage=enable_hdf5_storage
+    )
+    a = PyNode("acquire", acquire, output_vars={"trace"})
+    b = PyNode("analyze", analyze, {"trace": a.streams["trace"]}, {"total"})
+    # act
+    handle = Graph(None, {a, b}, "streaming").run(db, traces=3)
+    # assert
+    (stage,) = db.get_node_stage_ids_by_label("acquire", handle.id)
+    results = db.get_results(handle.id, stage=stage)
+    assert {result.label: list(result.data) for result in results} == {
+        "trace[0]": [0, 0],
+        "trace[1]": [1, 1],
+        "trace[2]": [2, 2],
+    }
+    assert _results(handle, "analyze", "total") == [6]
+
+
+def test_consumer_runs_while_producer_streams():
+    # arrange
+    received = threading.Event()
+
+    def produce():
+        for i in range(3):
+            yield {"value": i}
+            # waits for the consumer, which runs at the same time
+            assert received.wait(5)
+            received.clear()
+
+    def consume(value):
+        values = []
+        for v in value:
+            values.append(v)
+            received.set()
+        return {"values": values}
+
+    a = PyNode("produce", produce, output_vars={"value"})
+    b = PyNode("consume", consume, {"value": a.streams["value"]}, {"values"})
+    # act
+    handle = Graph(None, {a, b}, "overlap").run()
+    # assert
+    assert _results(handle, "consume", "values") == [[0, 1, 2]]
+
+
+def test_async_generator_streams_to_async_consumer():
+    # arrange
+    async def produce():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield {"value": i}
+
+    async def consume(value):
+        return {"values": [v async for v in value]}
+
+    a = PyNode("produce", produce, output_vars={"value"})
+    b = PyNode("consume", consume, {"value": a.streams["value"]}, {"values"})
+    graph = Graph(None, {a, b}, "async", execution_type=GraphExecutionType.Async)
+    # act
+    handle = graph.run()
+    # assert
+    assert _results(handle, "consume", "values") == [[0, 1, 2]]
+
+
+def test_producer_error_ends_the_stream():
+    # arrange
+    def produce():
+        yield {"value": 1}
+        raise ValueError("instrument disconnected")
+
+    a = PyNode("produce", produce, output_vars={"value"})
+    b = PyNode("consume", analyze, {"trace": a.streams["value"]}, {"total"})
+    # act & assert
+    with pytest.raises(RuntimeError):
+        Graph(None, {a, b}, "failing").run()
+
+
+def test_stream_consumer_can_not_wait_for_its_producer():
+    # arrange
+    a = PyNode("acquire", acquire, output_vars={"trace"})
+    b = PyNode(
+        "analyze",
+        analyze,
+        {"trace": a.streams["trace"]},
+        {"total"},
+        must_run_after={a},
+    )
+    # act & assert
+    with pytest.raises(ValueError):
+        Graph(None, {a, b}, "invalid").compile()
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from entropylab.pipeline.api.graph import RetryBehavior
+from entropylab.pipeline.graph_experiment import (
+    Graph,
+    PyNode,
+    SubGraphNode,
+    GraphExecutionType,
+)
+
+cancelled = []
+
+
+async def hang():
+    try:
+        await asyncio.sleep(60)
+    except asyncio.CancelledError:
+        cancelled.append("hang")
+        raise
+    return {"x": 1}
+
+
+@pytest.mark.parametrize(
+    "execution_type",
+    [GraphExecutionType.Sync, GraphExecutionType.Async, GraphExecutionType.Threads],
+)
+def test_node_that_times_out_fails_the_graph(execution_type):
+    # arrange
+    node = PyNode("hang", hang, output_vars={"x"}, timeout=0.1)
+    graph = Graph(None, {node}, "timeout", execution_type=execution_type)
+    start = time.monotonic()
+    # act & assert
+    with pytest.raises(RuntimeError):
+        graph.run()
+    assert time.monotonic() - start < 5
+
+
+def test_timeout_applies_to_every_attempt():
+    # arrange
+    attempts = []
+
+    async def slow_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(60)
+        return {"x": len(attempts)}
+
+    node = PyNode(
+        "slow",
+        slow_once,
+        output_vars={"x"},
+        retry_on_error=RetryBehavior(number_of_attempts=2, wait_time=0),
+        timeout=0.1,
+    )
+    # act
+    handle = Graph(None, {node}, "retry", execution_type=GraphExecutionType.Async).run()
+    # assert
+    assert list(handle.results.get_results_from_node("slow"))[0].results[0].data == 2
+
+
+def test_failure_cancels_running_nodes():
+    # arrange
+    cancelled.clear()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("instrument disconnected")
+
+    a = PyNode("hang", hang, output_vars={"x"})
+    b = PyNode("fail", fail)
+    graph = Graph(None, {a, b}, "fail fast", execution_type=GraphExecutionType.Async)
+    start = time.monotonic()
+    # act & assert
+    with pytest.raises(RuntimeError):
+        graph.run()
+    assert time.monotonic() - start < 5
+    assert cancelled == ["hang"]
+
+
+def test_sub_graph_timeout_cancels_its_nodes():
+    # arrange
+    cancelled.clear()
+    inner = PyNode("hang", hang, output_vars={"x"})
+    node = SubGraphNode({inner}, "sub graph", output_vars={"x"}, timeout=0.1)
+    graph = Graph(None, {node}, "sub graph", execution_type=GraphExecutionType.Async)
+    # act & assert
+    with pytest.raises(RuntimeError):
+        graph.run()
+    assert cancelled == ["hang"]
+
+
+def test_cancelled_node_fails_the_graph_when_its_children_can_not_run():
+    # arrange
+    async def cancelled_by_itself():
+        raise asyncio.CancelledError()
+
+    a = PyNode("cancelled", cancelled_by_itself, output_vars={"x"})
+    b = PyNode("child", lambda x: {"y": x}, {"x": a.outputs["x"]}, {"y"})
+    graph = Graph(None, {a, b}, "cancelled", execution_type=GraphExecutionType.Async)
+    # act & assert
+    with pytest.raises(RuntimeError):
+        graph.run()
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+import entropylab
+
+# generous, so that slow CI machines pass, but much less than the seconds it takes
+# to import sqlalchemy, dash, pandas and the plotting packages
+IMPORT_TIME_BUDGET_SECONDS = 0.5
+
+HEAVY_MODULES = ["sqlalchemy", "dash", "pandas", "matplotlib", "bokeh", "zmq", "qm"]
+
+
+def _import_in_new_interpreter(module: str):
+    script = f"""
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(output[0]), output[1]
+
+
+@pytest.mark.parametrize("module", ["entropylab", "entropylab.cli.main"])
+def test_import_does_not_import_heavy_packages(module):
+    # act
+    seconds, imported = _import_in_new_interpreter(module)
+    # assert
+    assert imported == ""
+    assert seconds < IMPORT_TIME_BUDGET_SECONDS
+
+
+def test_public_names_are_imported_on_first_use():
+    # act
+    from entropylab import Graph
+    from entropylab.pipeline.graph_experiment import Graph as graph_experiment_Graph
+
+    # assert
+    assert Graph is graph_experiment_Graph
+    assert "Graph" in dir(entropylab)
+
+
+def test_unknown_name_raises_attribute_error():
+    with pytest.raises(AttributeError):
+        entropylab.NoSuchName